@@ -0,0 +1,54 @@
+"""composite and brin indexes for api query patterns
+
+Revision ID: 8850915fbf1d
+Revision: cef1bc732220
+Create Date: 2026-10-19 10:03:57.118204
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8850915fbf1d'
+down_revision: Union[str, None] = 'cef1bc732220'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # GET /harvest/?company=&crop=&measured_from=&measured_to=（ダッシュボードの基本形）
+    op.create_index(
+        "ix_harvest_company_crop_measured_at",
+        "harvest",
+        ["company", "crop", "measured_at"],
+        unique=False,
+    )
+    # measured_at は挿入順とほぼ一致するので BRIN が小さく効く（期間指定だけの検索用）
+    op.create_index(
+        "brin_harvest_measured_at",
+        "harvest",
+        ["measured_at"],
+        unique=False,
+        postgresql_using="brin",
+    )
+    # company 単独は上の複合索引の先頭列で足りる
+    op.drop_index(op.f('ix_harvest_company'), table_name='harvest')
+
+    # GET /env/harvest?medium=&month=
+    op.create_index(
+        "ix_env_medium_month",
+        "env",
+        ["medium", "month"],
+        unique=False,
+    )
+
+    op.execute("ANALYZE harvest;")
+    op.execute("ANALYZE env;")
+
+def downgrade() -> None:
+    op.drop_index("ix_env_medium_month", table_name="env")
+    op.create_index(op.f('ix_harvest_company'), 'harvest', ['company'], unique=False)
+    op.drop_index("brin_harvest_measured_at", table_name="harvest")
+    op.drop_index("ix_harvest_company_crop_measured_at", table_name="harvest")
@@ -0,0 +1,211 @@
+"""partition harvest and env by month
+
+Revision ID: cef1bc732220
+Revision: 6d3829fae1b9
+Create Date: 2026-10-19 09:12:31.402518
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cef1bc732220'
+down_revision: Union[str, None] = '6d3829fae1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 先に作っておく月数（以降は app 起動時 / tools/partitions.py が追加する）
+MONTHS_AHEAD = 3
+
+# harvest は measured_at（JST の月境界）、env は month 文字列で月ごとに切る。
+# 月パーティションは <parent>_pYYYY_MM、範囲外の行は <parent>_default に入る。
+# その月の行が既に <parent>_default に入っていると CREATE TABLE ... PARTITION OF は
+# 「updated partition constraint for default partition would be violated」で失敗するので、
+# 空のテーブルを作って default から該当月の行を移し、ATTACH PARTITION でつなぐ
+# （ATTACH 時に親の索引・制約も作られる）。
+ENSURE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(
+    parent text,
+    start_month date,
+    end_month date,
+    tz text DEFAULT 'Asia/Tokyo'
+) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    m date := date_trunc('month', start_month)::date;
+    part text;
+    key text := CASE WHEN parent = 'env' THEN 'month' ELSE 'measured_at' END;
+    lo text;
+    hi text;
+    created integer := 0;
+BEGIN
+    WHILE m <= end_month LOOP
+        part := format('%s_p%s', parent, to_char(m, 'YYYY_MM'));
+        IF to_regclass(part) IS NULL THEN
+            IF parent = 'env' THEN
+                lo := to_char(m, 'YYYY-MM');
+                hi := to_char(m + interval '1 month', 'YYYY-MM');
+            ELSE
+                lo := (m::timestamp AT TIME ZONE tz)::text;
+                hi := ((m + interval '1 month')::timestamp AT TIME ZONE tz)::text;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part, parent);
+            IF to_regclass(parent || '_default') IS NOT NULL THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    parent || '_default', key, lo, key, hi, part
+                );
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                parent, part, lo, hi
+            );
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(ENSURE_PARTITIONS_FN)
+
+    # ---------- harvest: RANGE (measured_at) ----------
+    # 旧テーブルを退避（シーケンスは新テーブルに引き継ぐので所有を外す）
+    op.execute("ALTER TABLE harvest RENAME TO harvest_heap;")
+    op.execute("ALTER SEQUENCE harvest_id_seq OWNED BY NONE;")
+
+    op.execute("""
+        CREATE TABLE harvest (
+            id          integer NOT NULL DEFAULT nextval('harvest_id_seq'),
+            month       varchar(7) NOT NULL,
+            company     varchar(100) NOT NULL,
+            crop        varchar(100) NOT NULL,
+            amount_kg   double precision NOT NULL,
+            measured_at timestamptz NOT NULL,
+            measure_no  integer NOT NULL
+        ) PARTITION BY RANGE (measured_at);
+    """)
+    op.execute("CREATE TABLE harvest_default PARTITION OF harvest DEFAULT;")
+    op.execute(f"""
+        SELECT ensure_monthly_partitions(
+            'harvest',
+            COALESCE(
+                (SELECT min(measured_at AT TIME ZONE 'Asia/Tokyo')::date FROM harvest_heap),
+                CURRENT_DATE
+            ),
+            GREATEST(
+                (SELECT max(measured_at AT TIME ZONE 'Asia/Tokyo')::date FROM harvest_heap),
+                (CURRENT_DATE + interval '{MONTHS_AHEAD} months')::date
+            )
+        );
+    """)
+    op.execute("""
+        INSERT INTO harvest (id, month, company, crop, amount_kg, measured_at, measure_no)
+        SELECT id, month, company, crop, amount_kg, measured_at, measure_no
+        FROM harvest_heap;
+    """)
+    op.drop_table("harvest_heap")
+    op.execute("ALTER SEQUENCE harvest_id_seq OWNED BY harvest.id;")
+
+    # 制約・索引はロード後に張る（主キー・一意制約はパーティションキーを含む必要がある）
+    op.create_primary_key("harvest_pkey", "harvest", ["id", "measured_at"])
+    op.create_unique_constraint(
+        "uq_harvest_company_crop_measured_at_no",
+        "harvest",
+        ["company", "crop", "measured_at", "measure_no"],
+    )
+    op.create_index(op.f('ix_harvest_company'), 'harvest', ['company'], unique=False)
+    op.create_index(op.f('ix_harvest_crop'), 'harvest', ['crop'], unique=False)
+    op.create_index(op.f('ix_harvest_month'), 'harvest', ['month'], unique=False)
+
+    # ---------- env: RANGE (month) ----------
+    op.execute("ALTER TABLE env RENAME TO env_heap;")
+    op.execute("ALTER SEQUENCE env_id_seq OWNED BY NONE;")
+
+    op.execute("""
+        CREATE TABLE env (
+            id            integer NOT NULL DEFAULT nextval('env_id_seq'),
+            month         varchar(7) NOT NULL,
+            temperature   double precision NOT NULL,
+            humidity      double precision NOT NULL,
+            medium        varchar(50) NOT NULL,
+            water_content double precision NOT NULL,
+            illuminance   double precision NOT NULL
+        ) PARTITION BY RANGE (month);
+    """)
+    op.execute("CREATE TABLE env_default PARTITION OF env DEFAULT;")
+    op.execute(f"""
+        SELECT ensure_monthly_partitions(
+            'env',
+            COALESCE(
+                (SELECT to_date(min(month), 'YYYY-MM') FROM env_heap WHERE month ~ '^\\d{{4}}-\\d{{2}}$'),
+                CURRENT_DATE
+            ),
+            GREATEST(
+                (SELECT to_date(max(month), 'YYYY-MM') FROM env_heap WHERE month ~ '^\\d{{4}}-\\d{{2}}$'),
+                (CURRENT_DATE + interval '{MONTHS_AHEAD} months')::date
+            )
+        );
+    """)
+    op.execute("""
+        INSERT INTO env (id, month, temperature, humidity, medium, water_content, illuminance)
+        SELECT id, month, temperature, humidity, medium, water_content, illuminance
+        FROM env_heap;
+    """)
+    op.drop_table("env_heap")
+    op.execute("ALTER SEQUENCE env_id_seq OWNED BY env.id;")
+
+    op.create_primary_key("env_pkey", "env", ["id", "month"])
+    op.create_index(op.f('ix_env_month'), 'env', ['month'], unique=False)
+
+
+def downgrade() -> None:
+    # パーティションを外して通常のテーブルに戻す（6d3829fae1b9 時点の形）
+    op.execute("ALTER TABLE harvest RENAME TO harvest_part;")
+    op.execute("ALTER SEQUENCE harvest_id_seq OWNED BY NONE;")
+    op.execute("""
+        CREATE TABLE harvest AS
+        SELECT id, month, company, crop, amount_kg, measured_at, measure_no
+        FROM harvest_part;
+    """)
+    op.execute("DROP TABLE harvest_part CASCADE;")
+    op.execute("ALTER TABLE harvest ALTER COLUMN id SET DEFAULT nextval('harvest_id_seq');")
+    op.execute("ALTER SEQUENCE harvest_id_seq OWNED BY harvest.id;")
+    for col in ("id", "month", "company", "crop", "amount_kg", "measured_at", "measure_no"):
+        op.alter_column("harvest", col, nullable=False)
+    op.create_primary_key("harvest_pkey", "harvest", ["id"])
+    op.create_unique_constraint(
+        "uq_harvest_company_crop_measured_at_no",
+        "harvest",
+        ["company", "crop", "measured_at", "measure_no"],
+    )
+    op.create_index(op.f('ix_harvest_company'), 'harvest', ['company'], unique=False)
+    op.create_index(op.f('ix_harvest_crop'), 'harvest', ['crop'], unique=False)
+    op.create_index(op.f('ix_harvest_id'), 'harvest', ['id'], unique=False)
+    op.create_index(op.f('ix_harvest_month'), 'harvest', ['month'], unique=False)
+
+    op.execute("ALTER TABLE env RENAME TO env_part;")
+    op.execute("ALTER SEQUENCE env_id_seq OWNED BY NONE;")
+    op.execute("""
+        CREATE TABLE env AS
+        SELECT id, month, temperature, humidity, medium, water_content, illuminance
+        FROM env_part;
+    """)
+    op.execute("DROP TABLE env_part CASCADE;")
+    op.execute("ALTER TABLE env ALTER COLUMN id SET DEFAULT nextval('env_id_seq');")
+    op.execute("ALTER SEQUENCE env_id_seq OWNED BY env.id;")
+    for col in ("id", "month", "temperature", "humidity", "medium", "water_content", "illuminance"):
+        op.alter_column("env", col, nullable=False)
+    op.create_primary_key("env_pkey", "env", ["id"])
+    op.create_index(op.f('ix_env_id'), 'env', ['id'], unique=False)
+    op.create_index(op.f('ix_env_month'), 'env', ['month'], unique=False)
+
+    op.execute("DROP FUNCTION IF EXISTS ensure_monthly_partitions(text, date, date, text);")
@@ -1,4 +1,7 @@
+import hashlib
+import hmac
 import os
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -9,47 +12,89 @@ from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.core.cache import ExpiringLRU
 from app.core.config import settings
-from app.db.users import get_user_by_username
+from app.db.users import get_cached_user
 from app.core.db import get_db
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# 検証済みトークン: sha256(token) → sub。トークンの exp を過ぎたら自然に消える
+_token_cache = ExpiringLRU(maxsize=settings.TOKEN_CACHE_SIZE)
+# bcrypt 検証に成功した資格情報: HMAC(username, password, hash) → True
+_login_cache = ExpiringLRU(maxsize=settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def _credential_key(username: str, password: str, hashed: str) -> bytes:
+    # 平文は保持しない。hash を混ぜるのでパスワード変更後は必ず bcrypt を通る
+    msg = f"{username}\0{password}\0{hashed}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), msg, hashlib.sha256).digest()
+
 def authenticate_user(
     db: Session,
     username: str,
     password: str,
 ):
-    user = get_user_by_username(db, username)
+    user = get_cached_user(db, username)
     if not user:
         return None
+
+    key = _credential_key(username, password, user.password_hash)
+    if _login_cache.get(key):
+        return user
+
     if not verify_password(password, user.password_hash):
         return None
+    _login_cache.set(key, True, time.time() + settings.AUTH_CACHE_TTL_SECONDS)
     return user
 
-def create_access_token(sub: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+def _create_token(sub: str, token_type: str, expires_minutes: int) -> str:
     now = datetime.now(timezone.utc)
     payload = {
         "sub": sub,
+        "typ": token_type,
         "iat": int(now.timestamp()),
-        "exp": int(now + timedelta(minutes=expires_minutes)).timestamp()},
+        "exp": int((now + timedelta(minutes=expires_minutes)).timestamp()),
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM,
-    )
+def create_access_token(sub: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+    return _create_token(sub, "access", expires_minutes)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        sub: Optional[str] = payload.get("sub")
-        if not sub:
-            raise HTTPException(status_code=401, detail="Invalid token (no sub)")
+def create_refresh_token(sub: str, expires_minutes: int = settings.REFRESH_TOKEN_EXPIRE_MINUTES) -> str:
+    return _create_token(sub, "refresh", expires_minutes)
+
+def decode_token(token: str, token_type: str = "access") -> str:
+    """
+    トークンを検証して sub を返す。
+    検証済みの結果は exp までキャッシュするので、同じトークンの2回目以降は jose を通らない。
+    """
+    key = (token_type, hashlib.sha256(token.encode()).digest())
+    sub = _token_cache.get(key)
+    if sub is not None:
         return sub
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalide token")
+
+    sub: Optional[str] = payload.get("sub")
+    if not sub:
+        raise HTTPException(status_code=401, detail="Invalid token (no sub)")
+    # typ の無い旧トークンは access 扱い
+    if payload.get("typ", "access") != token_type:
+        raise HTTPException(status_code=401, detail="Invalid token type")
+
+    expires_at = payload.get("exp") or time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    _token_cache.set(key, sub, float(expires_at))
+    return sub
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+    return decode_token(token, "access")
@@ -0,0 +1,168 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Hashable, Optional
+
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+
+# プロセス起動ごとに変わる値。再起動をまたいで古い ETag が一致しないようにする
+_BOOT_ID = secrets.token_hex(4)
+
+
+def _now() -> datetime:
+    # HTTP の日付は秒精度なので切り捨てておく
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class TableVersions:
+    """テーブルごとの変更カウンタ（CRUD 層の書き込みで bump される）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._modified: dict[str, datetime] = {}
+        self._started = _now()
+
+    def bump(self, table: str) -> int:
+        with self._lock:
+            version = self._versions.get(table, 0) + 1
+            self._versions[table] = version
+            self._modified[table] = _now()
+            return version
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def last_modified(self, table: str) -> datetime:
+        return self._modified.get(table, self._started)
+
+
+class ResponseCache:
+    """list / 集計クエリ結果の LRU キャッシュ。キーにテーブルの版を含める。"""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: OrderedDict[tuple, Any] = OrderedDict()
+
+    def key(self, table: str, key: Hashable) -> tuple:
+        # 版はクエリ前に固定する。クエリ中に書き込みが入っても古い結果は新しい版に載らない
+        return (table, versions.version(table), key)
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: tuple, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            for k in [k for k in self._data if k[0] == table]:
+                del self._data[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ExpiringLRU:
+    """期限付き LRU。トークン検証やユーザー参照の結果を短時間だけ覚えておく。"""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+versions = TableVersions()
+response_cache = ResponseCache(maxsize=settings.RESPONSE_CACHE_SIZE)
+
+
+def mark_changed(table: str) -> None:
+    """書き込み後に呼ぶ。ETag を進め、該当テーブルのキャッシュを捨てる。"""
+    versions.bump(table)
+    response_cache.invalidate(table)
+
+
+def etag_for(table: str, *parts: Any) -> str:
+    raw = f"{_BOOT_ID}:{table}:{versions.version(table)}:{parts!r}"
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def validators(table: str, *parts: Any) -> dict[str, str]:
+    """
+    ETag / Last-Modified ヘッダーを作る。
+    クエリより前に呼ぶこと（クエリ中の書き込みで新しい版の ETag が古い中身に付かないように）。
+    """
+    return {
+        "ETag": etag_for(table, *parts),
+        "Last-Modified": format_datetime(versions.last_modified(table), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def not_modified(request: Request, headers: dict[str, str]) -> Optional[Response]:
+    """
+    条件付きリクエストが現在の版と一致すれば 304 を返す（DB には触れない）。
+    If-None-Match があれば If-Modified-Since より優先する（RFC 9110）。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        if "*" in tags or headers["ETag"] in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if parsedate_to_datetime(headers["Last-Modified"]) <= since:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return None
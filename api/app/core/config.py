@@ -7,5 +7,17 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    TOKEN_CACHE_SIZE: int = 1024
+    AUTH_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_SIZE: int = 256
+    # month の境界（パーティション境界と同じ）
+    TIMEZONE: str = "Asia/Tokyo"
+    # リクエスト計測（/metrics, Server-Timing, N+1 検出, プロファイル）
+    METRICS_ENABLED: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 5
+    PROFILE_HEADER: str = "X-Profile"
+    # ヘッダー値がこれと一致したときだけプロファイルする（未設定ならプロファイルは無効）
+    PROFILE_TOKEN: str | None = None
 
 settings = Settings()
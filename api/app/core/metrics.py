@@ -0,0 +1,327 @@
+"""
+リクエスト単位の計測（METRICS_ENABLED=true のときだけ main.py で組み込む）。
+
+- ルート（パステンプレート）ごとの所要時間ヒストグラム
+- リクエストごとの DB 時間・クエリ数（SQLAlchemy の cursor イベント）
+- 同じ SQL を1リクエストで何度も流す N+1 パターンの検出
+- PROFILE_HEADER の値が PROFILE_TOKEN と一致するリクエストだけサンプリングプロファイルを取り、本文の代わりに返す
+  （PROFILE_TOKEN が未設定ならプロファイルはしない）
+- /metrics で Prometheus のテキスト形式に出す
+"""
+import hmac
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import APIRouter, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    """1リクエスト分の DB 計測値。contextvar 経由でスレッドプールにも引き継がれる。"""
+
+    db_seconds: float = 0.0
+    queries: int = 0
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """(method, route, status) ごとのヒストグラムとカウンタ。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.duration: dict[tuple, Histogram] = {}
+        self.db_duration: dict[tuple, Histogram] = {}
+        self.db_queries: dict[tuple, Histogram] = {}
+        self.n_plus_one: Counter = Counter()
+
+    def observe(self, labels: tuple, seconds: float, stats: RequestStats, n_plus_one: bool) -> None:
+        with self._lock:
+            self.duration.setdefault(labels, Histogram(DURATION_BUCKETS)).observe(seconds)
+            self.db_duration.setdefault(labels, Histogram(DURATION_BUCKETS)).observe(stats.db_seconds)
+            self.db_queries.setdefault(labels, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            if n_plus_one:
+                self.n_plus_one[labels[:2]] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.duration.clear()
+            self.db_duration.clear()
+            self.db_queries.clear()
+            self.n_plus_one.clear()
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            _render_histograms(
+                lines, "http_request_duration_seconds", "request latency by route", self.duration
+            )
+            _render_histograms(
+                lines, "http_request_db_seconds", "time spent in DB per request", self.db_duration
+            )
+            _render_histograms(
+                lines, "http_request_db_queries", "SQL statements per request", self.db_queries
+            )
+            lines.append("# HELP http_n_plus_one_total requests that repeated one statement")
+            lines.append("# TYPE http_n_plus_one_total counter")
+            for (method, route), n in sorted(self.n_plus_one.items()):
+                lines.append(f"http_n_plus_one_total{{{_labels(method, route)}}} {n}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(method: str, route: str, status: Optional[int] = None) -> str:
+    out = f'method="{method}",route="{_escape(route)}"'
+    if status is not None:
+        out += f',status="{status}"'
+    return out
+
+
+def _render_histograms(lines: list[str], name: str, help_text: str, series: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, h in sorted(series.items()):
+        base = _labels(*labels)
+        cumulative = 0
+        for le, n in zip(h.buckets, h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{base},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{base}}} {h.sum:.6f}")
+        lines.append(f"{name}_count{{{base}}} {h.count}")
+
+
+registry = Registry()
+
+
+# ---------- SQLAlchemy ----------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.db_seconds += time.perf_counter() - started
+    stats.queries += 1
+    # バインド前の SQL 文字列で数える（パラメータ違いの同じ SELECT を N+1 とみなす）
+    stats.statements[statement] += 1
+
+
+def _handle_error(context) -> None:
+    # 失敗したクエリは after_cursor_execute が呼ばれないので、ここで開始時刻を捨てる
+    # （残すと以降のクエリが1つずれた開始時刻と組になる）
+    conn = context.connection
+    if conn is None or context.execution_context is None:
+        return
+    started = conn.info.get("query_start")
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------- サンプリングプロファイラ ----------
+class SamplingProfiler:
+    """
+    別スレッドから sys._current_frames() を一定間隔で覗くだけのプロファイラ。
+    同期エンドポイントはスレッドプールで動くので、スレッドを限定せずに全スレッドを取る
+    （同時に流れている他のリクエストも混ざる点に注意）。
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # イベントループ・スレッドプールの待機だけのスタックは捨てる
+                if stack and stack[0].startswith(("select ", "wait ", "get ", "_worker ", "run ")):
+                    continue
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self, top: int = 40) -> str:
+        leaf: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            leaf[frames[-1]] += n
+            for f in set(frames):
+                inclusive[f] += n
+        total = sum(self.stacks.values()) or 1
+        lines = [f"samples: {self.samples} (interval {self.interval * 1e3:.1f} ms)", "", "self:"]
+        lines += [f"  {n / total:6.1%}  {f}" for f, n in leaf.most_common(top)]
+        lines += ["", "inclusive:"]
+        lines += [f"  {n / total:6.1%}  {f}" for f, n in inclusive.most_common(top)]
+        lines += ["", "folded stacks (flamegraph.pl / speedscope):"]
+        lines += [f"{s} {n}" for s, n in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+
+# ---------- ASGI ミドルウェア ----------
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    def _wants_profile(self, scope) -> bool:
+        # プロファイルにはスタックやファイルパスが出るので、PROFILE_TOKEN が無ければ受け付けない
+        token = settings.PROFILE_TOKEN
+        if not token:
+            return False
+        header = settings.PROFILE_HEADER.lower().encode()
+        for name, value in scope.get("headers", []):
+            if name == header:
+                return hmac.compare_digest(value, token.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+        profiler = SamplingProfiler() if self._wants_profile(scope) else None
+        held: list[dict] = []
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - started
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (
+                        b"server-timing",
+                        f"app;dur={elapsed * 1e3:.1f}, db;dur={stats.db_seconds * 1e3:.1f}".encode(),
+                    ),
+                    (b"x-db-queries", str(stats.queries).encode()),
+                ]
+            if profiler is not None:
+                held.append(message)
+                return
+            await send(message)
+
+        try:
+            if profiler is not None:
+                with profiler:
+                    await self.app(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), status_code)
+            repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD)
+            if repeated:
+                sql, n = repeated[0]
+                logger.warning(
+                    "possible N+1 on %s %s: %d queries, same statement x%d: %s",
+                    labels[0], labels[1], stats.queries, n, " ".join(sql.split())[:200],
+                )
+            registry.observe(labels, elapsed, stats, bool(repeated))
+
+        if profiler is not None:
+            # 元のレスポンスは捨て、プロファイルを返す
+            body = (
+                f"{scope['method']} {scope['path']} -> {status_code} "
+                f"in {elapsed * 1e3:.1f} ms, db {stats.db_seconds * 1e3:.1f} ms / {stats.queries} queries\n"
+                + profiler.report()
+            ).encode()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def install(app, engine: Engine) -> None:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
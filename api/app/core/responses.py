@@ -0,0 +1,14 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+
+def dumps(payload: Any) -> bytes:
+    # datetime / float は orjson がそのまま扱える（Pydantic を通さない）
+    return orjson.dumps(payload)
+
+
+def json_bytes(body: bytes, headers: Optional[dict[str, str]] = None) -> Response:
+    """エンコード済みの JSON をそのまま返す（キャッシュ済みの body 用）。"""
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,9 +1,16 @@
+from typing import Optional
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
 from app import models
-from app.schemas.env import EnvCreate, EnvUpdate
+from app.core import cache
+from app.schemas.env import EnvCreate, EnvOut, EnvUpdate
+
+# list の高速経路で返す列（EnvOut と同じ並び）
+OUT_COLUMNS = tuple(EnvOut.model_fields)
 
 
 def create(db: Session, data: EnvCreate):
@@ -14,9 +21,10 @@ def create(db: Session, data: EnvCreate):
     except IntegrityError:
         db.rollback()
         raise HTTPException(
-            status_code=stats.HTTP_409_CONFICT,
+            status_code=status.HTTP_409_CONFLICT,
             detail="env already exists for this month and medium",
         )
+    cache.mark_changed("env")
     db.refresh(obj)
     return obj
 
@@ -25,6 +33,23 @@ def get(db: Session, env_id: int):
     return db.get(models.Env, env_id)
 
 
+def list_stmt(limit: int, offset: int, month: Optional[str] = None, medium: Optional[str] = None):
+    # 必要な列だけタプルで取り出す（ORM オブジェクトも EnvOut の検証も通さない）
+    cols = [getattr(models.Env, c) for c in OUT_COLUMNS]
+    stmt = select(*cols)
+    if month:
+        # パーティションキーでの等値条件なので該当月のパーティションだけを読む
+        stmt = stmt.where(models.Env.month == month)
+    if medium:
+        stmt = stmt.where(models.Env.medium == medium)
+    return stmt.order_by(models.Env.id).limit(limit).offset(offset)
+
+
+def list_rows(db: Session, limit: int, offset: int, **filters) -> list[dict]:
+    rows = db.execute(list_stmt(limit, offset, **filters)).all()
+    return [dict(zip(OUT_COLUMNS, row)) for row in rows]
+
+
 def list(db: Session, limit: int, offset: int):
     return db.query(models.Env).offset(offset).limit(limit).all()
 
@@ -33,6 +58,7 @@ def update(db: Session, obj, data: EnvUpdate):
     for k, v in data.model_dump(exclude_unset=True).items():
         setattr(obj, k, v)
     db.commit()
+    cache.mark_changed("env")
     db.refresh(obj)
     return obj
 
@@ -40,3 +66,4 @@ def update(db: Session, obj, data: EnvUpdate):
 def delete(db: Session, obj):
     db.delete(obj)
     db.commit()
+    cache.mark_changed("env")
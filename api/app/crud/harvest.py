@@ -2,21 +2,43 @@ from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from datetime import timezone
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
 
 from app import models
-from app.schemas.harvest import HarvestCreate, HarvestUpdate
+from app.core import cache
+from app.core.config import settings
+from app.schemas.harvest import HarvestCreate, HarvestOut, HarvestUpdate
+
+# list の高速経路で返す列（HarvestOut と同じ並び）
+OUT_COLUMNS = tuple(HarvestOut.model_fields)
+
+def _aware(dt: datetime) -> datetime:
+    # tz なしの measured_at は settings.TIMEZONE の時刻とみなす（DB のセッション tz に解釈させない）
+    return dt.replace(tzinfo=ZoneInfo(settings.TIMEZONE)) if dt.tzinfo is None else dt
+
 
 def _month_from_measured_at(dt) -> str:
-    #dtはtimezone付きの想定(Pydanticがdatetimeにしてくれる)
-    #JSTで運用するならdt.astimezone(ZoneInfo("Azia/Tokyo"))にしてから月を切る
-    return dt.strftime("%Y-%m")
+    # settings.TIMEZONE の月で切る（month_range と同じ境界）
+    return _aware(dt).astimezone(ZoneInfo(settings.TIMEZONE)).strftime("%Y-%m")
+
+
+def _resolve_month(measured_at, month: Optional[str]) -> str:
+    """保存する month は measured_at から決める。クライアントの month が食い違えば 422。"""
+    derived = _month_from_measured_at(measured_at)
+    if month is not None and month != derived:
+        raise HTTPException(
+            status_code=422,
+            detail=f"month {month} does not match measured_at ({derived} in {settings.TIMEZONE})",
+        )
+    return derived
 
 def create(db: Session, data: HarvestCreate):
     payload = data.model_dump()
 
-    if payload.get("month") is None:
-        payload["month"] = data.measured_at.strftime("%Y-%m")
+    payload["measured_at"] = _aware(data.measured_at)
+    payload["month"] = _resolve_month(data.measured_at, payload.get("month"))
 
     obj = models.Harvest(**payload)
     db.add(obj)
@@ -28,6 +50,7 @@ def create(db: Session, data: HarvestCreate):
                 status_code=status.HTTP_409_CONFLICT,
                 detail="harvest already exists for company, crop, measured_at and measure_no",
         )
+    cache.mark_changed("harvest")
     db.refresh(obj)
     return obj
 
@@ -48,14 +71,78 @@ def get(db: Session, harvest_id: int):
     return db.get(models.Harvest, harvest_id)
 
 
+def month_range(month: str) -> tuple[datetime, datetime]:
+    """'YYYY-MM' → その月の [開始, 翌月開始)（settings.TIMEZONE の月境界）。"""
+    tz = ZoneInfo(settings.TIMEZONE)
+    y, m = map(int, month.split("-"))
+    start = datetime(y, m, 1, tzinfo=tz)
+    end = datetime(y + m // 12, m % 12 + 1, 1, tzinfo=tz)
+    return start, end
+
+
+def _filters(
+    month: Optional[str] = None,
+    measured_from: Optional[datetime] = None,
+    measured_to: Optional[datetime] = None,
+    company: Optional[str] = None,
+    crop: Optional[str] = None,
+) -> list:
+    # month は文字列列ではなく measured_at の範囲で絞る（パーティションの刈り込みが効く）
+    conds = []
+    if company:
+        conds.append(models.Harvest.company == company)
+    if crop:
+        conds.append(models.Harvest.crop == crop)
+    if month:
+        start, end = month_range(month)
+        conds += [models.Harvest.measured_at >= start, models.Harvest.measured_at < end]
+    if measured_from:
+        conds.append(models.Harvest.measured_at >= measured_from)
+    if measured_to:
+        conds.append(models.Harvest.measured_at < measured_to)
+    return conds
+
+
+def count_stmt(**filters):
+    return select(func.count()).select_from(models.Harvest).where(*_filters(**filters))
+
+
+def list_stmt(limit: int, offset: int, **filters):
+    # 必要な列だけをタプルで取り出す（ORM オブジェクト・identity map を通さない）
+    cols = [getattr(models.Harvest, c) for c in OUT_COLUMNS]
+    return (
+        select(*cols)
+        .where(*_filters(**filters))
+        .order_by(models.Harvest.id)
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def count(db: Session, **filters) -> int:
+    return db.execute(count_stmt(**filters)).scalar_one()
+
+
+def list_rows(db: Session, limit: int, offset: int, **filters) -> list[dict]:
+    """行を dict で返す。HarvestOut の検証は通さない。"""
+    rows = db.execute(list_stmt(limit, offset, **filters)).all()
+    return [dict(zip(OUT_COLUMNS, row)) for row in rows]
+
+
 def list(db: Session, limit: int, offset: int):
     return db.query(models.Harvest).offset(offset).limit(limit).all()
 
 
 def update(db: Session, obj, data: HarvestUpdate):
-    for k, v in data.model_dump(exclude_unset=True).items():
+    fields = data.model_dump(exclude_unset=True)
+    if fields.get("measured_at") is not None:
+        fields["measured_at"] = _aware(fields["measured_at"])
+    if "measured_at" in fields or "month" in fields:
+        fields["month"] = _resolve_month(fields.get("measured_at") or obj.measured_at, fields.get("month"))
+    for k, v in fields.items():
         setattr(obj, k, v)
     db.commit()
+    cache.mark_changed("harvest")
     db.refresh(obj)
     return obj
 
@@ -63,3 +150,4 @@ def update(db: Session, obj, data: HarvestUpdate):
 def delete(db: Session, obj):
     db.delete(obj)
     db.commit()
+    cache.mark_changed("harvest")
@@ -0,0 +1,79 @@
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# alembic cef1bc732220 で月パーティション化したテーブル
+PARTITIONED_TABLES = ("harvest", "env")
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int = 3) -> dict[str, int]:
+    """今月から months_ahead ヶ月先までの月パーティションを作る（既存はスキップ）。"""
+    if conn.dialect.name != "postgresql":
+        return {}
+    fn = conn.execute(
+        text("SELECT to_regprocedure('ensure_monthly_partitions(text, date, date, text)')")
+    ).scalar()
+    if fn is None:
+        # まだ cef1bc732220 が当たっていない
+        return {}
+    start = date.today().replace(day=1)
+    end = _add_months(start, months_ahead)
+    created = {}
+    for table in PARTITIONED_TABLES:
+        created[table] = conn.execute(
+            text("SELECT ensure_monthly_partitions(:t, :s, :e)"),
+            {"t": table, "s": start, "e": end},
+        ).scalar_one()
+    return created
+
+
+def list_partitions(conn: Connection, table: str) -> list[str]:
+    rows = conn.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:t AS regclass)
+            ORDER BY c.relname
+        """),
+        {"t": table},
+    ).scalars().all()
+    return list(rows)
+
+
+def archive_partitions(
+    conn: Connection,
+    table: str,
+    before_month: str,
+    schema: str = "archive",
+    drop: bool = False,
+) -> list[str]:
+    """
+    before_month（YYYY-MM）より前の月パーティションを DETACH する。
+    行単位の DELETE ではなくメタデータ操作なので、件数に関係なく一瞬で終わる。
+    drop=False なら schema に移して残し、drop=True なら捨てる。
+    """
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"not a partitioned table: {table}")
+
+    cutoff = f"{table}_p{before_month.replace('-', '_')}"
+    targets = [
+        p for p in list_partitions(conn, table)
+        if p.startswith(f"{table}_p") and p < cutoff
+    ]
+
+    if targets and not drop:
+        conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    for part in targets:
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{part}"'))
+        if drop:
+            conn.execute(text(f'DROP TABLE "{part}"'))
+        else:
+            conn.execute(text(f'ALTER TABLE "{part}" SET SCHEMA "{schema}"'))
+    return targets
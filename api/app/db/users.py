@@ -1,7 +1,76 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
 from sqlalchemy import text
 from sqlalchemy.orm import Session
+from app.core.cache import ExpiringLRU
+from app.core.config import settings
 from app.models.users import User
 
+
+@dataclass(frozen=True)
+class CachedUser:
+    # セッションから切り離して持ち回すためのスナップショット
+    id: int
+    username: str
+    password_hash: str
+
+
+_user_cache = ExpiringLRU(maxsize=settings.TOKEN_CACHE_SIZE)
+
+
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+
+def get_cached_user(db: Session, username: str) -> Optional[CachedUser]:
+    """username → ユーザー。AUTH_CACHE_TTL_SECONDS の間は DB を引かない。"""
+    cached = _user_cache.get(username)
+    if cached is not None:
+        return cached
+
+    user = get_user_by_username(db, username)
+    if not user:
+        return None
+    snapshot = CachedUser(id=user.id, username=user.username, password_hash=user.password_hash)
+    _user_cache.set(username, snapshot, time.time() + settings.AUTH_CACHE_TTL_SECONDS)
+    return snapshot
+
+
+def forget_user(username: str) -> None:
+    # パスワード変更・削除時に呼ぶ。
+    # auth._login_cache のキーは password_hash を含むので、ここで古い hash を捨てれば
+    # 変更前のパスワードのキャッシュにも当たらなくなる
+    _user_cache.pop(username)
+
+
+# users への書き込みはここを通す（コミット後にキャッシュを捨てる）
+
+def create_user(db: Session, username: str, password_hash: str) -> User:
+    user = User(username=username, password_hash=password_hash)
+    db.add(user)
+    db.commit()
+    forget_user(username)
+    db.refresh(user)
+    return user
+
+
+def set_password_hash(db: Session, username: str, password_hash: str) -> bool:
+    user = get_user_by_username(db, username)
+    if not user:
+        return False
+    user.password_hash = password_hash
+    db.commit()
+    forget_user(username)
+    return True
+
+
+def delete_user(db: Session, username: str) -> bool:
+    user = get_user_by_username(db, username)
+    if not user:
+        return False
+    db.delete(user)
+    db.commit()
+    forget_user(username)
+    return True
@@ -1,12 +1,38 @@
+import logging
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
+from app.core import metrics
+from app.core.config import settings
+from app.core.db import engine
+from app.db.partitions import ensure_future_partitions
+from app.routers.auth import router as auth_router
 from app.routers.env import router as env_router
 from app.routers.harvest import router as harvest_router
 from app.routers.health import router as health_router
 
-app = FastAPI(title="Heartful API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Heartful API", default_response_class=ORJSONResponse)
 
 
 app.include_router(health_router)
+app.include_router(auth_router)
 app.include_router(harvest_router)
 app.include_router(env_router)
+
+if settings.METRICS_ENABLED:
+    metrics.install(app, engine)
+
+
+@app.on_event("startup")
+def startup():
+    # 月パーティションを先回りで作る（PostgreSQL 以外では何もしない）。
+    # 作れなくても行は <table>_default に入るので、起動は止めずにログだけ残す
+    # （tools/partitions.py ensure で後から作り直せる）
+    try:
+        with engine.begin() as conn:
+            ensure_future_partitions(conn)
+    except Exception:
+        logger.exception("failed to create monthly partitions; rows will go to the default partition")
@@ -1,4 +1,4 @@
-from sqlalchemy import Float, Integer, String
+from sqlalchemy import Float, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
@@ -6,6 +6,9 @@ from app.models.base import Base
 
 class Env(Base):
     __tablename__ = "env"
+    # PostgreSQL では month で月パーティション化している（alembic cef1bc732220）。
+    # DB の主キーは (id, month) だが、ORM 上は id で引く。
+    __table_args__ = (Index("ix_env_medium_month", "medium", "month"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     month: Mapped[str] = mapped_column(String(7), index=True)  # YYYY-MM
@@ -1,15 +1,21 @@
 from datetime import datetime
-from sqlalchemy import DateTime, Float, Integer, String
+from sqlalchemy import DateTime, Float, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
 
 class Harvest(Base):
     __tablename__ = "harvest"
+    # PostgreSQL では measured_at で月パーティション化している（alembic cef1bc732220）。
+    # DB の主キーは (id, measured_at) だが、id はシーケンス採番なので ORM 上は id で引く。
+    __table_args__ = (
+        Index("ix_harvest_company_crop_measured_at", "company", "crop", "measured_at"),
+        Index("brin_harvest_measured_at", "measured_at", postgresql_using="brin"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     month: Mapped[str] = mapped_column(String(7), index=True)  # YYYY-MM
-    company: Mapped[str] = mapped_column(String(100), index=True)
+    company: Mapped[str] = mapped_column(String(100))
     crop: Mapped[str] = mapped_column(String(100), index=True)
     amount_kg: Mapped[float] = mapped_column(Float, nullable=False)
     measured_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
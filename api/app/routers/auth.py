@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from app.core.db import get_db
-from app.auth import authenticate_user, create_access_token
+from app.auth import authenticate_user, create_access_token, create_refresh_token, decode_token
+from app.db.users import forget_user, get_user_by_username
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -10,9 +11,21 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 def login(form: OAuth2PasswordRequestForm = Depends(),
           db: Session = Depends(get_db),
 ):
-    ok = authenticate_uesr(form.username, form.password)
+    ok = authenticate_user(db, form.username, form.password)
     if not ok:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     token = create_access_token(sub=form.username)
-    return{"access_token": token, "token_type": "bearer"}
+    refresh_token = create_refresh_token(sub=form.username)
+    return{"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/refresh")
+def refresh(refresh_token: str = Body(..., embed=True), db: Session = Depends(get_db)):
+    # bcrypt は通さないが、削除されたユーザーに再発行しないよう DB は引き直す（キャッシュは使わない）
+    sub = decode_token(refresh_token, "refresh")
+    if not get_user_by_username(db, sub):
+        forget_user(sub)
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    token = create_access_token(sub=sub)
+    return {"access_token": token, "token_type": "bearer"}
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
+from app.core import cache, responses
 from app.crud import env as crud_env
 from app.db.session import get_db
 from app.schemas.env import EnvCreate, EnvOut, EnvUpdate
+from app.schemas.harvest import MONTH_PATTERN
 from fastapi import APIRouter, Depends
 from app.auth import get_current_user
 from app.core.db import get_db
@@ -18,44 +22,55 @@ def create_env(data: EnvCreate, db: Session = Depends(get_db)):
 
 @router.get("/harvest", response_model=list[EnvOut])
 def list_env(
+        request: Request,
         limit: int = 100,
         offset: int = 0,
+        month: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+        medium: Optional[str] = Query(None),
         db: Session = Depends(get_db),
         user = Depends(get_current_user)
     ):
-    return db.query(models.Env).offset(offset).limit(limit).all()
+    validators = cache.validators("env", "list", limit, offset, month, medium)
+    not_modified = cache.not_modified(request, validators)
+    if not_modified:
+        return not_modified
+
+    key = cache.response_cache.key("env", ("list", limit, offset, month, medium))
+    body = cache.response_cache.get(key)
+    if body is None:
+        body = responses.dumps(crud_env.list_rows(db, limit, offset, month=month, medium=medium))
+        cache.response_cache.set(key, body)
+
+    return responses.json_bytes(body, headers=validators)
 
 
 @router.get("/{env_id}", response_model=EnvOut)
-def get_env(env_id: int, db: Session = Depends(get_db)):
-    obj = db.get(models.Env, env_id)
+def get_env(env_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    validators = cache.validators("env", env_id)
+    not_modified = cache.not_modified(request, validators)
+    if not_modified:
+        return not_modified
+
+    obj = crud_env.get(db, env_id)
     if not obj:
         raise HTTPException(status_code=404, detail="env not found")
+    response.headers.update(validators)
     return obj
 
 
 @router.patch("/{env_id}", response_model=EnvOut)
 def update_env(env_id: int, data: EnvUpdate, db: Session = Depends(get_db)):
-    obj = db.get(models.Env, env_id)
+    obj = crud_env.get(db, env_id)
     if not obj:
         raise HTTPException(status_code=404, detail="env not found")
 
-    for (
-        k,
-        v,
-    ) in data.model_dump(exclude_unset=True).items():
-        setattr(obj, k, v)
-
-    db.commit()
-    db.refresh(obj)
-    return obj
+    return crud_env.update(db, obj, data)
 
 
 @router.delete("/{env_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_env(env_id: int, db: Session = Depends(get_db)):
-    obj = db.get(models.Env, env_id)
+    obj = crud_env.get(db, env_id)
     if not obj:
         raise HTTPException(status_code=404, detail="env not found")
 
-    db.delete(obj)
-    db.commit()
+    crud_env.delete(db, obj)
@@ -1,36 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from sqlalchemy import func, select
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from app.auth import get_current_user
 
+from app.core import cache, responses
 from app.crud import harvest as crud_harvest
 from app.core.db import get_db
-from app.models.harvest import Harvest
-from app.schemas.harvest import HarvestCreate, HarvestOut, HarvestUpdate
+from app.schemas.harvest import MONTH_PATTERN, HarvestCreate, HarvestOut, HarvestUpdate
 
 router = APIRouter(prefix="/harvest", tags=["harvest"])
 usre = Depends(get_current_user)
 
 @router.get("/", response_model=dict)
-def list_harvest(user=Depends(get_current_user)):
+def list_harvest(
+    request: Request,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    month: Optional[str] = Query(None, pattern=MONTH_PATTERN),
+    measured_from: Optional[datetime] = Query(None),
+    measured_to: Optional[datetime] = Query(None),
+    company: Optional[str] = Query(None),
+    crop: Optional[str] = Query(None),
     db: Session = Depends(get_db),
-    total = db.execute(select(func.count()).select_from(Harvest)).scalar_one()
-    items = (
-        db.execute(select(Harvest).order_by(Harvest.id).limit(limit).offset(offset)).scalars().all()
-    )
-
-    items_out = [HarvestOut.model_validate(x) for x in items]
-
-    return {"total": total, "limit": limit, "offset": offset, "items": items_out}
+    user=Depends(get_current_user),
+):
+    filters = {
+        "month": month,
+        "measured_from": measured_from,
+        "measured_to": measured_to,
+        "company": company,
+        "crop": crop,
+    }
+    params = (limit, offset, *filters.values())
+    validators = cache.validators("harvest", "list", *params)
+    not_modified = cache.not_modified(request, validators)
+    if not_modified:
+        return not_modified
+
+    key = cache.response_cache.key("harvest", ("list", *params))
+    body = cache.response_cache.get(key)
+    if body is None:
+        total = crud_harvest.count(db, **filters)
+        items = crud_harvest.list_rows(db, limit, offset, **filters)
+        body = responses.dumps({"total": total, "limit": limit, "offset": offset, "items": items})
+        cache.response_cache.set(key, body)
+
+    # 行ごとの HarvestOut 検証を省き、エンコード済みの body をそのまま返す
+    return responses.json_bytes(body, headers=validators)
 
 
 @router.get("/{harvest_id}", response_model=HarvestOut)
-def get_harvest(harvest_id: int, db: Session = Depends(get_db)):
-    obj = db.get(Harvest, harvest_id)
+def get_harvest(
+    harvest_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    validators = cache.validators("harvest", harvest_id)
+    not_modified = cache.not_modified(request, validators)
+    if not_modified:
+        return not_modified
+
+    obj = crud_harvest.get(db, harvest_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Harvest not found")
+    response.headers.update(validators)
     return obj
 
 
@@ -45,17 +81,11 @@ def update_harvest(
     data: HarvestUpdate,
     db: Session = Depends(get_db),
 ):
-    obj = db.get(Harvest, harvest_id)
+    obj = crud_harvest.get(db, harvest_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Harvest not found")
 
-    payload = data.model_dump(exclude_unset=True)
-    for k, v in payload.items():
-        setattr(obj, k, v)
-
-    db.commit()
-    db.refresh(obj)
-    return obj
+    return crud_harvest.update(db, obj, data)
 
 
 @router.delete("/{harvest_id}", status_code=204)
@@ -63,10 +93,9 @@ def delete_harvest(
     harvest_id: int,
     db: Session = Depends(get_db),
 ):
-    obj = db.get(Harvest, harvest_id)
+    obj = crud_harvest.get(db, harvest_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Harvest not found")
 
-    db.delete(obj)
-    db.commit()
+    crud_harvest.delete(db, obj)
     return Response(status_code=204)
@@ -0,0 +1,117 @@
+"""
+認証まわりの1リクエストあたりのオーバーヘッドを測る。
+
+    cd api && python bench/bench_auth.py [--iterations 2000] [--json out.json]
+
+DATABASE_URL が無ければ一時 SQLite を使う。各項目を
+「キャッシュなし（従来の経路）」と「キャッシュあり」で比較する。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_auth.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from jose import jwt  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.db import SessionLocal, engine  # noqa: E402
+from app.db import users  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.base import Base  # noqa: E402
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def clear_caches() -> None:
+    auth._token_cache.clear()
+    auth._login_cache.clear()
+    users._user_cache.clear()
+
+
+def timeit(fn, iterations: int, before=None) -> dict:
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {
+        "iterations": iterations,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": statistics.median(samples) * 1e6,
+    }
+
+
+def ensure_user() -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if not users.get_user_by_username(db, USERNAME):
+            users.create_user(db, USERNAME, auth.get_password_hash(PASSWORD))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="auth overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--login-iterations", type=int, default=10, help="bcrypt は遅いので少なめ")
+    parser.add_argument("--json", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    ensure_user()
+    token = auth.create_access_token(USERNAME)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+
+    results["verify_token"] = {
+        "before": timeit(
+            lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]),
+            args.iterations,
+        ),
+        "after": timeit(lambda: auth.decode_token(token), args.iterations),
+    }
+
+    def login():
+        with SessionLocal() as db:
+            assert auth.authenticate_user(db, USERNAME, PASSWORD)
+
+    results["authenticate_user"] = {
+        "before": timeit(login, args.login_iterations, before=clear_caches),
+        "after": timeit(login, args.login_iterations),
+    }
+
+    # 認証付きエンドポイント1回分（/harvest/ は空テーブル）
+    def request():
+        r = client.get("/harvest/", headers=headers)
+        assert r.status_code == 200, r.text
+
+    n_requests = max(1, args.iterations // 10)
+    results["GET /harvest/"] = {
+        "before": timeit(request, n_requests, before=clear_caches),
+        "after": timeit(request, n_requests),
+    }
+
+    print(f"{'case':<22}{'before p50(us)':>16}{'after p50(us)':>16}{'speedup':>10}")
+    for name, r in results.items():
+        before, after = r["before"]["p50_us"], r["after"]["p50_us"]
+        print(f"{name:<22}{before:>16.1f}{after:>16.1f}{before / after:>9.1f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
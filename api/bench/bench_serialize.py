@@ -0,0 +1,104 @@
+"""
+list エンドポイントのシリアライズ経路を 10k 行で比較する。
+
+    cd api && python bench/bench_serialize.py [--rows 10000] [--repeat 5]
+
+before: ORM で全列ロード → HarvestOut.model_validate → jsonable_encoder → json.dumps
+        （response_model=dict の従来経路）
+after : 必要列をタプルで select → dict → orjson（crud_harvest.list_rows の経路）
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_serialize.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app.core import responses  # noqa: E402
+from app.core.db import SessionLocal, engine  # noqa: E402
+from app.crud import harvest as crud_harvest  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.harvest import Harvest  # noqa: E402
+from app.schemas.harvest import HarvestOut  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.query(Harvest).count() >= rows:
+            return
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        db.execute(
+            Harvest.__table__.insert(),
+            [
+                {
+                    "month": (start + timedelta(hours=i)).strftime("%Y-%m"),
+                    "company": f"company-{i % 20}",
+                    "crop": f"crop-{i % 7}",
+                    "amount_kg": (i % 500) / 10,
+                    "measured_at": start + timedelta(hours=i),
+                    "measure_no": 1,
+                }
+                for i in range(rows)
+            ],
+        )
+        db.commit()
+
+
+def before(rows: int) -> bytes:
+    with SessionLocal() as db:
+        items = db.execute(select(Harvest).order_by(Harvest.id).limit(rows)).scalars().all()
+        items_out = [HarvestOut.model_validate(x) for x in items]
+        payload = {"total": len(items_out), "limit": rows, "offset": 0, "items": items_out}
+        return json.dumps(jsonable_encoder(payload)).encode()
+
+
+def after(rows: int) -> bytes:
+    with SessionLocal() as db:
+        items = crud_harvest.list_rows(db, rows, 0)
+        return responses.dumps({"total": len(items), "limit": rows, "offset": 0, "items": items})
+
+
+def measure(fn, rows: int, repeat: int) -> dict:
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = len(fn(rows))
+        samples.append(time.perf_counter() - t0)
+    return {"median_ms": statistics.median(samples) * 1e3, "bytes": size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="list serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    results = {
+        "rows": args.rows,
+        "before": measure(before, args.rows, args.repeat),
+        "after": measure(after, args.rows, args.repeat),
+    }
+    b, a = results["before"]["median_ms"], results["after"]["median_ms"]
+    print(f"rows={args.rows}  before={b:.1f}ms  after={a:.1f}ms  speedup={b / a:.1f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+各エンドポイントが実際に発行するクエリを EXPLAIN ANALYZE で測る（PostgreSQL 専用）。
+
+索引マイグレーション（8850915fbf1d）の前後比較の手順:
+
+    cd api
+    alembic upgrade cef1bc732220
+    python bench/seed.py --harvest-rows 1000000 --truncate
+    python bench/explain_queries.py --out before.json
+    alembic upgrade 8850915fbf1d
+    python bench/explain_queries.py --out after.json --compare before.json
+
+クエリは app.crud の list_stmt / count_stmt から作るので、ルーターと同じ SQL になる。
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.db import engine  # noqa: E402
+from app.crud import env as crud_env  # noqa: E402
+from app.crud import harvest as crud_harvest  # noqa: E402
+from app.crud.harvest import month_range  # noqa: E402
+
+
+def cases(sample: dict) -> dict:
+    """エンドポイント名 → SQLAlchemy の statement。値は seed 済みデータから拾う。"""
+    month = sample["month"]
+    start, end = month_range(month)
+    by_company_crop = {"company": sample["company"], "crop": sample["crop"]}
+    return {
+        "GET /harvest/ (page)": crud_harvest.list_stmt(50, 0),
+        "GET /harvest/ (deep page)": crud_harvest.list_stmt(50, 10_000),
+        "GET /harvest/?month": crud_harvest.list_stmt(50, 0, month=month),
+        "count ?month": crud_harvest.count_stmt(month=month),
+        "GET /harvest/?company&crop&range": crud_harvest.list_stmt(
+            200, 0, measured_from=start, measured_to=end, **by_company_crop
+        ),
+        "count ?company&crop&range": crud_harvest.count_stmt(
+            measured_from=start, measured_to=end, **by_company_crop
+        ),
+        "count ?range": crud_harvest.count_stmt(measured_from=start, measured_to=end),
+        "GET /env/harvest?medium&month": crud_env.list_stmt(
+            100, 0, month=sample["env_month"], medium=sample["medium"]
+        ),
+    }
+
+
+def pick_sample(conn) -> dict:
+    h = conn.exec_driver_sql(
+        "SELECT company, crop, month FROM harvest ORDER BY id OFFSET "
+        "(SELECT count(*) / 2 FROM harvest) LIMIT 1"
+    ).first()
+    e = conn.exec_driver_sql("SELECT medium, month FROM env LIMIT 1").first()
+    if h is None or e is None:
+        raise SystemExit("harvest / env が空です。先に bench/seed.py を実行してください。")
+    return {"company": h[0], "crop": h[1], "month": h[2], "medium": e[0], "env_month": e[1]}
+
+
+def _scans(plan: dict) -> list[str]:
+    # プランツリーから走査ノードだけ拾う（どの索引・パーティションを読んだか）
+    out = []
+    node_type = plan.get("Node Type", "")
+    if "Scan" in node_type:
+        target = plan.get("Index Name") or plan.get("Relation Name", "")
+        out.append(f"{node_type}:{target}")
+    for child in plan.get("Plans", []):
+        out.extend(_scans(child))
+    return out
+
+
+def explain(conn, stmt, repeat: int) -> dict:
+    compiled = stmt.compile(dialect=conn.dialect)
+    sql = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(compiled)
+    times = []
+    plan = None
+    for _ in range(repeat):
+        result = conn.exec_driver_sql(sql, compiled.params).scalar_one()
+        doc = result[0] if isinstance(result, list) else json.loads(result)[0]
+        times.append(doc["Execution Time"])
+        plan = doc["Plan"]
+    scans = _scans(plan)
+    return {
+        "execution_ms": statistics.median(times),
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "partitions": len(scans),
+        "scans": scans,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE per endpoint query")
+    parser.add_argument("--repeat", type=int, default=5, help="中央値を取る回数")
+    parser.add_argument("--out", help="結果 JSON の出力先")
+    parser.add_argument("--compare", help="比較対象（前回の --out）")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("PostgreSQL の DATABASE_URL が必要です。")
+
+    with engine.connect() as conn:
+        sample = pick_sample(conn)
+        results = {name: explain(conn, stmt, args.repeat) for name, stmt in cases(sample).items()}
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else {}
+
+    print(f"{'query':<36}{'ms':>10}{'before':>10}{'change':>9}  scans")
+    for name, r in results.items():
+        ms = r["execution_ms"]
+        line = f"{name:<36}{ms:>10.2f}"
+        if name in baseline:
+            before = baseline[name]["execution_ms"]
+            line += f"{before:>10.2f}{(ms - before) / before * 100 if before else 0:>8.0f}%"
+        else:
+            line += f"{'-':>10}{'-':>9}"
+        print(f"{line}  {', '.join(sorted(set(r['scans'])))[:80]}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
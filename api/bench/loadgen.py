@@ -0,0 +1,266 @@
+"""
+API の負荷試験。非同期クライアントで各ワークロードを並列に叩き、
+p50/p95/p99 レイテンシと RPS を JSON で出す。
+
+    cd api
+    python bench/seed.py --harvest-rows 100000 --users 10 --truncate
+    uvicorn app.main:app --port 8000 &
+    python bench/loadgen.py --base-url http://localhost:8000 --out report.json \\
+        --baseline bench/baseline.json
+
+--in-process を付けるとサーバーを立てずに ASGI で直接叩く（手元の回帰確認用）。
+--baseline の値より p95 が --tolerance 以上悪化、または RPS が下がると exit 1。
+基準値の記録は --save-baseline（同じマシン・同じ seed 条件で取ること）。
+
+ワークロード:
+  list   GET /harvest/?limit=50&offset=<ランダム>
+  get    GET /harvest/{id}
+  create POST /harvest/（company は bench-loadgen-<run_id>。作った行は最後に DELETE で消す）
+  bulk   GET /harvest/?limit=200 で先頭から --bulk-pages ページ読み切る（1回 = 1ページ）
+  auth   POST /auth/login → POST /auth/refresh
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+WORKLOADS = ("list", "get", "create", "bulk", "auth")
+JST = timezone(timedelta(hours=9))
+BENCH_PREFIX = "bench-"  # seed.py と同じ（--truncate で消える）
+
+
+class Context:
+    """ワークロード間で共有する状態（トークン・既存 id・採番）。"""
+
+    def __init__(self, username: str, password: str, bulk_pages: int, seed: int) -> None:
+        self.username = username
+        self.password = password
+        self.bulk_pages = bulk_pages
+        self.rng = random.Random(seed)
+        self.headers: dict[str, str] = {}
+        self.ids: list[int] = []
+        self.created: list[int] = []
+        self.total = 0
+        self.bulk_offset = itertools.cycle(range(0, bulk_pages * 200, 200))
+        self.create_no = itertools.count(1)
+        self.run_id = int(time.time())
+
+
+async def prepare(client: httpx.AsyncClient, ctx: Context) -> None:
+    r = await client.post("/auth/login", data={"username": ctx.username, "password": ctx.password})
+    r.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    r = await client.get("/harvest/", params={"limit": 200}, headers=ctx.headers)
+    r.raise_for_status()
+    body = r.json()
+    ctx.total = body["total"]
+    ctx.ids = [item["id"] for item in body["items"]]
+    if not ctx.ids:
+        raise SystemExit("harvest が空です。先に bench/seed.py を実行してください。")
+
+
+async def op_list(client, ctx):
+    offset = ctx.rng.randrange(max(1, min(ctx.total, 10_000)))
+    return await client.get("/harvest/", params={"limit": 50, "offset": offset}, headers=ctx.headers)
+
+
+async def op_get(client, ctx):
+    return await client.get(f"/harvest/{ctx.rng.choice(ctx.ids)}", headers=ctx.headers)
+
+
+async def op_create(client, ctx):
+    n = next(ctx.create_no)
+    payload = {
+        "company": f"{BENCH_PREFIX}loadgen-{ctx.run_id}",
+        "crop": "bench",
+        "amount_kg": round(ctx.rng.uniform(0.1, 50), 3),
+        "measured_at": datetime.now(JST).isoformat(),
+        "measure_no": n,
+    }
+    r = await client.post("/harvest/", json=payload, headers=ctx.headers)
+    if r.status_code == 201:
+        ctx.created.append(r.json()["id"])
+    return r
+
+
+async def op_bulk(client, ctx):
+    return await client.get(
+        "/harvest/", params={"limit": 200, "offset": next(ctx.bulk_offset)}, headers=ctx.headers
+    )
+
+
+async def op_auth(client, ctx):
+    r = await client.post("/auth/login", data={"username": ctx.username, "password": ctx.password})
+    if r.status_code != 200:
+        return r
+    return await client.post("/auth/refresh", json={"refresh_token": r.json()["refresh_token"]})
+
+
+async def cleanup(client: httpx.AsyncClient, ctx: Context, concurrency: int) -> int:
+    """create で作った行を消す（計測の外）。消せなかった行は seed.py --truncate で消える。"""
+    deleted = 0
+    for i in range(0, len(ctx.created), concurrency):
+        batch = ctx.created[i : i + concurrency]
+        rs = await asyncio.gather(
+            *(client.delete(f"/harvest/{id_}", headers=ctx.headers) for id_ in batch),
+            return_exceptions=True,
+        )
+        deleted += sum(1 for r in rs if isinstance(r, httpx.Response) and r.status_code == 204)
+    ctx.created.clear()
+    return deleted
+
+
+OPS = {"list": op_list, "get": op_get, "create": op_create, "bulk": op_bulk, "auth": op_auth}
+
+
+async def run_workload(client, ctx, name: str, concurrency: int, duration: float) -> dict:
+    op = OPS[name]
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                r = await op(client, ctx)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    ms = sorted(x * 1e3 for x in latencies)
+    q = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": len(ms) / elapsed,
+        "p50_ms": q[49],
+        "p95_ms": q[94],
+        "p99_ms": q[98],
+        "max_ms": ms[-1],
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """基準値より悪化した項目を返す。"""
+    failures = []
+    for name, cur in report["workloads"].items():
+        base = baseline.get("workloads", {}).get(name)
+        if not base or not cur.get("requests"):
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {cur['p95_ms']:.1f}ms")
+        if cur["rps"] < base["rps"] * (1 - tolerance):
+            failures.append(f"{name}: rps {base['rps']:.0f} -> {cur['rps']:.0f}")
+        if cur["errors"] > base.get("errors", 0):
+            failures.append(f"{name}: errors {base.get('errors', 0)} -> {cur['errors']}")
+    return failures
+
+
+def make_client(args) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.in_process:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://loadgen", limits=limits)
+    return httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0)
+
+
+async def main_async(args) -> dict:
+    ctx = Context(args.username, args.password, args.bulk_pages, args.seed)
+    async with make_client(args) as client:
+        await prepare(client, ctx)
+        workloads = {}
+        try:
+            for name in args.workloads:
+                workloads[name] = await run_workload(client, ctx, name, args.concurrency, args.duration)
+                w = workloads[name]
+                print(
+                    f"{name:<8} n={w['requests']:<7} err={w['errors']:<4} rps={w['rps']:>8.1f} "
+                    f"p50={w.get('p50_ms', 0):>7.1f} p95={w.get('p95_ms', 0):>7.1f} "
+                    f"p99={w.get('p99_ms', 0):>7.1f} ms"
+                )
+        finally:
+            if ctx.created:
+                n = len(ctx.created)
+                print(f"cleanup: deleted {await cleanup(client, ctx, args.concurrency)}/{n} created rows")
+    return {
+        "target": "in-process" if args.in_process else args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "workloads": workloads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="async load generator for the Heartful API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="ASGI で直接叩く")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="ワークロードごとの秒数")
+    parser.add_argument("--bulk-pages", type=int, default=50)
+    parser.add_argument("--username", default="bench-0000")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="レポート JSON の出力先")
+    parser.add_argument("--baseline", help="比較する基準レポート")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果を --baseline に保存")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="許容する悪化率")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if not args.baseline:
+        return
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"OK: baseline saved to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"[WARN] baseline がありません: {baseline_path}（--save-baseline で作成）")
+        return
+
+    failures = compare(report, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if failures:
+        print("=" * 60)
+        print(f"PERFORMANCE REGRESSION (tolerance {args.tolerance:.0%})")
+        for f in failures:
+            print(f"  - {f}")
+        print("=" * 60)
+        sys.exit(1)
+    print("OK: no regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+ベンチマーク用のデータを DATABASE_URL に投入する。
+
+    cd api && python bench/seed.py --harvest-rows 1000000 --env-rows 50000 --users 10
+
+users は bench-0000, bench-0001, ... で、パスワードはすべて --password。
+投入する行は harvest.company / env.medium / users.username がすべて bench- で始まり、
+--truncate はその行だけを消す（同じ DB にある本番のデータには触らない）。
+
+テーブルは alembic upgrade 済みであること（パーティション・索引を含めて測るため）。
+乱数は --seed で固定するので、同じ引数なら同じデータになる。
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.auth import get_password_hash  # noqa: E402
+from app.core.db import engine  # noqa: E402
+from app.models.env import Env  # noqa: E402
+from app.models.harvest import Harvest  # noqa: E402
+from app.models.users import User  # noqa: E402
+
+JST = timezone(timedelta(hours=9))
+# ベンチで作る行の目印（company / medium / username の接頭辞。loadgen.py の create も使う）
+BENCH_PREFIX = "bench-"
+MEDIUMS = ["soil", "sand", "rockwool", "coir", "hydro"]
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def harvest_rows(n: int, companies: int, crops: int, months: int, rng: random.Random):
+    start = datetime(2024, 1, 1, tzinfo=JST)
+    span = timedelta(days=30 * months).total_seconds()
+    # measured_at はほぼ単調増加（実運用の取り込み順に近づける）
+    for i in range(n):
+        measured_at = start + timedelta(seconds=span * i / n + rng.random())
+        yield {
+            "month": measured_at.strftime("%Y-%m"),
+            "company": f"{BENCH_PREFIX}company-{rng.randrange(companies):03d}",
+            "crop": f"crop-{rng.randrange(crops):02d}",
+            "amount_kg": round(rng.uniform(0.1, 50.0), 3),
+            "measured_at": measured_at,
+            "measure_no": i + 1,
+        }
+
+
+def env_rows(n: int, months: int, rng: random.Random):
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        m = start + timedelta(days=30 * (i % months))
+        yield {
+            "month": m.strftime("%Y-%m"),
+            "temperature": round(rng.uniform(5, 35), 2),
+            "humidity": round(rng.uniform(30, 95), 2),
+            "medium": BENCH_PREFIX + MEDIUMS[i % len(MEDIUMS)],
+            "water_content": round(rng.uniform(10, 60), 2),
+            "illuminance": round(rng.uniform(0, 1200), 1),
+        }
+
+
+def user_rows(n: int, password: str):
+    # bcrypt は遅いので1回だけハッシュして使い回す
+    password_hash = get_password_hash(password)
+    for i in range(n):
+        yield {"username": f"{BENCH_PREFIX}{i:04d}", "password_hash": password_hash}
+
+
+def insert(conn, table, rows, batch_size: int) -> int:
+    total = 0
+    for batch in _batches(rows, batch_size):
+        conn.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="seed harvest / env / users for benchmarks")
+    parser.add_argument("--harvest-rows", type=int, default=100_000)
+    parser.add_argument("--env-rows", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--companies", type=int, default=30)
+    parser.add_argument("--crops", type=int, default=12)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="投入前に前回のベンチの行（bench-*）を消す")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if args.truncate:
+            like = f"{BENCH_PREFIX}%"
+            conn.execute(Harvest.__table__.delete().where(Harvest.company.like(like)))
+            conn.execute(Env.__table__.delete().where(Env.medium.like(like)))
+            conn.execute(User.__table__.delete().where(User.username.like(like)))
+        n_h = insert(
+            conn,
+            Harvest.__table__,
+            harvest_rows(args.harvest_rows, args.companies, args.crops, args.months, rng),
+            args.batch_size,
+        )
+        n_e = insert(conn, Env.__table__, env_rows(args.env_rows, args.months, rng), args.batch_size)
+        n_u = insert(conn, User.__table__, user_rows(args.users, args.password), args.batch_size)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE harvest"))
+            conn.execute(text("ANALYZE env"))
+
+    print(f"OK: harvest={n_h} env={n_e} users={n_u} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import getpass
-from sqlalchemy import text
 from passlib.context import CryptContext
-from db_config import get_engine
 from app.models.base import Base
-from app.core.db import engine
+from app.core.db import SessionLocal, engine
+from app.db.users import create_user
 
 Base.metadata.create_all(bind=engine)
 
@@ -14,15 +13,10 @@ def main():
     password = getpass.getpass("password: ").strip()
     password_hash = pwd_context.hash(password)
 
-    engine = get_engine()
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-                INSERT INTO users (username, password_hash)
-                VALUES (:u, :p)
-            """),
-            {"u": username, "p": password_hash},
-        )
+    # app.db.users を通す（ユーザーのキャッシュを捨てる）。
+    # 起動中の API とは別プロセスなので、API 側のキャッシュは AUTH_CACHE_TTL_SECONDS で切れる
+    with SessionLocal() as db:
+        create_user(db, username, password_hash)
 
     print("OK: user created")
 
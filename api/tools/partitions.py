@@ -0,0 +1,42 @@
+"""
+月パーティションの保守。cron などから定期実行する想定。
+
+    python tools/partitions.py ensure [--months-ahead 3]
+    python tools/partitions.py archive --table harvest --before 2024-01 [--drop]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.db import engine
+from app.db.partitions import archive_partitions, ensure_future_partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="harvest / env の月パーティション保守")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_ensure = sub.add_parser("ensure", help="先の月パーティションを作る")
+    p_ensure.add_argument("--months-ahead", type=int, default=3)
+
+    p_archive = sub.add_parser("archive", help="古い月パーティションを切り離す")
+    p_archive.add_argument("--table", choices=["harvest", "env"], required=True)
+    p_archive.add_argument("--before", required=True, help="YYYY-MM（この月は残す）")
+    p_archive.add_argument("--schema", default="archive")
+    p_archive.add_argument("--drop", action="store_true", help="退避せずに DROP する")
+
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.cmd == "ensure":
+            created = ensure_future_partitions(conn, args.months_ahead)
+            print(f"OK: created {created}")
+        else:
+            parts = archive_partitions(conn, args.table, args.before, args.schema, args.drop)
+            print(f"OK: {'dropped' if args.drop else 'archived'} {parts}")
+
+
+if __name__ == "__main__":
+    main()
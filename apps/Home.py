@@ -9,25 +9,56 @@ if str(ROOT_DIR) not in sys.path:
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
-from db_config import get_engine
+from apps.common import db, frames, table_stats
 
 st.set_page_config(page_title="Heartful Analytics", layout="wide")
 st.title("はーとふる農園ダッシュボード(Stage)")
 
-engine = get_engine()
+# 読み取りは読み取り専用のエンジン、カタログの登録・数え直しだけ書き込み用を使う
+engine = db.read_engine()
+writer = db.write_engine()
+
+# Home に件数を出すテーブル → 表示名
+COUNT_TABLES = {
+    "raw_csv": "raw_csv",
+    "env_header": "env_header",
+    "env_rows": "env_rows",
+    "staging_monthly": "staging",
+    "harvest_monthly": "harvest",
+}
 
 @st.cache_data(ttl=60)
-def load_counts():
-    q = """
-    select 'raw_csv' as tbl, count(*) as rows from raw_csv
-    union all select 'env_header', count(*) from env_header
-    union all select 'env_rows', count(*) from env_rows
-    union all select 'staging', count(*) from staging_monthly
-    union all select 'harvest', count(*) from harvest_monthly
+def load_stats() -> pd.DataFrame:
     """
-    return pd.read_sql(q, engine)
+    table_stats（取り込み時に更新される件数カタログ）を読む。count(*) はしない。
+    カタログにまだ無いテーブルだけ、初回に数えて登録する。
+    """
+    with engine.connect() as conn:
+        stats = table_stats.load(conn)
+    known = set(stats.loc[stats["farm"] == "", "tbl"])
+    missing = [t for t in COUNT_TABLES if t not in known]
+    if missing:
+        with writer.begin() as conn:
+            table_stats.refresh_all(conn, missing)
+            stats = table_stats.load(conn)
+    return stats
+
+def load_counts(stats: pd.DataFrame) -> pd.DataFrame:
+    total = stats[(stats["farm"] == "") & stats["tbl"].isin(list(COUNT_TABLES))]
+    out = total.assign(tbl=total["tbl"].map(COUNT_TABLES))
+    order = {name: i for i, name in enumerate(COUNT_TABLES.values())}
+    out = out.sort_values("tbl", key=lambda s: s.map(order))
+    return out[["tbl", "rows", "min_ts", "max_ts", "updated_at"]]
+
+def load_freshness(stats: pd.DataFrame) -> pd.DataFrame:
+    """圃場ごとの最新データ（テーブルごとの max_ts）。"""
+    per_farm = stats[stats["farm"] != ""]
+    if per_farm.empty:
+        return per_farm
+    return per_farm.pivot(index="farm", columns="tbl", values="max_ts").reset_index()
 
 @st.cache_data(ttl=60)
+@frames.compact_loader(months=("month",), measures=("total_kg",))
 def load_harvest_summary():
     q = """
     select month, sum(total_kg) as total_kg
@@ -41,7 +72,21 @@ col1, col2 = st.columns([1,2], gap="large")
 
 with col1:
     st.subheader("テーブル件数")
-    st.dataframe(load_counts(), use_container_width=True, hide_index=True)
+    stats = load_stats()
+    st.dataframe(load_counts(stats), use_container_width=True, hide_index=True)
+    if st.button("件数を数え直す"):
+        # 取り込みスクリプト以外（手作業の SQL など）で書き換えたとき用
+        with writer.begin() as conn:
+            table_stats.refresh_all(conn, COUNT_TABLES)
+        load_stats.clear()
+        st.rerun()
+
+    st.subheader("圃場ごとの最新データ")
+    freshness = load_freshness(stats)
+    if freshness.empty:
+        st.caption("圃場ごとの記録はまだありません。")
+    else:
+        st.dataframe(freshness, use_container_width=True, hide_index=True)
 
 with col2:
     st.subheader("月次合計（全ファーム）")
@@ -0,0 +1,340 @@
+"""
+ブランド別月次収量の集計キューブ（farm_group × category × crop × brand × month）。
+
+06_Brand_Monthly は v_brand_monthly を全件読み、フィルタとグラフの切り替えのたびに
+明細を isin で絞って groupby していた。取り込み時に集計済みのキューブを作っておき、
+画面はキューブを NumPy の添字で切り出すだけにする。
+
+    with engine.begin() as conn:
+        brand_cube.refresh(conn, months={"2025-08"})     # 取り込んだ月だけ作り直す
+
+    cube = brand_cube.load(conn)
+    cube.options("crop", {"farm_group": ("Aikawa",)})
+    cube.slice({"category": ("FRUIT",)}, by=("farm_group", "crop", "month"))
+
+- 次元の値（文字列）は cube_dim で整数コードにする。コードは追加だけで変わらない
+  （brand は constants.py の "Aikawa-FRUIT-Ichigo" のような文字列がそのまま label になる）
+- month は 'YYYY-MM' → 年 * 12 + (月 - 1) の整数
+- 値が NULL の次元は MISSING_LABEL にそろえる
+- rollup: 品目の次元は brand → crop → category の順に畳んだ行も持つ（畳んだ次元は ALL = -1）。
+  slice() は必要な次元を持つ、いちばん粗い行だけを使う
+- conn は SQLAlchemy の Connection か sqlite3.Connection（import_runs と同じ）
+"""
+import sqlite3
+from typing import Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+SOURCE = "v_brand_monthly"
+
+DIMS = ("farm_group", "category", "crop", "brand", "month")
+
+# キューブの次元 → v_brand_monthly の列
+SOURCE_COLUMNS = {
+    "farm_group": "farm_group",
+    "category": "category",
+    "crop": "crop_name_ja",
+    "brand": "brand_code",
+    "month": "month",
+}
+
+# rollup の段階（細かい順）。品目以外の farm_group / month はどの段階にも残す
+ROLLUPS = {
+    "brand": ("farm_group", "category", "crop", "brand", "month"),
+    "crop": ("farm_group", "category", "crop", "month"),
+    "category": ("farm_group", "category", "month"),
+    "farm_group": ("farm_group", "month"),
+}
+PRODUCT_DIMS = ("category", "crop", "brand")
+
+ALL = -1
+MISSING_LABEL = "Unknown"
+
+DIM_DDL = """
+CREATE TABLE IF NOT EXISTS cube_dim (
+  dim    TEXT NOT NULL,       -- farm_group / category / crop / brand
+  code   INTEGER NOT NULL,
+  label  TEXT NOT NULL,
+  name   TEXT,                -- 表示名（brand は brand_name_ja）
+  PRIMARY KEY (dim, code),
+  UNIQUE (dim, label)
+);
+"""
+
+CUBE_DDL = """
+CREATE TABLE IF NOT EXISTS brand_cube (
+  farm_group  INTEGER NOT NULL,
+  category    INTEGER NOT NULL,   -- ALL(-1) は畳んだ次元
+  crop        INTEGER NOT NULL,
+  brand       INTEGER NOT NULL,
+  month       INTEGER NOT NULL,   -- 年 * 12 + (月 - 1)
+  total_kg    REAL NOT NULL,
+  rows        INTEGER NOT NULL,   -- 元になった v_brand_monthly の行数
+  PRIMARY KEY (farm_group, category, crop, brand, month)
+);
+"""
+
+INSERT_SQL = """
+INSERT INTO brand_cube (farm_group, category, crop, brand, month, total_kg, rows)
+VALUES (?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+def _execute(conn, sql: str, params: tuple = ()):
+    if isinstance(conn, sqlite3.Connection):
+        return conn.execute(sql, params)
+    return conn.exec_driver_sql(sql, params)
+
+
+def _executemany(conn, sql: str, rows: list) -> None:
+    if not rows:
+        return
+    if isinstance(conn, sqlite3.Connection):
+        conn.executemany(sql, rows)
+    else:
+        conn.exec_driver_sql(sql, rows)
+
+
+def _exists(conn, name: str) -> bool:
+    return bool(_execute(conn, f'PRAGMA table_info("{name}");').fetchall())
+
+
+def ensure_tables(conn) -> None:
+    _execute(conn, DIM_DDL)
+    _execute(conn, CUBE_DDL)
+
+
+def is_empty(conn) -> bool:
+    """キューブが無い・行が無いとき True。"""
+    if not _exists(conn, "brand_cube"):
+        return True
+    return _execute(conn, "SELECT 1 FROM brand_cube LIMIT 1;").fetchone() is None
+
+
+def month_code(month: pd.Series) -> pd.Series:
+    """'YYYY-MM'（'YYYY-MM-DD' も可）→ 年 * 12 + (月 - 1)。読めない値は NA。"""
+    text = month.astype("string").str.slice(0, 7)
+    year = pd.to_numeric(text.str.slice(0, 4), errors="coerce")
+    mon = pd.to_numeric(text.str.slice(5, 7), errors="coerce")
+    return (year * 12 + mon - 1).astype("Int64")
+
+
+def month_label(code: int) -> str:
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def _encode(conn, dim: str, labels: pd.Series) -> np.ndarray:
+    """label → コード。まだ無い label は cube_dim に追加する。"""
+    mapping = dict(_execute(conn, "SELECT label, code FROM cube_dim WHERE dim = ?;", (dim,)).fetchall())
+    new = [label for label in pd.unique(labels) if label not in mapping]
+    start = max(mapping.values(), default=-1) + 1
+    rows = [(dim, start + i, label) for i, label in enumerate(new)]
+    _executemany(conn, "INSERT INTO cube_dim (dim, code, label) VALUES (?, ?, ?);", rows)
+    mapping.update({label: code for _, code, label in rows})
+    return labels.map(mapping).to_numpy(dtype=np.int64)
+
+
+def _rollup(base: pd.DataFrame) -> pd.DataFrame:
+    """最も細かい行から各段階の合計を作り、畳んだ次元を ALL にして縦につなぐ。"""
+    frames = [base]
+    for level, dims in ROLLUPS.items():
+        if level == "brand":
+            continue
+        part = base.groupby(list(dims), as_index=False, sort=False).agg(
+            total_kg=("total_kg", "sum"), rows=("rows", "sum")
+        )
+        for dim in PRODUCT_DIMS:
+            if dim not in dims:
+                part[dim] = ALL
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True)[list(DIMS) + ["total_kg", "rows"]]
+
+
+def refresh(conn, months: Optional[Iterable[str]] = None) -> int:
+    """
+    v_brand_monthly からキューブを作り直す。months（'YYYY-MM'）を渡すとその月だけ。
+    v_brand_monthly が無ければ何もしない（空のキューブも作らない）。
+    キューブがまだ空なら、months を渡されても全体を作る。戻り値: キューブに書いた行数。
+    """
+    if not _exists(conn, SOURCE):
+        return 0
+    ensure_tables(conn)
+    if months is not None and is_empty(conn):
+        months = None
+
+    columns = ", ".join(SOURCE_COLUMNS.values())
+    sql = f"SELECT {columns}, brand_name_ja, total_kg FROM {SOURCE}"
+    params: tuple = ()
+    if months is not None:
+        months = sorted(set(months))
+        if not months:
+            return 0
+        sql += f" WHERE substr(month, 1, 7) IN ({', '.join('?' * len(months))})"
+        params = tuple(months)
+    src = pd.DataFrame(
+        _execute(conn, sql + ";", params).fetchall(),
+        columns=list(DIMS) + ["brand_name", "total_kg"],
+    )
+
+    if months is None:
+        _execute(conn, "DELETE FROM brand_cube;")
+    else:
+        codes = [int(c) for c in month_code(pd.Series(months)).dropna()]
+        if codes:
+            _execute(
+                conn,
+                f"DELETE FROM brand_cube WHERE month IN ({', '.join('?' * len(codes))});",
+                tuple(codes),
+            )
+
+    src["month"] = month_code(src["month"])
+    src["total_kg"] = pd.to_numeric(src["total_kg"], errors="coerce")
+    src = src.dropna(subset=["month", "total_kg"])
+    if src.empty:
+        return 0
+
+    encoded = pd.DataFrame({"month": src["month"].to_numpy(dtype=np.int64)})
+    for dim in DIMS[:-1]:
+        labels = src[dim].astype("string").str.strip().fillna(MISSING_LABEL)
+        encoded[dim] = _encode(conn, dim, labels.astype(object))
+    encoded["total_kg"] = src["total_kg"].to_numpy(dtype=float)
+
+    # brand の表示名（同じ brand に複数あれば最初のもの）
+    names = src.dropna(subset=["brand_name"]).drop_duplicates("brand")
+    _executemany(
+        conn,
+        "UPDATE cube_dim SET name = ? WHERE dim = 'brand' AND label = ?;",
+        list(zip(names["brand_name"].astype(str), names["brand"].astype(str).str.strip())),
+    )
+
+    base = encoded.groupby(list(DIMS), as_index=False, sort=False).agg(
+        total_kg=("total_kg", "sum"), rows=("total_kg", "size")
+    )
+    cube = _rollup(base)
+    _executemany(conn, INSERT_SQL, list(cube.astype(object).itertuples(index=False, name=None)))
+    return len(cube)
+
+
+class BrandCube:
+    """
+    キューブをメモリに持ち、フィルタ + group by に答える。
+    行ごとの次元コードを NumPy 配列で持ち、絞り込みは「許可するコードの表」を添字で引き、
+    集計は group by の次元をまとめた1次元の位置で bincount する（明細は読まない）。
+    """
+
+    def __init__(self, cells: pd.DataFrame, dims: pd.DataFrame) -> None:
+        self.codes = {dim: cells[dim].to_numpy(dtype=np.int64) for dim in DIMS}
+        self.total_kg = cells["total_kg"].to_numpy(dtype=float)
+        self.rows = cells["rows"].to_numpy(dtype=np.int64)
+
+        # コード → label（month はキューブ内の最小の月からの位置にする）
+        self.labels: dict[str, np.ndarray] = {}
+        self.index: dict[str, dict] = {}
+        for dim in DIMS[:-1]:
+            d = dims[dims["dim"] == dim]
+            size = int(d["code"].max()) + 1 if len(d) else 0
+            self.labels[dim] = np.full(size, MISSING_LABEL, dtype=object)
+            self.labels[dim][d["code"].to_numpy(dtype=np.int64)] = d["label"].to_numpy()
+            self.index[dim] = dict(zip(d["label"], d["code"]))
+        brands = dims[dims["dim"] == "brand"]
+        self.brand_names = self.labels["brand"].copy()
+        named = brands.dropna(subset=["name"])
+        self.brand_names[named["code"].to_numpy(dtype=np.int64)] = named["name"].to_numpy()
+
+        month = self.codes["month"]
+        first = int(month.min()) if len(month) else 0
+        n_months = int(month.max()) - first + 1 if len(month) else 0
+        self.codes["month"] = month - first
+        self.labels["month"] = np.array([month_label(first + i) for i in range(n_months)], dtype=object)
+        self.index["month"] = {label: i for i, label in enumerate(self.labels["month"])}
+
+        # 段階ごとの行番号（その段階の次元が ALL でなく、畳んだ次元が ALL の行）
+        self._levels = {}
+        for level, level_dims in ROLLUPS.items():
+            mask = np.ones(len(cells), dtype=bool)
+            for dim in PRODUCT_DIMS:
+                is_all = self.codes[dim] == ALL
+                mask &= ~is_all if dim in level_dims else is_all
+            self._levels[level] = np.flatnonzero(mask)
+
+    @classmethod
+    def empty(cls) -> "BrandCube":
+        return cls(
+            pd.DataFrame(columns=list(DIMS) + ["total_kg", "rows"]),
+            pd.DataFrame(columns=["dim", "code", "label", "name"]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.total_kg)
+
+    def _level_for(self, dims: Iterable[str]) -> str:
+        needed = set(dims)
+        for level in reversed(ROLLUPS):  # 粗い順
+            if needed <= set(ROLLUPS[level]):
+                return level
+        raise ValueError(f"unknown dims: {sorted(needed - set(DIMS))}")
+
+    def _select(self, filters: Mapping[str, Sequence[str]], dims: Iterable[str]) -> np.ndarray:
+        """filters を満たす行番号。値が空のフィルタは絞り込まない。"""
+        filters = {dim: values for dim, values in filters.items() if values}
+        idx = self._levels[self._level_for(set(dims) | set(filters))]
+        for dim, values in filters.items():
+            allowed = np.zeros(len(self.labels[dim]), dtype=bool)
+            allowed[[self.index[dim][v] for v in values if v in self.index[dim]]] = True
+            idx = idx[allowed[self.codes[dim][idx]]]
+        return idx
+
+    def options(self, dim: str, filters: Optional[Mapping[str, Sequence[str]]] = None) -> list:
+        """filters で絞った範囲にある dim の値（並べ替え済み）。"""
+        idx = self._select(filters or {}, (dim,))
+        return sorted(self.labels[dim][np.unique(self.codes[dim][idx])].tolist())
+
+    def slice(
+        self,
+        filters: Optional[Mapping[str, Sequence[str]]] = None,
+        by: Sequence[str] = ("month",),
+    ) -> pd.DataFrame:
+        """
+        filters（次元 → 値のタプル）で絞り、by の次元ごとに合計する。
+        戻り値の列: by の各次元（label）, total_kg, rows（brand を含むときは brand_name も）。
+        """
+        by = list(by)
+        idx = self._select(filters or {}, by)
+        columns = by + (["brand_name"] if "brand" in by else []) + ["total_kg", "rows"]
+        if len(idx) == 0:
+            return pd.DataFrame(columns=columns)
+
+        shape = [len(self.labels[dim]) for dim in by]
+        flat = (
+            np.ravel_multi_index([self.codes[dim][idx] for dim in by], shape)
+            if by
+            else np.zeros(len(idx), dtype=np.int64)
+        )
+        keys, inverse = np.unique(flat, return_inverse=True)
+        total = np.bincount(inverse, weights=self.total_kg[idx], minlength=len(keys))
+        rows = np.bincount(inverse, weights=self.rows[idx], minlength=len(keys))
+
+        out = {}
+        for dim, codes in zip(by, np.unravel_index(keys, shape) if by else []):
+            out[dim] = self.labels[dim][codes]
+            if dim == "brand":
+                out["brand_name"] = self.brand_names[codes]
+        out["total_kg"] = total
+        out["rows"] = rows.astype(np.int64)
+        return pd.DataFrame(out, columns=columns)
+
+
+def load(conn) -> BrandCube:
+    """キューブ全体を読み込む（テーブルが無ければ空）。"""
+    if not _exists(conn, "brand_cube"):
+        return BrandCube.empty()
+    cells = pd.DataFrame(
+        _execute(conn, f"SELECT {', '.join(DIMS)}, total_kg, rows FROM brand_cube;").fetchall(),
+        columns=list(DIMS) + ["total_kg", "rows"],
+    )
+    dims = pd.DataFrame(
+        _execute(conn, "SELECT dim, code, label, name FROM cube_dim;").fetchall(),
+        columns=["dim", "code", "label", "name"],
+    )
+    return BrandCube(cells, dims)
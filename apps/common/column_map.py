@@ -0,0 +1,301 @@
+"""
+CSV の文字コード判定と列マッピング（取り込みスクリプト・アップロード画面で共用）。
+
+- 文字コードは先頭の数十KBだけで判定する（ファイル全体を何度も読み直さない）
+- 列の対応付けは表（ColumnRule）で定義し、正規表現はモジュール読み込み時に一度だけ compile する
+- ヘッダーのシグネチャ（正規化した列名のタプル）ごとに対応付けをキャッシュする
+- 同じロガー・同じ圃場のファイルは前回のレイアウト（文字コード・ヘッダー行・区切り）を
+  ヘッダー行の一致だけ確かめて使い回す
+"""
+import codecs
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+PREFIX_BYTES = 64 * 1024
+
+# 判定に失敗したときに最後に試す順
+FALLBACK_ENCODINGS = ("utf-8", "cp932")
+
+_WS = re.compile(r"[\s　]+")
+_NEWLINE = re.compile(r"\r\n|\n|\r")
+
+
+class ColumnMappingError(ValueError):
+    """必要な列が見つからない・ヘッダー行が見つからない。"""
+
+
+# ========= 文字コード =========
+def read_prefix(path, size: int = PREFIX_BYTES) -> bytes:
+    with Path(path).open("rb") as f:
+        return f.read(size)
+
+
+def sniff_encoding(prefix: bytes) -> str:
+    """先頭バイト列から文字コードを決める（BOM → UTF-16 の NUL 配置 → UTF-8 → CP932）。"""
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if prefix.startswith(codecs.BOM_UTF16_LE) or prefix.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    # BOM なし UTF-16LE: ASCII 部分が "x\0x\0" になる
+    sample = prefix[:4096]
+    if len(sample) >= 4 and sample[1::2].count(0) > len(sample) // 4:
+        return "utf-16le"
+    if len(sample) >= 4 and sample[0::2].count(0) > len(sample) // 4:
+        return "utf-16be"
+    for enc in FALLBACK_ENCODINGS:
+        # 末尾で多バイト文字が切れていても良いように incremental decoder で判定する
+        try:
+            codecs.getincrementaldecoder(enc)().decode(prefix, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    raise ColumnMappingError("文字コードを判別できません（UTF-8 / UTF-16 / CP932 以外）")
+
+
+def decode_prefix(prefix: bytes, encoding: str, complete: bool = False) -> list[str]:
+    """
+    先頭バイト列をデコードして行に分ける（pandas と同じく CR / LF / CRLF だけで区切る）。
+    complete=False のときは最後の（途中で切れている）行を捨てる。
+    """
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(prefix, final=complete)
+    lines = _NEWLINE.split(text)
+    if lines and (not complete or lines[-1] == ""):
+        lines = lines[:-1]
+    return lines
+
+
+def normalize(name) -> str:
+    """列名の空白・全角空白を除く（"CH 1" → "CH1"）。"""
+    return _WS.sub("", str(name))
+
+
+def split_fields(line: str, sep: str) -> list[str]:
+    return [f.strip().strip('"') for f in line.split(sep)]
+
+
+def sniff_sep(line: str) -> str:
+    return "\t" if line.count("\t") > line.count(",") else ","
+
+
+# ========= 列マッピング =========
+@dataclass(frozen=True)
+class ColumnRule:
+    """target 列に対応するヘッダー名のパターン。先に書いたパターンほど優先。"""
+
+    target: str
+    patterns: tuple
+    required: bool = True
+
+    @classmethod
+    def of(cls, target: str, *patterns: str, required: bool = True, flags: int = re.IGNORECASE):
+        return cls(target, tuple(re.compile(p, flags) for p in patterns), required)
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    rules: tuple
+
+
+@lru_cache(maxsize=256)
+def resolve(spec: ColumnSpec, signature: tuple) -> dict:
+    """
+    ヘッダーのシグネチャ（正規化済み列名のタプル）から target → 列位置 を決める。
+    同じシグネチャは2回目以降キャッシュから返る。
+
+    パターンの優先順 → 列の並び順 で探し、一度使った列は他の target に割り当てない
+    （"収穫量（ｇ）" を日付や企業名の規則が奪わないように）。
+    """
+    taken: set[int] = set()
+    mapping: dict[str, int] = {}
+    for rule in spec.rules:
+        for pat in rule.patterns:
+            pos = next(
+                (i for i, name in enumerate(signature) if i not in taken and pat.search(name)),
+                None,
+            )
+            if pos is not None:
+                mapping[rule.target] = pos
+                taken.add(pos)
+                break
+    missing = [r.target for r in spec.rules if r.required and r.target not in mapping]
+    if missing:
+        raise ColumnMappingError(
+            f"{spec.name}: 必要な列が見つかりません: {missing} / 実際の列: {list(signature)}"
+        )
+    return mapping
+
+
+# 収穫 CSV: 収穫日,企業名,収穫野菜名,収穫量（ｇ）
+HARVEST_SPEC = ColumnSpec(
+    "harvest",
+    (
+        ColumnRule.of("date", r"^収穫日$", r"収穫日|日付|日時|^date$"),
+        ColumnRule.of("company", r"^企業名$", r"企業|会社|^farm$|^company$"),
+        ColumnRule.of("crop", r"^収穫野菜名$", r"野菜|品目|作物|^crop$"),
+        ColumnRule.of(
+            "amount_g",
+            r"^収穫量",
+            r"[（(]\s*[gｇ]\s*[)）]$",
+            r"量$|^amount|^total_g$|^weight",
+        ),
+    ),
+)
+
+# アップロード画面の収穫 CSV: farm × month の合計だけ作るので作物列は使わない
+HARVEST_TOTAL_SPEC = ColumnSpec(
+    "harvest_total",
+    tuple(rule for rule in HARVEST_SPEC.rules if rule.target != "crop"),
+)
+
+# GL240: 番号,日付 時間,ms,CH1,...,CH10,Alarm1,AlarmOut（CH 表記は "CH 1" / "CH01" もある）
+GL240_SPEC = ColumnSpec(
+    "gl240",
+    (
+        ColumnRule.of(
+            "ts", r"^(time|時刻|datetime|日付時刻|日付時間)$", r"time", r"日付|日時|時間"
+        ),
+        *(
+            ColumnRule.of(f"ch{n}", rf"^ch[_\-]*0*{n}$", rf"^ch[_\-]*0*{n}(?!\d)")
+            for n in range(1, 6)
+        ),
+    ),
+)
+
+# ヘッダー行の検出（CH1 と CH2 の両方を含み、CH 定義表の "CH1,CH 1" 行は除く）
+_CH1 = re.compile(r"(?:^|[,\t])\s*CH\s*0*1\s*(?:[,\t]|$)", re.IGNORECASE)
+_CH2 = re.compile(r"(?:^|[,\t])\s*CH\s*0*2\s*(?:[,\t]|$)", re.IGNORECASE)
+
+
+# ========= レイアウト =========
+@dataclass(frozen=True)
+class Layout:
+    encoding: str
+    sep: str
+    header_row: int          # 0 始まりの物理行番号
+    columns: tuple           # 正規化前の列名
+    signature: tuple         # 正規化後の列名
+    skip_rows: tuple = ()    # ヘッダー直後の単位行など（物理行番号）
+
+    def mapping(self, spec: ColumnSpec) -> dict:
+        return resolve(spec, self.signature)
+
+
+# source（ロガー名・圃場名など）→ 前回のレイアウト
+_layout_by_source: dict[tuple, Layout] = {}
+
+
+def _is_gl240_header(line: str) -> bool:
+    return bool(_CH1.search(line) and _CH2.search(line))
+
+
+def _looks_like_data(fields: list[str]) -> bool:
+    return bool(fields) and fields[0].replace(".", "", 1).lstrip("-").isdigit()
+
+
+def _build_layout(lines: list[str], encoding: str, header_row: int) -> Layout:
+    header = lines[header_row]
+    sep = sniff_sep(header)
+    columns = tuple(split_fields(header, sep))
+    skip = ()
+    # GL240 のヘッダー直後にある単位行（NO.,Time,ms,゜C,...）は読まない
+    if header_row + 1 < len(lines):
+        nxt = split_fields(lines[header_row + 1], sep)
+        if nxt and not _looks_like_data(nxt) and nxt[0].upper().startswith("NO"):
+            skip = (header_row + 1,)
+    return Layout(
+        encoding=encoding,
+        sep=sep,
+        header_row=header_row,
+        columns=columns,
+        signature=tuple(normalize(c) for c in columns),
+        skip_rows=skip,
+    )
+
+
+def _cached_layout(source: Optional[tuple], prefix: bytes, complete: bool) -> Optional[Layout]:
+    if source is None or source not in _layout_by_source:
+        return None
+    cached = _layout_by_source[source]
+    try:
+        lines = decode_prefix(prefix, cached.encoding, complete)
+    except UnicodeDecodeError:
+        return None
+    # ヘッダー行と単位行が前回と同じなら検出を丸ごと省く
+    if cached.header_row >= len(lines):
+        return None
+    if tuple(split_fields(lines[cached.header_row], cached.sep)) != cached.columns:
+        return None
+    return cached
+
+
+def sniff_layout(
+    path,
+    find_header=None,
+    source: Optional[Iterable] = None,
+    prefix: Optional[bytes] = None,
+) -> Layout:
+    """
+    先頭バイト列から文字コード・区切り・ヘッダー行を決める。
+    find_header(line) -> bool でヘッダー行を判定（省略時は先頭行）。
+    source を渡すと、同じ source の前回のレイアウトを確認だけして使い回す。
+    """
+    if prefix is None:
+        prefix = read_prefix(path)
+    key = tuple(source) if source is not None else None
+
+    complete = len(prefix) < PREFIX_BYTES
+
+    cached = _cached_layout(key, prefix, complete)
+    if cached is not None:
+        return cached
+
+    encoding = sniff_encoding(prefix)
+    lines = decode_prefix(prefix, encoding, complete)
+    if find_header is None:
+        header_row = 0 if lines else None
+    else:
+        header_row = next((i for i, line in enumerate(lines) if find_header(line)), None)
+    if header_row is None:
+        raise ColumnMappingError(
+            f"ヘッダー行が先頭 {len(prefix) // 1024}KB 内に見つかりません（文字コード {encoding}）"
+        )
+
+    layout = _build_layout(lines, encoding, header_row)
+    if key is not None:
+        _layout_by_source[key] = layout
+    return layout
+
+
+def sniff_gl240(path, source: Optional[Iterable] = None) -> Layout:
+    return sniff_layout(path, find_header=_is_gl240_header, source=source)
+
+
+def sniff_harvest(path, source: Optional[Iterable] = None) -> Layout:
+    return sniff_layout(path, source=source)
+
+
+def read_kwargs(layout: Layout, spec: ColumnSpec) -> tuple[dict, list]:
+    """
+    pd.read_csv に渡す引数と、読み込み後に付ける列名（target 名）を返す。
+    必要な列だけ位置指定で読む（C エンジンで読める）。
+
+        kwargs, names = read_kwargs(layout, HARVEST_SPEC)
+        df = pd.read_csv(path, **kwargs)
+        df.columns = names
+    """
+    mapping = layout.mapping(spec)
+    by_pos = sorted((pos, target) for target, pos in mapping.items())
+    skip = set(range(layout.header_row)) | set(layout.skip_rows)
+    kwargs = {
+        "encoding": layout.encoding,
+        "sep": layout.sep,
+        "skiprows": sorted(skip),
+        "header": 0,
+        "usecols": [pos for pos, _ in by_pos],
+    }
+    # usecols は元の列順で返るので、位置順に並べた target 名をそのまま付ければよい
+    return kwargs, [target for _, target in by_pos]
@@ -9,3 +9,8 @@ FARM_BRAND_AIKAWA_LEAF_KALE         = "Aikawa-LEAF-Kale"
 FARM_JIKKEN_ICHIGO_UW    = "Jikken-Ichigo-Ue"
 FAMR_JIKKEN_ICHIGO_BED   = "Jikken-Ichigo-Bed"
 FARM_JIKKEN_ICHIGO_SHITA = "Jikken-Ichigo-Shita"
+
+# 時刻の地域（ロガーの時計は圃場の地域時刻に合わせる前提）
+DEFAULT_TIMEZONE = "Asia/Tokyo"
+# 地域時刻が既定と違う圃場だけ書く（例: "Okinawa-Farm": "Asia/Tokyo"）
+FARM_TIMEZONES: dict[str, str] = {}
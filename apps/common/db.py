@@ -0,0 +1,72 @@
+"""
+Streamlit ページ用の DB 接続（読み取り用と書き込み用を分け、プロセスで1つずつ持つ）。
+
+ページの再実行ごとに get_engine() / sqlite3.connect() すると、そのたびに
+エンジン作成・接続・PRAGMA の設定がかかる。st.cache_resource でエンジンを1つだけ作り、
+接続はエンジンのプールから使い回す（プールはスレッドセーフなので複数セッションで共有できる）。
+
+    from apps.common import db
+
+    df = pd.read_sql(q, db.read_engine())          # 読み取り（読み取り専用で開く）
+
+    with db.write_engine().begin() as conn:       # 書き込み（WAL / busy_timeout / BEGIN は db_config）
+        conn.exec_driver_sql(...)
+
+- 読み取り用は URI の mode=ro で開き、query_only も立てる（誤って書けない）
+- PRAGMA は接続を作ったときに1回だけ設定する（プールから借りるたびには流さない）
+- db_path を省略すると db_config.resolve_db_path("real")（DB_PATH_PROD で差し替え可）
+"""
+from pathlib import Path
+from typing import Optional
+
+import streamlit as st
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from db_config import SQLITE_BUSY_TIMEOUT_MS, _configure_sqlite, resolve_db_path
+
+# 読み取り接続に設定する PRAGMA（キャッシュは負数で KiB 指定）
+READ_PRAGMAS = {
+    "query_only": "ON",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 2**20,
+    "temp_store": "MEMORY",
+}
+
+
+def _resolve(db_path: Optional[str]) -> Path:
+    return Path(db_path).resolve() if db_path else resolve_db_path("real")
+
+
+@st.cache_resource
+def read_engine(db_path: Optional[str] = None) -> Engine:
+    """読み取り専用のエンジン（プロセスで1つ）。"""
+    path = _resolve(db_path)
+    engine = create_engine(
+        f"sqlite:///file:{path.as_posix()}?mode=ro&uri=true",
+        future=True,
+        pool_size=5,
+        max_overflow=5,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in READ_PRAGMAS.items():
+            cur.execute(f"PRAGMA {name} = {value};")
+        cur.close()
+
+    return engine
+
+
+@st.cache_resource
+def write_engine(db_path: Optional[str] = None) -> Engine:
+    """
+    書き込み用のエンジン（プロセスで1つ）。取り込み画面などで engine.begin() して使う。
+    SQLite の書き込みは1本ずつなので、プールも1接続にする。
+    """
+    path = _resolve(db_path)
+    engine = create_engine(f"sqlite:///{path}", future=True, pool_size=1, max_overflow=0)
+    _configure_sqlite(engine)
+    return engine
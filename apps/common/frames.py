@@ -0,0 +1,93 @@
+"""
+ダッシュボードの読み込み結果を小さくする（キャッシュに載せる前に dtype を詰める）。
+
+st.cache_data はセッションごとに DataFrame のコピーを返すので、object の文字列列と
+float64 の多い横長・複数年のフレームは、そのままセッション数倍のメモリになる。
+
+    @st.cache_data
+    @frames.compact_loader(dims=("farm",), months=("month",), measures=("vpd_kpa",))
+    def load_env_daily() -> pd.DataFrame:
+        ...
+
+- dims     : 圃場・ブランドなど種類の少ない文字列 → category（辞書 + 整数コード）
+- months   : 'YYYY-MM' → 月順に並べた ordered category（コードが月順の整数キーになる）。
+             Period にしないのは、グラフ・表には文字列のまま渡せるようにするため
+- measures : float は float32（戻したときの相対誤差が FLOAT32_RTOL 以内のときだけ）、
+             int はいちばん小さい整数型
+- 変換前後のメモリ（MB）は df.attrs["memory"] に入る（perf パネルの debug に出す用）
+- category の列で groupby するときは observed=True を付ける
+  （付けないと、絞り込みで消えたカテゴリの組み合わせまで作られる）
+"""
+from functools import wraps
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+FLOAT32_RTOL = 1e-6
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(deep=True).sum()) / 2**20
+
+
+def _float32_safe(s: pd.Series) -> bool:
+    values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(over="ignore"):
+        narrowed = values.astype(np.float32).astype(np.float64)
+    return bool(np.allclose(narrowed, values, rtol=FLOAT32_RTOL, atol=0.0, equal_nan=True))
+
+
+def _downcast(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s):
+        return s
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast="integer")
+    if pd.api.types.is_float_dtype(s) and s.dtype != np.float32 and _float32_safe(s):
+        return s.astype(np.float32)
+    return s
+
+
+def _month_category(s: pd.Series) -> pd.Series:
+    text = s.where(s.isna(), s.astype(str))
+    months = sorted(text.dropna().unique())
+    return text.astype(pd.CategoricalDtype(months, ordered=True))
+
+
+def compact(
+    df: pd.DataFrame,
+    dims: Iterable[str] = (),
+    months: Iterable[str] = (),
+    measures: Iterable[str] = (),
+) -> pd.DataFrame:
+    """df の列を詰める（df 自体を書き換えて返す）。無い列は飛ばす。"""
+    before = memory_mb(df)
+    for col in dims:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in months:
+        if col in df.columns:
+            df[col] = _month_category(df[col])
+    for col in measures:
+        if col in df.columns:
+            df[col] = _downcast(df[col])
+    df.attrs["memory"] = {"before_mb": round(before, 2), "after_mb": round(memory_mb(df), 2)}
+    return df
+
+
+def compact_loader(
+    dims: Iterable[str] = (),
+    months: Iterable[str] = (),
+    measures: Iterable[str] = (),
+):
+    """読み込み関数の戻り値に compact() をかけるデコレータ。@st.cache_data の内側に付ける。"""
+    dims, months, measures = tuple(dims), tuple(months), tuple(measures)
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return compact(fn(*args, **kwargs), dims=dims, months=months, measures=measures)
+
+        return wrapper
+
+    return deco
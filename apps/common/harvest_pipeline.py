@@ -0,0 +1,459 @@
+"""
+収穫データの変換パイプライン: raw_csv → staging_monthly → harvest_monthly → mv_harvest_monthly
+
+raw_csv は追記だけのテーブルなので、rowid の高水位（どこまで変換したか）を
+pipeline_marks に持ち、新しく入った行だけを変換する。
+
+    with engine.begin() as conn:
+        result = harvest_pipeline.run(conn)
+
+1. raw_csv の新しい行（rowid > 高水位）をチャンクで読み、
+   収穫日 → month、企業名 → farm、収穫野菜名 → crop、g → kg に変換
+2. (farm, crop, month) ごとの合計を staging_monthly に足し込む
+3. 影響を受けた (farm, crop, month) だけ harvest_monthly を staging_monthly の値で置き換える
+   （harvest_monthly の行の持ち主は UPLOAD_CROP のコメントを参照）
+4. 続けて mv_harvest_monthly の該当 (farm, month) だけを集計し直す
+5. 高水位を進める（1〜4 と同じトランザクション）
+
+日付の書式はチャンクごとに前の書式から試し、読めなかった行だけ書式を選び直す
+（"2025/8/1" のファイルの後に "2025-09-01" のファイルが来ても落とさない）。
+それでも日付・収穫量などが読めない行は raw_csv_rejects に元の値と理由ごと退避してから高水位を進める
+（raw_csv から消えたことにはしない。reset() 後の run() で変換し直される）。
+
+どのファイルの行かは harvest_import_log の first_rowid / last_rowid で分かる
+（import_harvest_csv が取り込み時に記録する）。
+
+conn は SQLAlchemy の Connection か sqlite3.Connection。トランザクションは呼び出し側で張る。
+"""
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from apps.common import table_stats, timestamps
+
+PIPELINE = "raw_csv→harvest_monthly"
+CHUNK_ROWS = 50_000
+
+STAGING_DDL = """
+CREATE TABLE IF NOT EXISTS staging_monthly (
+  farm      TEXT NOT NULL,
+  crop      TEXT NOT NULL,
+  month     TEXT NOT NULL,       -- 'YYYY-MM'
+  total_kg  REAL NOT NULL,
+  rows      INTEGER NOT NULL,    -- 元になった raw_csv の行数
+  PRIMARY KEY (farm, crop, month)
+);
+"""
+
+# 変換できなかった raw_csv の行（高水位より前に置き去りにしないための退避先）
+REJECTS_DDL = """
+CREATE TABLE IF NOT EXISTS raw_csv_rejects (
+  raw_rowid  INTEGER PRIMARY KEY, -- raw_csv.rowid
+  c1         TEXT,
+  c2         TEXT,
+  c3         TEXT,
+  c4         REAL,
+  reason     TEXT NOT NULL,       -- date / amount / farm / crop
+  seen_at    TEXT NOT NULL
+);
+"""
+
+MARKS_DDL = """
+CREATE TABLE IF NOT EXISTS pipeline_marks (
+  pipeline    TEXT PRIMARY KEY,
+  last_rowid  INTEGER NOT NULL,  -- ここまで変換済み（raw_csv.rowid）
+  updated_at  TEXT NOT NULL
+);
+"""
+
+# 取り込み画面（作物の列が無い CSV）から入った行の crop。
+# harvest_monthly は (farm, crop, month) がキーで、行の持ち主は crop で分かれる:
+#   - 作物名の行      : run()（raw_csv → staging_monthly）が staging_monthly の値で置き換える
+#   - UPLOAD_CROP の行: 取り込み画面（01_Import_CSC）が置き換え / 加算する
+# どちらも相手の行には触らない。(farm, month) の合計は mv_harvest_monthly で見る。
+UPLOAD_CROP = "(作物指定なし)"
+
+HARVEST_MONTHLY_DDL = f"""
+CREATE TABLE IF NOT EXISTS harvest_monthly (
+  farm      TEXT NOT NULL,
+  crop      TEXT NOT NULL DEFAULT '{UPLOAD_CROP}',
+  manager   TEXT,
+  month     TEXT NOT NULL,       -- 'YYYY-MM'
+  total_kg  REAL NOT NULL,
+  PRIMARY KEY (farm, crop, month)
+);
+"""
+
+HARVEST_MONTHLY_KEY = ("farm", "crop", "month")
+
+MV_DDL = """
+CREATE TABLE IF NOT EXISTS mv_harvest_monthly (
+  month     TEXT NOT NULL,
+  farm      TEXT NOT NULL,
+  total_kg  REAL NOT NULL,
+  PRIMARY KEY (farm, month)
+);
+"""
+
+STAGING_UPSERT_SQL = """
+INSERT INTO staging_monthly (farm, crop, month, total_kg, rows)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(farm, crop, month) DO UPDATE SET
+  total_kg = total_kg + excluded.total_kg,
+  rows     = rows + excluded.rows;
+"""
+
+
+@dataclass
+class PipelineResult:
+    raw_rows: int = 0            # 変換した raw_csv の行数
+    failed_rows: int = 0         # 日付・収穫量が読めず raw_csv_rejects に退避した行数
+    keys: int = 0                # 更新した (farm, crop, month) の数
+    last_rowid: int = 0
+    months: set = field(default_factory=set)
+
+
+def _execute(conn, sql: str, params: tuple = ()):
+    if isinstance(conn, sqlite3.Connection):
+        return conn.execute(sql, params)
+    return conn.exec_driver_sql(sql, params)
+
+
+def _executemany(conn, sql: str, rows: list) -> None:
+    if not rows:
+        return
+    if isinstance(conn, sqlite3.Connection):
+        conn.executemany(sql, rows)
+    else:
+        conn.exec_driver_sql(sql, rows)
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in _execute(conn, f'PRAGMA table_info("{table}");').fetchall()}
+
+
+def _has_key(conn, table: str, key: tuple) -> bool:
+    """table に key の列ちょうどの PRIMARY KEY / UNIQUE があるか。"""
+    for index in _execute(conn, f'PRAGMA index_list("{table}");').fetchall():
+        if not index[2]:  # unique でない
+            continue
+        cols = [r[2] for r in _execute(conn, f'PRAGMA index_info("{index[1]}");').fetchall()]
+        if set(cols) == set(key):
+            return True
+    return False
+
+
+def ensure_harvest_monthly(conn) -> None:
+    """
+    harvest_monthly を HARVEST_MONTHLY_DDL の形（(farm, crop, month) がキー）にそろえる。
+    run() と取り込み画面の両方が書く前に呼ぶ。キーがある表ならすぐ戻る。
+
+    キーの無い表（sql/copy_harvest_monthly_from_src.sql や以前の版で作ったもの）は作り直す:
+      - crop 列が無い表 / crop が NULL の行は UPLOAD_CROP の行にする。
+        ただし staging_monthly にある (farm, month) は、以前の run() が作物を合計して入れた行なので、
+        staging_monthly の作物ごとの行に入れ替える
+      - 同じキーの重複行は合計して1行にする（mv_harvest_monthly も合計なので表示は変わらない）
+      - farm / month / total_kg が NULL の行は落とす（mv_harvest_monthly にも入らない行）
+    ALTER TABLE の RENAME は v_harvest_env などのビューを書き換えてしまうので、
+    一時テーブルに退避して DROP → CREATE で作り直す。
+    """
+    cols = _columns(conn, "harvest_monthly")
+    if not cols:
+        _execute(conn, HARVEST_MONTHLY_DDL)
+        return
+    if _has_key(conn, "harvest_monthly", HARVEST_MONTHLY_KEY):
+        return
+
+    crop = "COALESCE(crop, ?)" if "crop" in cols else "?"
+    manager = "MAX(manager)" if "manager" in cols else "NULL"
+    _execute(conn, STAGING_DDL)
+    _execute(conn, "DROP TABLE IF EXISTS temp._harvest_monthly_old;")
+    _execute(
+        conn,
+        f"""
+        CREATE TEMP TABLE _harvest_monthly_old AS
+        SELECT farm, {crop} AS crop, {manager} AS manager, month, SUM(total_kg) AS total_kg
+        FROM harvest_monthly
+        WHERE farm IS NOT NULL AND month IS NOT NULL
+        GROUP BY 1, 2, 4
+        HAVING SUM(total_kg) IS NOT NULL;
+        """,
+        (UPLOAD_CROP,),
+    )
+    if "crop" not in cols:
+        _execute(
+            conn,
+            """
+            DELETE FROM temp._harvest_monthly_old
+            WHERE EXISTS (
+              SELECT 1 FROM staging_monthly s
+              WHERE s.farm = _harvest_monthly_old.farm AND s.month = _harvest_monthly_old.month
+            );
+            """,
+        )
+        _execute(
+            conn,
+            """
+            INSERT INTO temp._harvest_monthly_old (farm, crop, manager, month, total_kg)
+            SELECT farm, crop, NULL, month, total_kg FROM staging_monthly;
+            """,
+        )
+    _execute(conn, "DROP TABLE harvest_monthly;")
+    _execute(conn, HARVEST_MONTHLY_DDL)
+    _execute(
+        conn,
+        """
+        INSERT INTO harvest_monthly (farm, crop, manager, month, total_kg)
+        SELECT farm, crop, manager, month, total_kg FROM temp._harvest_monthly_old;
+        """,
+    )
+    _execute(conn, "DROP TABLE temp._harvest_monthly_old;")
+
+
+def ensure_tables(conn) -> None:
+    for ddl in (STAGING_DDL, REJECTS_DDL, MARKS_DDL, MV_DDL):
+        _execute(conn, ddl)
+    ensure_harvest_monthly(conn)
+
+
+def get_mark(conn) -> int:
+    row = _execute(
+        conn, "SELECT last_rowid FROM pipeline_marks WHERE pipeline = ?;", (PIPELINE,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def set_mark(conn, last_rowid: int) -> None:
+    _execute(
+        conn,
+        """
+        INSERT INTO pipeline_marks (pipeline, last_rowid, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(pipeline) DO UPDATE SET
+          last_rowid = excluded.last_rowid,
+          updated_at = excluded.updated_at;
+        """,
+        (PIPELINE, last_rowid, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    )
+
+
+def parse_months(dates: pd.Series, date_format: Optional[str] = None) -> tuple[pd.Series, Optional[str]]:
+    """
+    収穫日 → 'YYYY-MM'（読めない行は NA）。
+    date_format（前のチャンクの書式）から試し、読めなかった行だけ書式を選び直す。
+    戻り値: (month, いちばん多くの行を読めた書式。1行も読めなければ date_format のまま)
+    """
+    text = dates.astype("string").str.strip()
+    month = pd.Series(pd.NA, index=dates.index, dtype="string")
+    pending = text.notna() & (text != "")
+    fmt, best, best_hits = date_format, date_format, 0
+    for _ in range(len(timestamps.CANDIDATE_FORMATS) + 1):
+        if not pending.any():
+            break
+        try:
+            parsed = timestamps.parse(text[pending], fmt=fmt)
+        except timestamps.TimestampFormatError:
+            break
+        ok = parsed.values.notna()
+        if ok.any():
+            idx = ok[ok].index
+            month[idx] = parsed.values[idx].dt.strftime("%Y-%m")
+            pending[idx] = False
+            if int(ok.sum()) > best_hits:
+                best, best_hits = parsed.fmt, int(ok.sum())
+        elif fmt is None:
+            # 残りの行はどの書式でも読めない
+            break
+        fmt = None
+    return month, best
+
+
+def convert_raw(
+    chunk: pd.DataFrame, date_format: Optional[str] = None
+) -> tuple[pd.DataFrame, pd.DataFrame, Optional[str]]:
+    """
+    raw_csv(rowid, c1..c4) の行を (farm, crop, month, total_kg, rows) の月次合計にする。
+    戻り値: (月次合計, 変換できなかった行（rowid, c1..c4, reason）, 日付の書式)
+    """
+    month, date_format = parse_months(chunk["c1"], date_format)
+    df = pd.DataFrame(
+        {
+            "farm": chunk["c2"].astype("string").str.strip(),
+            "crop": chunk["c3"].astype("string").str.strip(),
+            "month": month,
+            "total_kg": pd.to_numeric(chunk["c4"], errors="coerce") / 1000.0,
+        }
+    )
+    # 理由は最初に引っかかった列（日付 → 収穫量 → 企業名 → 野菜名の順）
+    reason = pd.Series(pd.NA, index=chunk.index, dtype="string")
+    for col, label in (("crop", "crop"), ("farm", "farm"), ("total_kg", "amount"), ("month", "date")):
+        reason = reason.mask(df[col].isna(), label)
+    ok = reason.isna()
+
+    rejects = chunk.loc[~ok, ["rowid", "c1", "c2", "c3", "c4"]].assign(reason=reason[~ok])
+    monthly = (
+        df[ok]
+        .groupby(["farm", "crop", "month"], as_index=False, sort=False)
+        .agg(total_kg=("total_kg", "sum"), rows=("total_kg", "size"))
+    )
+    return monthly, rejects, date_format
+
+
+def _save_rejects(conn, rejects: pd.DataFrame) -> None:
+    seen_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _executemany(
+        conn,
+        """
+        INSERT OR REPLACE INTO raw_csv_rejects (raw_rowid, c1, c2, c3, c4, reason, seen_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?);
+        """,
+        [
+            (int(r[0]), *(None if pd.isna(v) else v for v in r[1:]), seen_at)
+            for r in rejects[["rowid", "c1", "c2", "c3", "c4", "reason"]]
+            .astype(object)
+            .itertuples(index=False, name=None)
+        ],
+    )
+
+
+def _load_keys(conn, keys: pd.DataFrame) -> None:
+    """影響を受けた (farm, crop, month) を一時テーブルに入れる。"""
+    _execute(conn, "DROP TABLE IF EXISTS temp._pipeline_keys;")
+    _execute(conn, "CREATE TEMP TABLE _pipeline_keys (farm TEXT, crop TEXT, month TEXT);")
+    _executemany(
+        conn,
+        "INSERT INTO temp._pipeline_keys (farm, crop, month) VALUES (?, ?, ?);",
+        list(keys[["farm", "crop", "month"]].itertuples(index=False, name=None)),
+    )
+
+
+def apply_to_harvest_monthly(conn) -> None:
+    """
+    _pipeline_keys の分だけ harvest_monthly を staging_monthly の値で置き換える。
+    触るのは作物名の行だけ（取り込み画面の UPLOAD_CROP の行はそのまま）。
+    """
+    _execute(
+        conn,
+        """
+        INSERT INTO harvest_monthly (farm, crop, month, total_kg)
+        SELECT s.farm, s.crop, s.month, s.total_kg
+        FROM staging_monthly s
+        JOIN temp._pipeline_keys k
+          ON k.farm = s.farm AND k.crop = s.crop AND k.month = s.month
+        WHERE true
+        ON CONFLICT(farm, crop, month) DO UPDATE SET
+          total_kg = excluded.total_kg;
+        """,
+    )
+
+
+def refresh_mv(conn, keys_table: Optional[str] = None) -> None:
+    """
+    mv_harvest_monthly を harvest_monthly から集計し直す。
+    keys_table（farm, month 列を持つテーブル）を渡すとその (farm, month) だけ、None なら全体。
+    """
+    _execute(conn, MV_DDL)
+    if keys_table is None:
+        _execute(conn, "DELETE FROM mv_harvest_monthly;")
+        _execute(
+            conn,
+            """
+            INSERT INTO mv_harvest_monthly (month, farm, total_kg)
+            SELECT month, farm, SUM(total_kg)
+            FROM harvest_monthly
+            WHERE farm IS NOT NULL AND month IS NOT NULL
+            GROUP BY month, farm;
+            """,
+        )
+        return
+
+    match = f"""
+        EXISTS (
+          SELECT 1 FROM {keys_table} k
+          WHERE k.farm = {{t}}.farm AND k.month = {{t}}.month
+        )
+    """
+    _execute(conn, f"DELETE FROM mv_harvest_monthly WHERE {match.format(t='mv_harvest_monthly')};")
+    _execute(
+        conn,
+        f"""
+        INSERT INTO mv_harvest_monthly (month, farm, total_kg)
+        SELECT month, farm, SUM(total_kg)
+        FROM harvest_monthly
+        WHERE {match.format(t='harvest_monthly')}
+        GROUP BY month, farm
+        HAVING SUM(total_kg) IS NOT NULL;
+        """,
+    )
+
+
+def run(conn, chunk_rows: int = CHUNK_ROWS) -> PipelineResult:
+    """
+    高水位より後の raw_csv を変換して harvest_monthly / mv_harvest_monthly まで反映する。
+    新しい行が無ければ何もしない（raw_csv 全体は読まない）。
+    """
+    ensure_tables(conn)
+    result = PipelineResult(last_rowid=get_mark(conn))
+    # 初回（reset 後も含む）は mv_harvest_monthly を全体で作り直す（既存の harvest_monthly の分も入れる）
+    first_run = result.last_rowid == 0
+    if not _columns(conn, "raw_csv"):
+        return result
+
+    date_format = None
+    all_keys = []
+    while True:
+        rows = _execute(
+            conn,
+            "SELECT rowid, c1, c2, c3, c4 FROM raw_csv WHERE rowid > ? ORDER BY rowid LIMIT ?;",
+            (result.last_rowid, chunk_rows),
+        ).fetchall()
+        if not rows:
+            break
+        chunk = pd.DataFrame.from_records(rows, columns=["rowid", "c1", "c2", "c3", "c4"])
+        # 書式は前のチャンクのものから試す（読めなかった行だけ選び直す）
+        monthly, rejects, date_format = convert_raw(chunk, date_format)
+        # 変換できなかった行は高水位を進める前に退避する（同じトランザクション）
+        _save_rejects(conn, rejects)
+        _executemany(
+            conn,
+            STAGING_UPSERT_SQL,
+            list(
+                monthly[["farm", "crop", "month", "total_kg", "rows"]]
+                .astype(object)
+                .itertuples(index=False, name=None)
+            ),
+        )
+        all_keys.append(monthly[["farm", "crop", "month"]])
+        result.raw_rows += len(chunk)
+        result.failed_rows += len(rejects)
+        result.last_rowid = int(chunk["rowid"].iloc[-1])
+
+    if result.raw_rows == 0:
+        return result
+
+    keys = pd.concat(all_keys, ignore_index=True).drop_duplicates()
+    result.keys = len(keys)
+    result.months = set(keys["month"])
+
+    _load_keys(conn, keys)
+    apply_to_harvest_monthly(conn)
+    refresh_mv(conn, None if first_run else "temp._pipeline_keys")
+    _execute(conn, "DROP TABLE IF EXISTS temp._pipeline_keys;")
+
+    set_mark(conn, result.last_rowid)
+    table_stats.refresh(conn, "staging_monthly")
+    table_stats.refresh(conn, "harvest_monthly")
+    return result
+
+
+def reset(conn) -> None:
+    """
+    staging_monthly・退避した行・高水位を消す（次の run() で raw_csv 全体を変換し直す。
+    raw_csv_rejects の行も、書式の候補を足した後などはここで読み直される）。
+    """
+    ensure_tables(conn)
+    _execute(conn, "DELETE FROM staging_monthly;")
+    _execute(conn, "DELETE FROM raw_csv_rejects;")
+    _execute(conn, "DELETE FROM pipeline_marks WHERE pipeline = ?;", (PIPELINE,))
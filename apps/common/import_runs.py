@@ -0,0 +1,215 @@
+"""
+取り込み実行の記録（import_runs テーブル）。
+
+スクリプト（scripts/import_*.py）とアップロード画面の両方から使う。
+
+    with import_runs.track(engine, source="script", kind="env", path=p) as run:
+        with run.stage("parse"):
+            df = read_gl240_csv(...)
+        run.rows = len(df)
+        with run.stage("load"):
+            ...
+
+- 例外が出たら status='error' と例外メッセージを記録して、そのまま再送出する
+- 取り込み済みなどで処理しなかった場合は run.skip() を呼ぶ
+- peak_mem_mb は各段階の間、別スレッドで一定間隔に測った RSS の最大値（RssSampler。
+  段階の途中で膨らんで戻った分も入り、常駐プロセスでも1回分に近い値になる）
+- target は SQLAlchemy の Engine か sqlite3.Connection。sqlite3 の場合、失敗時は
+  先に rollback してから記録する（途中まで書いた行を一緒にコミットしないため）
+"""
+import json
+import os
+import resource
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+DDL = """
+CREATE TABLE IF NOT EXISTS import_runs (
+  id           INTEGER PRIMARY KEY,
+  source       TEXT NOT NULL,      -- script / upload / watcher
+  kind         TEXT NOT NULL,      -- env / harvest / harvest_monthly / env_daily
+  file         TEXT,
+  bytes        INTEGER,
+  rows         INTEGER,
+  failed_rows  INTEGER,          -- 解釈できず除外した行（時刻が読めない等）
+  status       TEXT NOT NULL,      -- ok / skipped / error
+  error        TEXT,
+  started_at   TEXT NOT NULL,      -- 'YYYY-MM-DD HH:MM:SS'（ローカル時刻）
+  duration_ms  REAL,
+  stages_json  TEXT,               -- {"parse": ms, "load": ms, ...}
+  peak_mem_mb  REAL
+);
+"""
+INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_import_runs_started ON import_runs(started_at);"
+
+INSERT_SQL = """
+INSERT INTO import_runs
+  (source, kind, file, bytes, rows, failed_rows, status, error,
+   started_at, duration_ms, stages_json, peak_mem_mb)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else None
+
+
+def current_rss_mb() -> float:
+    """現在の RSS（Linux は /proc、それ以外はプロセスの最大 RSS で代用）。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, TypeError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+class RssSampler:
+    """
+    with の間、別スレッドで current_rss_mb() を interval 秒ごとに測り、最大値を peak_mb に持つ。
+    前後だけを測ると段階の途中のピーク（一時的な DataFrame など）を取りこぼすため。
+
+        with RssSampler() as mem:
+            ...
+        mem.peak_mb
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "RssSampler":
+        self.peak_mb = current_rss_mb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+class ImportRun:
+    def __init__(self, source: str, kind: str, path=None, nbytes: Optional[int] = None) -> None:
+        self.source = source
+        self.kind = kind
+        self.file = str(path) if path is not None else None
+        if nbytes is None and path is not None and Path(path).exists():
+            nbytes = Path(path).stat().st_size
+        self.bytes = nbytes
+        self.rows: Optional[int] = None
+        self.failed_rows: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.stages: dict[str, float] = {}
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.peak_mem_mb = current_rss_mb()
+        self.duration_ms: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        mem = RssSampler()
+        t0 = time.perf_counter()
+        try:
+            with mem:
+                yield self
+        finally:
+            self.add_stage(name, (time.perf_counter() - t0) * 1e3)
+            self.peak_mem_mb = max(self.peak_mem_mb, mem.peak_mb)
+
+    def add_stage(self, name: str, ms: float) -> None:
+        """外で測った時間を段階として足す。"""
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def skip(self) -> None:
+        self.status = "skipped"
+
+    def _sample_mem(self) -> None:
+        self.peak_mem_mb = max(self.peak_mem_mb, current_rss_mb())
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        self.duration_ms = (time.perf_counter() - self._t0) * 1e3
+        self._sample_mem()
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"[:2000]
+
+    def params(self) -> tuple:
+        return (
+            self.source,
+            self.kind,
+            self.file,
+            self.bytes,
+            self.rows,
+            self.failed_rows,
+            self.status,
+            self.error,
+            self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            round(self.duration_ms or 0.0, 1),
+            json.dumps({k: round(v, 1) for k, v in self.stages.items()}),
+            round(self.peak_mem_mb, 1),
+        )
+
+
+# 後から足した列（古い import_runs には ALTER TABLE で追加する）
+ADDED_COLUMNS = {"failed_rows": "INTEGER"}
+
+
+def ensure_table(conn) -> None:
+    run = conn.execute if isinstance(conn, sqlite3.Connection) else conn.exec_driver_sql
+    run(DDL)
+    run(INDEX_DDL)
+    existing = {row[1] for row in run("PRAGMA table_info(import_runs);").fetchall()}
+    for name, typ in ADDED_COLUMNS.items():
+        if name not in existing:
+            run(f"ALTER TABLE import_runs ADD COLUMN {name} {typ};")
+
+
+def write(target, run: ImportRun) -> None:
+    if isinstance(target, sqlite3.Connection):
+        ensure_table(target)
+        target.execute(INSERT_SQL, run.params())
+        target.commit()
+        return
+    with target.begin() as conn:
+        ensure_table(conn)
+        conn.exec_driver_sql(INSERT_SQL, run.params())
+
+
+@contextmanager
+def track(target, source: str, kind: str, path=None, nbytes: Optional[int] = None):
+    run = ImportRun(source, kind, path, nbytes)
+    try:
+        yield run
+    except Exception as e:
+        run.finish(e)
+        if isinstance(target, sqlite3.Connection):
+            target.rollback()
+        _write_quietly(target, run)
+        raise
+    run.finish()
+    _write_quietly(target, run)
+
+
+def _write_quietly(target, run: ImportRun) -> None:
+    # 記録の失敗で取り込み自体を失敗させない
+    try:
+        write(target, run)
+    except Exception as e:
+        print(f"[WARN] import_runs への記録に失敗しました: {e}")
@@ -0,0 +1,154 @@
+"""
+Streamlit ページ用の簡易計測。
+
+ページ先頭で start_page()、重い処理を timer() で囲み、最後に render_panel() を呼ぶ。
+
+    rec = perf.start_page("06_Brand_Monthly")
+    with perf.timer("sql", "load_brand_monthly") as t:
+        df = load_brand_monthly()
+        t.rows = len(df)
+    ...
+    perf.render_panel(debug={"columns": list(df.columns)})
+
+- kind は "sql" / "pandas" / "model" / "chart" / "import" などの区分（パネルで kind ごとに合計を出す）
+- @st.cache_data の関数は呼び出し側で囲む（キャッシュヒット時の時間も測れる）
+- 1回の描画ごとに PERF_LOG_PATH（既定 data/logs/streamlit_perf.jsonl）へ JSON Lines で追記する
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+LOG_PATH = Path(os.getenv("PERF_LOG_PATH", ROOT_DIR / "data" / "logs" / "streamlit_perf.jsonl"))
+
+_STATE_KEY = "_perf_recorder"
+
+
+@dataclass
+class Timing:
+    kind: str
+    label: str
+    ms: float = 0.0
+    rows: Optional[int] = None
+
+
+@dataclass
+class PageRecorder:
+    page: str
+    started: float = field(default_factory=time.perf_counter)
+    timings: list[Timing] = field(default_factory=list)
+
+    def add(self, timing: Timing) -> None:
+        self.timings.append(timing)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1e3
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(t) for t in self.timings], columns=["kind", "label", "ms", "rows"])
+
+
+def start_page(page: str) -> PageRecorder:
+    """再描画ごとに呼ぶ。前回の計測は捨てる。"""
+    rec = PageRecorder(page)
+    st.session_state[_STATE_KEY] = rec
+    return rec
+
+
+def current() -> Optional[PageRecorder]:
+    return st.session_state.get(_STATE_KEY)
+
+
+@contextmanager
+def timer(kind: str, label: str, rows: Optional[int] = None):
+    """with ブロックの所要時間を記録する。行数は yield した Timing の rows に入れる。"""
+    t = Timing(kind, label, rows=rows)
+    t0 = time.perf_counter()
+    try:
+        yield t
+    finally:
+        t.ms = (time.perf_counter() - t0) * 1e3
+        rec = current()
+        if rec is not None:
+            rec.add(t)
+
+
+def timed(kind: str, label: Optional[str] = None):
+    """関数デコレータ版。戻り値が DataFrame / Series なら行数も取る。"""
+
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(kind, label or fn.__name__) as t:
+                result = fn(*args, **kwargs)
+                if isinstance(result, (pd.DataFrame, pd.Series)):
+                    t.rows = len(result)
+            return result
+
+        return wrapper
+
+    return deco
+
+
+def read_sql(label: str, sql, con, **kwargs) -> pd.DataFrame:
+    """pd.read_sql を計測付きで呼ぶ。"""
+    with timer("sql", label) as t:
+        df = pd.read_sql(sql, con, **kwargs)
+        t.rows = len(df)
+    return df
+
+
+def _append_log(rec: PageRecorder, total_ms: float) -> None:
+    try:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "page": rec.page,
+            "total_ms": round(total_ms, 1),
+            "timings": [
+                {**asdict(t), "ms": round(t.ms, 1)} for t in rec.timings
+            ],
+        }
+        with LOG_PATH.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError:
+        # ログが書けなくても画面は止めない
+        pass
+
+
+def render_panel(debug: Optional[dict] = None, log: bool = True) -> None:
+    """折りたたみのパフォーマンスパネルを出し、ログに追記する。ページの最後で呼ぶ。"""
+    rec = current()
+    if rec is None:
+        return
+    total_ms = rec.total_ms()
+    df = rec.to_frame()
+
+    with st.expander(f"⏱ パフォーマンス（{total_ms:,.0f} ms）", expanded=False):
+        if df.empty:
+            st.caption("計測された処理はありません。")
+        else:
+            by_kind = df.groupby("kind", as_index=False, sort=False)["ms"].sum()
+            st.caption(
+                " / ".join(f"{k}: {v:,.0f} ms" for k, v in zip(by_kind["kind"], by_kind["ms"]))
+                + f" / その他: {max(total_ms - df['ms'].sum(), 0):,.0f} ms"
+            )
+            st.dataframe(
+                df.assign(ms=df["ms"].round(1)),
+                use_container_width=True,
+                hide_index=True,
+            )
+        for name, value in (debug or {}).items():
+            st.write(f"{name}:", value)
+
+    if log:
+        _append_log(rec, total_ms)
@@ -0,0 +1,204 @@
+"""
+テーブルの件数・期間・更新時刻のカタログ（table_stats テーブル）。
+
+Home などで毎回 count(*) すると、生データのテーブルが大きくなるほど遅くなる。
+取り込み処理が書き込みと同じトランザクションでカタログを更新し、画面は
+table_stats を読むだけにする。
+
+    with engine.begin() as conn:
+        df.to_sql("env_raw", conn, if_exists="append", index=False)
+        table_stats.record_append(conn, "env_raw", df)
+
+- farm = '' の行がテーブル全体、それ以外は圃場ごと（データの鮮度を見る用）
+- 追記だけの取り込みは record_append() で差分を足す（テーブルを読み直さない）
+- 作り直し・UPSERT のように件数が足し算にならない場合は refresh() で数え直す
+- まだカタログに無いテーブルは、初回だけ refresh() で数える
+- conn は SQLAlchemy の Connection か sqlite3.Connection（import_runs と同じ）
+"""
+import re
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+DDL = """
+CREATE TABLE IF NOT EXISTS table_stats (
+  tbl         TEXT NOT NULL,
+  farm        TEXT NOT NULL DEFAULT '',   -- '' はテーブル全体
+  rows        INTEGER NOT NULL,
+  min_ts      TEXT,                       -- 時刻・日付・月の列の最小（文字列比較）
+  max_ts      TEXT,
+  updated_at  TEXT NOT NULL,              -- 'YYYY-MM-DD HH:MM:SS'（ローカル時刻）
+  PRIMARY KEY (tbl, farm)
+);
+"""
+
+UPSERT_DELTA_SQL = """
+INSERT INTO table_stats (tbl, farm, rows, min_ts, max_ts, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(tbl, farm) DO UPDATE SET
+  rows       = rows + excluded.rows,
+  min_ts     = min(coalesce(min_ts, excluded.min_ts), coalesce(excluded.min_ts, min_ts)),
+  max_ts     = max(coalesce(max_ts, excluded.max_ts), coalesce(excluded.max_ts, max_ts)),
+  updated_at = excluded.updated_at;
+"""
+
+INSERT_SQL = """
+INSERT INTO table_stats (tbl, farm, rows, min_ts, max_ts, updated_at)
+VALUES (?, ?, ?, ?, ?, ?);
+"""
+
+_ZERO_FRACTION = re.compile(r"\.0+$")
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """カタログで扱うテーブルの 圃場列 / 時刻列（無い・分からない場合は None）。"""
+
+    farm_col: Optional[str] = None
+    ts_col: Optional[str] = None
+
+
+# Home に出すテーブル + 取り込みで書くテーブル
+# raw_csv.c1（収穫日）は "2025/8/17" のような書式で文字列比較できないので期間は取らない
+TABLES = {
+    "raw_csv": TableSpec(farm_col="c2"),
+    "env_raw": TableSpec(farm_col="farm", ts_col="ts"),
+    "env_daily": TableSpec(farm_col="farm", ts_col="date"),
+    "env_header": TableSpec(),
+    "env_rows": TableSpec(ts_col="ts"),
+    "staging_monthly": TableSpec(farm_col="farm", ts_col="month"),
+    "harvest_monthly": TableSpec(farm_col="farm", ts_col="month"),
+    "fact_yield_zone": TableSpec(farm_col="farm", ts_col="month"),
+}
+
+
+def _is_sqlite3(conn) -> bool:
+    return isinstance(conn, sqlite3.Connection)
+
+
+def _execute(conn, sql: str, params: tuple = ()):
+    if _is_sqlite3(conn):
+        return conn.execute(sql, params)
+    return conn.exec_driver_sql(sql, params)
+
+
+def _executemany(conn, sql: str, rows: list) -> None:
+    if not rows:
+        return
+    if _is_sqlite3(conn):
+        conn.executemany(sql, rows)
+    else:
+        conn.exec_driver_sql(sql, rows)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _ts_text(value) -> Optional[str]:
+    """
+    DataFrame の値と DB から読んだ文字列を同じ形にそろえる
+    （to_sql は datetime を 'YYYY-MM-DD HH:MM:SS.000000' で書くので末尾のゼロは落とす）。
+    """
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat(sep=" ")
+    return _ZERO_FRACTION.sub("", str(value))
+
+
+def ensure_table(conn) -> None:
+    _execute(conn, DDL)
+
+
+def _columns(conn, table: str) -> Optional[set]:
+    """テーブル（VIEW も可）の列名。存在しなければ None。"""
+    cols = {row[1] for row in _execute(conn, f'PRAGMA table_info("{table}");').fetchall()}
+    return cols or None
+
+
+def _has_stats(conn, table: str) -> bool:
+    row = _execute(
+        conn, "SELECT 1 FROM table_stats WHERE tbl = ? AND farm = '' LIMIT 1;", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def refresh(conn, table: str) -> None:
+    """テーブルを数え直してカタログを置き換える（テーブルが無ければカタログから消す）。"""
+    ensure_table(conn)
+    _execute(conn, "DELETE FROM table_stats WHERE tbl = ?;", (table,))
+    cols = _columns(conn, table)
+    if cols is None:
+        return
+
+    spec = TABLES.get(table, TableSpec())
+    # 想定の列が無い古いスキーマでも件数だけは取る
+    farm_col = spec.farm_col if spec.farm_col in cols else None
+    ts_col = spec.ts_col if spec.ts_col in cols else None
+    ts_select = f'MIN("{ts_col}"), MAX("{ts_col}")' if ts_col else "NULL, NULL"
+    now = _now()
+
+    total = _execute(conn, f'SELECT COUNT(*), {ts_select} FROM "{table}";').fetchone()
+    rows = [(table, "", total[0], _ts_text(total[1]), _ts_text(total[2]), now)]
+    if farm_col:
+        per_farm = _execute(
+            conn,
+            f'SELECT "{farm_col}", COUNT(*), {ts_select} FROM "{table}" '
+            f'WHERE "{farm_col}" IS NOT NULL GROUP BY "{farm_col}";',
+        ).fetchall()
+        rows += [
+            (table, str(farm), n, _ts_text(lo), _ts_text(hi), now)
+            for farm, n, lo, hi in per_farm
+        ]
+    _executemany(conn, INSERT_SQL, rows)
+
+
+def refresh_all(conn, tables: Iterable[str] = TABLES) -> None:
+    for table in tables:
+        refresh(conn, table)
+
+
+def record_append(conn, table: str, df: pd.DataFrame) -> None:
+    """
+    df をテーブルに追記した直後に呼び、件数・期間の差分をカタログに足す。
+    まだカタログに無いテーブルは（df の分も含めて）数え直す。
+    """
+    ensure_table(conn)
+    if not _has_stats(conn, table):
+        refresh(conn, table)
+        return
+    if df.empty:
+        return
+
+    spec = TABLES.get(table, TableSpec())
+    ts_col = spec.ts_col if spec.ts_col in df.columns else None
+    farm_col = spec.farm_col if spec.farm_col in df.columns else None
+    now = _now()
+
+    def stats(part: pd.DataFrame) -> tuple:
+        if ts_col is None:
+            return len(part), None, None
+        return len(part), _ts_text(part[ts_col].min()), _ts_text(part[ts_col].max())
+
+    rows = [(table, "", *stats(df), now)]
+    if farm_col:
+        rows += [
+            (table, str(farm), *stats(part), now)
+            for farm, part in df.groupby(farm_col, sort=False)
+        ]
+    _executemany(conn, UPSERT_DELTA_SQL, rows)
+
+
+def load(conn) -> pd.DataFrame:
+    """カタログ全体（テーブルが無ければ空）。"""
+    columns = ["tbl", "farm", "rows", "min_ts", "max_ts", "updated_at"]
+    if _columns(conn, "table_stats") is None:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(
+        _execute(conn, f"SELECT {', '.join(columns)} FROM table_stats ORDER BY tbl, farm;").fetchall(),
+        columns=columns,
+    )
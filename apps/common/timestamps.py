@@ -0,0 +1,118 @@
+"""
+ロガー・CSV の時刻列のパース。
+
+書式は先頭のサンプルから一度だけ決め、列全体を固定書式で pd.to_datetime する
+（書式なしの推測は行ごと・チャンクごとに結果が変わり得て、遅い）。
+
+    result = timestamps.parse(df["ts"], tz=farm_timezone(farm))
+    df["ts"] = result.values          # tz 付き
+    result.failed                     # 値はあるのに解釈できなかった行数
+
+env_raw.ts は従来どおり圃場のローカル時刻（tz なし）の文字列で持つので、
+保存前に to_local_naive() で tz を外す。
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from apps.common.constants import DEFAULT_TIMEZONE, FARM_TIMEZONES
+
+# よく出る順。GL240 は "2025/8/27 11:42"（月日ゼロ埋めなし）
+CANDIDATE_FORMATS = (
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y/%m/%d",
+    "%Y-%m-%d",
+    "%Y%m%d %H%M%S",
+    "%Y%m%d",
+)
+
+SAMPLE_SIZE = 200
+
+
+class TimestampFormatError(ValueError):
+    """サンプルに合う書式が無い。"""
+
+
+@dataclass
+class ParseResult:
+    values: pd.Series
+    fmt: str
+    failed: int     # 元の値が空でないのに NaT になった行数
+    missing: int    # 元から空の行数
+
+
+def farm_timezone(farm: Optional[str]) -> str:
+    return FARM_TIMEZONES.get(farm, DEFAULT_TIMEZONE)
+
+
+def _matches(fmt: str, value: str) -> bool:
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def detect_format(sample: Iterable, formats: tuple = CANDIDATE_FORMATS) -> str:
+    """
+    サンプルのうち最も多くの値を解釈できる書式を返す（同数なら候補順）。
+    単位行などの混入を許すため、全件一致は求めない。
+    """
+    values = [str(v).strip() for v in sample if isinstance(v, str) and v.strip()]
+    if not values:
+        raise TimestampFormatError("時刻列に値がありません。")
+    best, best_hits = None, 0
+    for fmt in formats:
+        hits = sum(_matches(fmt, v) for v in values)
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+        if hits == len(values):
+            break
+    if best is None:
+        raise TimestampFormatError(f"時刻の書式を判別できません。例: {values[:3]}")
+    return best
+
+
+def parse(
+    values: pd.Series,
+    fmt: Optional[str] = None,
+    tz: Optional[str] = None,
+) -> ParseResult:
+    """
+    時刻列を固定書式でパースする。fmt を省略するとサンプルから決める。
+    tz を渡すとその地域時刻として tz を付ける（存在しない・重複する時刻は NaT として数える）。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+        fmt = fmt or "datetime64"
+        missing = int(values.isna().sum())
+    else:
+        as_str = values.astype("string").str.strip()
+        present = as_str.notna() & (as_str != "")
+        missing = int((~present).sum())
+        if fmt is None:
+            fmt = detect_format(as_str[present].head(SAMPLE_SIZE).tolist())
+        parsed = pd.to_datetime(as_str.where(present), format=fmt, errors="coerce")
+
+    if tz is not None:
+        if parsed.dt.tz is None:
+            parsed = parsed.dt.tz_localize(tz, ambiguous="NaT", nonexistent="NaT")
+        else:
+            parsed = parsed.dt.tz_convert(tz)
+
+    failed = int(parsed.isna().sum()) - missing
+    return ParseResult(values=parsed, fmt=fmt, failed=failed, missing=missing)
+
+
+def to_local_naive(values: pd.Series) -> pd.Series:
+    """tz 付きの時刻から tz を外す（地域時刻のまま）。"""
+    if getattr(values.dt, "tz", None) is None:
+        return values
+    return values.dt.tz_localize(None)
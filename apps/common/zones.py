@@ -0,0 +1,336 @@
+"""
+ゾーン（ハウス × 段）のマスタと、ベッド1mあたり収量のファクトテーブル。
+
+data/db/zone_master.csv（farm_id, zone_code, house_name, bed_count, tier, length_m）を
+dim_zone に入れ、収穫の farm（例: "愛川C1_上段"）がどのゾーンかを farm_zone に1回だけ解決する。
+月次収量との結合も取り込み時に1回だけ行い、fact_yield_zone に kg / ベッドm まで入れておく
+（画面では farm 名の分解も pandas での結合もしない）。
+
+    with engine.begin() as conn:
+        zones.rebuild(conn)                        # マスタを読み直して全体を作り直す
+        zones.refresh(conn, months={"2025-08"})    # 取り込んだ月の分だけ作り直す
+
+- bed_m = bed_count * length_m（ゾーンのベッドの総延長）
+- farm → ゾーン: farm 名を 現場の接頭辞（"愛川"）+ ハウス名（"C1"）+ 段（"上段" / "ベッド" / "下段" など）に分け、
+  接頭辞を SITE_PREFIXES で farm_id にしてから、farm_id・ハウス名・段で引く。
+  段の無い farm は、そのハウスにゾーンが1つならそれ、複数なら middle にする
+- farm_zone には引けなかった farm も zone_code = NULL で入れ、farm 名から分けた base_farm / tier_label を持たせる
+  （段差比較の画面は、ゾーンの有無にかかわらずこの2列でハウス・段をそろえる）
+- 自動で引けない farm は farm_zone に matched_by = 'manual' で zone_code を手で入れる（作り直しでも消さない）
+- conn は SQLAlchemy の Connection か sqlite3.Connection（import_runs と同じ）
+"""
+import re
+import sqlite3
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from apps.common import table_stats
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+ZONE_MASTER_PATH = ROOT_DIR / "data" / "db" / "zone_master.csv"
+
+MASTER_COLUMNS = ["farm_id", "zone_code", "house_name", "bed_count", "tier", "length_m"]
+
+# farm 名の段の表記 → dim_zone.tier
+TIER_ALIASES = {
+    "上段": "upper",
+    "ue": "upper",
+    "upper": "upper",
+    "ベッド": "middle",
+    "中段": "middle",
+    "bed": "middle",
+    "middle": "middle",
+    "下段": "lower",
+    "shita": "lower",
+    "lower": "lower",
+}
+# dim_zone.tier → 画面の表記
+TIER_LABELS = {"upper": "上段", "middle": "ベッド", "lower": "下段"}
+
+# farm 名の現場の接頭辞 → zone_master.csv の farm_id。
+# 接頭辞が無い・ここに無い farm はゾーンを引かない（別の現場の同じハウス名に当てないため）
+SITE_PREFIXES = {
+    "愛川": 1,
+}
+
+_HOUSE = re.compile(r"([A-Za-z]\d+)$")
+
+DIM_ZONE_DDL = """
+CREATE TABLE IF NOT EXISTS dim_zone (
+  zone_code   TEXT PRIMARY KEY,
+  farm_id     INTEGER NOT NULL,
+  house_name  TEXT NOT NULL,
+  tier        TEXT NOT NULL,      -- upper / middle / lower
+  tier_label  TEXT NOT NULL,      -- 上段 / ベッド / 下段
+  bed_count   INTEGER NOT NULL,
+  length_m    REAL NOT NULL,
+  bed_m       REAL NOT NULL       -- bed_count * length_m
+);
+"""
+
+FARM_ZONE_DDL = """
+CREATE TABLE IF NOT EXISTS farm_zone (
+  farm        TEXT PRIMARY KEY,   -- harvest_monthly.farm
+  base_farm   TEXT,               -- farm 名から段を除いたもの（例: 愛川C1）
+  tier_label  TEXT,               -- farm 名の段（上段 / ベッド / 下段。無ければ NULL）
+  zone_code   TEXT,               -- 引けなかったときは NULL
+  matched_by  TEXT NOT NULL       -- 'rule'（farm 名から解決） / 'manual'
+);
+"""
+
+FACT_DDL = """
+CREATE TABLE IF NOT EXISTS fact_yield_zone (
+  farm          TEXT NOT NULL,
+  month         TEXT NOT NULL,    -- 'YYYY-MM'
+  zone_code     TEXT NOT NULL,
+  house_name    TEXT NOT NULL,
+  tier          TEXT NOT NULL,
+  tier_label    TEXT NOT NULL,
+  total_kg      REAL NOT NULL,
+  bed_m         REAL NOT NULL,
+  kg_per_bed_m  REAL,             -- bed_m が 0 のときは NULL
+  PRIMARY KEY (farm, month)
+);
+"""
+
+INDEX_DDLS = (
+    "CREATE INDEX IF NOT EXISTS idx_dim_zone_house_tier ON dim_zone (house_name, tier);",
+    "CREATE INDEX IF NOT EXISTS idx_farm_zone_zone ON farm_zone (zone_code);",
+    "CREATE INDEX IF NOT EXISTS idx_fact_yield_zone_house_month ON fact_yield_zone (house_name, month);",
+)
+
+
+def _execute(conn, sql: str, params: tuple = ()):
+    if isinstance(conn, sqlite3.Connection):
+        return conn.execute(sql, params)
+    return conn.exec_driver_sql(sql, params)
+
+
+def _executemany(conn, sql: str, rows: list) -> None:
+    if not rows:
+        return
+    if isinstance(conn, sqlite3.Connection):
+        conn.executemany(sql, rows)
+    else:
+        conn.exec_driver_sql(sql, rows)
+
+
+def _exists(conn, name: str) -> bool:
+    return bool(_execute(conn, f'PRAGMA table_info("{name}");').fetchall())
+
+
+def ensure_tables(conn) -> None:
+    for ddl in (DIM_ZONE_DDL, FARM_ZONE_DDL, FACT_DDL, *INDEX_DDLS):
+        _execute(conn, ddl)
+
+
+def read_zone_master(path: Path = ZONE_MASTER_PATH) -> pd.DataFrame:
+    """zone_master.csv を読んで検証する（BOM 付き UTF-8）。"""
+    df = pd.read_csv(path, encoding="utf-8-sig", dtype={"zone_code": str, "house_name": str, "tier": str})
+    missing = [c for c in MASTER_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path.name} に列がありません: {missing}")
+    df = df[MASTER_COLUMNS].copy()
+    for col in ("zone_code", "house_name", "tier"):
+        df[col] = df[col].str.strip()
+    df["tier"] = df["tier"].str.lower()
+
+    unknown = sorted(set(df["tier"]) - set(TIER_LABELS))
+    if unknown:
+        raise ValueError(f"{path.name} の tier が不明です: {unknown}")
+    dup = df.loc[df["zone_code"].duplicated(), "zone_code"].tolist()
+    if dup:
+        raise ValueError(f"{path.name} の zone_code が重複しています: {dup}")
+    df["tier_label"] = df["tier"].map(TIER_LABELS)
+    df["bed_m"] = df["bed_count"] * df["length_m"]
+    return df
+
+
+def load_zone_master(conn, path: Path = ZONE_MASTER_PATH) -> int:
+    """dim_zone を zone_master.csv の内容で置き換える。戻り値: ゾーン数。"""
+    df = read_zone_master(path)
+    ensure_tables(conn)
+    _execute(conn, "DELETE FROM dim_zone;")
+    _executemany(
+        conn,
+        """
+        INSERT INTO dim_zone
+          (zone_code, farm_id, house_name, tier, tier_label, bed_count, length_m, bed_m)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+        list(
+            df[["zone_code", "farm_id", "house_name", "tier", "tier_label", "bed_count", "length_m", "bed_m"]]
+            .astype(object)
+            .itertuples(index=False, name=None)
+        ),
+    )
+    return len(df)
+
+
+@dataclass(frozen=True)
+class FarmName:
+    base_farm: str                # 段を除いた farm 名（例: 愛川C1）
+    tier: Optional[str] = None    # upper / middle / lower（段の表記が TIER_ALIASES に無ければ None）
+    tier_label: Optional[str] = None
+    site: Optional[str] = None    # 現場の接頭辞（例: 愛川）
+    house: Optional[str] = None   # ハウス名（例: C1）
+
+
+def split_farm(farm: str) -> FarmName:
+    """
+    farm 名を分ける。"愛川C1_上段" → 愛川 / C1 / upper、"愛川ｇ１ ベッド" → 愛川 / G1 / middle。
+    段が TIER_ALIASES に無い "_" 付きの名前は、"_" の前後を base_farm / tier_label にする
+    （段差比較の画面の以前の分け方と同じ）。
+    """
+    name = unicodedata.normalize("NFKC", str(farm)).strip()
+    parts = re.split(r"[_\-\s]+", name)
+    tier = TIER_ALIASES.get(parts[-1].lower()) if len(parts) > 1 else None
+    if tier:
+        base, label = "".join(parts[:-1]), TIER_LABELS[tier]
+    elif "_" in name:
+        base, label = name.split("_", 1)
+    else:
+        base, label = "".join(parts), None
+
+    m = _HOUSE.search(base)
+    if not m:
+        return FarmName(base, tier, label)
+    site, house = base[: m.start()].strip(), m.group(1).upper()
+    return FarmName(site + house, tier, label, site, house)
+
+
+def resolve_zone(farm: str, zones: pd.DataFrame) -> Optional[str]:
+    """
+    farm 名 → zone_code。zones は dim_zone（farm_id, house_name, tier, zone_code）。
+    現場（SITE_PREFIXES）とハウスが一致するゾーンのうち、段が合うもの（段が無ければ1つだけのもの / middle）。
+    """
+    name = split_farm(farm)
+    farm_id = SITE_PREFIXES.get(name.site)
+    if farm_id is None or name.house is None:
+        return None
+    if name.tier is None and name.tier_label is not None:
+        # "_東" など段として読めない表記はゾーンに当てない
+        return None
+
+    house = zones[(zones["farm_id"] == farm_id) & (zones["house_name"].str.upper() == name.house)]
+    if house.empty:
+        return None
+    tier = name.tier
+    if tier is None:
+        if len(house) == 1:
+            return house["zone_code"].iloc[0]
+        tier = "middle"
+    hit = house[house["tier"] == tier]
+    return hit["zone_code"].iloc[0] if len(hit) else None
+
+
+def map_farms(conn, farms: Optional[Iterable[str]] = None) -> list:
+    """
+    harvest_monthly の farm（farms を渡せばその分だけ）を farm_zone に入れる。
+    引けなかった farm も zone_code = NULL で入れる（base_farm / tier_label は持たせる）。
+    matched_by = 'manual' の行は zone_code をそのままにする。戻り値: ゾーンを引けなかった farm。
+    """
+    ensure_tables(conn)
+    if farms is None:
+        if not _exists(conn, "harvest_monthly"):
+            return []
+        farms = [
+            r[0]
+            for r in _execute(
+                conn, "SELECT DISTINCT farm FROM harvest_monthly WHERE farm IS NOT NULL;"
+            ).fetchall()
+        ]
+    manual = {
+        r[0]
+        for r in _execute(conn, "SELECT farm FROM farm_zone WHERE matched_by = 'manual';").fetchall()
+    }
+    zones = pd.DataFrame(
+        _execute(conn, "SELECT farm_id, house_name, tier, zone_code FROM dim_zone;").fetchall(),
+        columns=["farm_id", "house_name", "tier", "zone_code"],
+    )
+
+    rows, unmatched = [], []
+    for farm in sorted(set(farms)):
+        name = split_farm(farm)
+        zone = None if farm in manual else resolve_zone(farm, zones)
+        if zone is None and farm not in manual:
+            unmatched.append(farm)
+        rows.append((farm, name.base_farm, name.tier_label, zone))
+    _executemany(
+        conn,
+        """
+        INSERT INTO farm_zone (farm, base_farm, tier_label, zone_code, matched_by)
+        VALUES (?, ?, ?, ?, 'rule')
+        ON CONFLICT(farm) DO UPDATE SET
+          base_farm  = excluded.base_farm,
+          tier_label = excluded.tier_label,
+          zone_code  = CASE WHEN farm_zone.matched_by = 'manual'
+                            THEN farm_zone.zone_code ELSE excluded.zone_code END;
+        """,
+        rows,
+    )
+    return unmatched
+
+
+def refresh_fact(conn, months: Optional[Iterable[str]] = None) -> None:
+    """
+    fact_yield_zone を harvest_monthly × farm_zone × dim_zone から作り直す。
+    months（'YYYY-MM'）を渡すとその月だけ。crop 列がある harvest_monthly は作物を合計する。
+    """
+    ensure_tables(conn)
+    where, h_where, params = "", "", ()
+    if months is not None:
+        months = sorted(set(months))
+        if not months:
+            return
+        placeholders = ", ".join("?" * len(months))
+        where, h_where = f"WHERE month IN ({placeholders})", f"WHERE h.month IN ({placeholders})"
+        params = tuple(months)
+    _execute(conn, f"DELETE FROM fact_yield_zone {where};", params)
+
+    if _exists(conn, "harvest_monthly"):
+        _execute(
+            conn,
+            f"""
+            INSERT INTO fact_yield_zone
+              (farm, month, zone_code, house_name, tier, tier_label, total_kg, bed_m, kg_per_bed_m)
+            SELECT
+              h.farm, h.month, z.zone_code, z.house_name, z.tier, z.tier_label,
+              SUM(h.total_kg) AS total_kg,
+              z.bed_m,
+              SUM(h.total_kg) / NULLIF(z.bed_m, 0)
+            FROM harvest_monthly h
+            JOIN farm_zone fz ON fz.farm = h.farm
+            JOIN dim_zone z ON z.zone_code = fz.zone_code
+            {h_where}
+            GROUP BY h.farm, h.month
+            HAVING SUM(h.total_kg) IS NOT NULL;
+            """,
+            params,
+        )
+    table_stats.refresh(conn, "fact_yield_zone")
+
+
+def refresh(conn, months: Optional[Iterable[str]] = None) -> list:
+    """
+    取り込み後に呼ぶ。dim_zone が空なら先にマスタを読み込み、新しい farm も解決してから
+    ファクトを作り直す。戻り値: ゾーンを引けなかった farm。
+    """
+    ensure_tables(conn)
+    if _execute(conn, "SELECT 1 FROM dim_zone LIMIT 1;").fetchone() is None and ZONE_MASTER_PATH.exists():
+        load_zone_master(conn)
+    unmatched = map_farms(conn)
+    refresh_fact(conn, months)
+    return unmatched
+
+
+def rebuild(conn, path: Path = ZONE_MASTER_PATH) -> tuple[int, list]:
+    """マスタを読み直し、farm の解決とファクトを全体で作り直す。戻り値: (ゾーン数, 引けなかった farm)。"""
+    n_zones = load_zone_master(conn, path)
+    unmatched = map_farms(conn)
+    refresh_fact(conn)
+    return n_zones, unmatched
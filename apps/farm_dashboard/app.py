@@ -1,9 +1,8 @@
-import sqlite3
+import sys
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
-import plotly.express as px
 import yaml
 
 BASE = Path(__file__).resolve().parent
@@ -11,29 +10,33 @@ ROOT = BASE.parent.parent
 CFG = yaml.safe_load((ROOT / "config" / "app.yaml").read_text(encoding="utf-8"))
 DB = (ROOT / CFG["db_path"]).resolve()
 
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from apps.common import db, frames
+
 st.set_page_config(page_title=CFG.get("app_title", "Farm Dashboard"), layout="wide")
 
 
 def list_tables(db_path: Path) -> pd.DataFrame:
     try:
-        with sqlite3.connect(str(db_path)) as conn:
-            return pd.read_sql(
-                "SELECT name, type FROM sqlite_master "
-                "WHERE type IN ('table','view') ORDER BY type, name;",
-                conn,
-            )
+        return pd.read_sql(
+            "SELECT name, type FROM sqlite_master "
+            "WHERE type IN ('table','view') ORDER BY type, name;",
+            db.read_engine(str(db_path)),
+        )
     except Exception as e:
         return pd.DataFrame({"name": [f"ERROR: {e}"], "type": [""]})
 
 
 @st.cache_data(ttl=30)
+@frames.compact_loader(dims=("farm",), months=("month",), measures=("total_kg",))
 def load_df(source: str) -> pd.DataFrame:
     q_mv = "SELECT month, farm, total_kg FROM mv_harvest_monthly ORDER BY month, farm"
     q_view = "SELECT month, farm, total_kg FROM harvest_monthly ORDER BY month, farm"
     query = q_mv if source == "mv" else q_view
 
-    with sqlite3.connect(str(DB)) as conn:
-        return pd.read_sql(query, conn)
+    return pd.read_sql(query, db.read_engine(str(DB)))
 
 
 def main():
@@ -68,6 +71,9 @@ def main():
         if df.empty:
             st.info("データがありません。")
         else:
+            # plotly は読み込みが重いので、グラフを描くときに初めて import する
+            import plotly.express as px
+
             fig = px.bar(
                 df,
                 x="month",
@@ -1,4 +1,6 @@
-import sqlite3
+import io
+import sys
+import time
 from pathlib import Path
 
 import pandas as pd
@@ -15,6 +17,20 @@ ROOT = find_project_root(Path(__file__).resolve())
 CFG = yaml.safe_load((ROOT / "config" / "app.yaml").read_text(encoding="utf-8"))
 DB = (ROOT / CFG["db_path"]).resolve()
 
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from apps.common import (
+    brand_cube,
+    column_map,
+    db,
+    harvest_pipeline,
+    import_runs,
+    table_stats,
+    timestamps,
+    zones,
+)
+
 st.set_page_config(page_title="CSVを取り込み", layout="wide")
 st.title("収量CSV取り込み（継続運用）")
 
@@ -28,154 +44,219 @@ with st.expander("Debug（環境確認）", expanded=False):
 # DBフォルダだけは必ず作る（ファイルが無いなら作成される）
 DB.parent.mkdir(parents=True, exist_ok=True)
 
-# SQLite接続（失敗理由を画面に出す）
-try:
-    conn = sqlite3.connect(str(DB))
-except Exception as e:
-    st.error(f"SQLite connect failed: {e}")
-    st.stop()
+# 書き込み用のエンジン（st.cache_resource でプロセスに1つ。再実行のたびに接続し直さない）
+writer = db.write_engine(str(DB))
 
-# テンプレ
+# テンプレ（収穫記録の CSV そのまま。列名の表記ゆれは column_map.HARVEST_SPEC で吸収する）
 TEMPLATE = pd.DataFrame(
     {
-        "farm": ["愛川c1"],
-        "month": ["2025-10"],
-        "total_kg": [123.4],
+        "収穫日": ["2025/10/1"],
+        "企業名": ["愛川c1"],
+        "収穫野菜名": ["ミニトマト"],
+        "収穫量（ｇ）": [1200],
     }
 )
 
+# 1チャンクの行数 / プレビューに出す行数 / UPSERT 1回あたりの行数
+CHUNK_ROWS = 50_000
+PREVIEW_ROWS = 200
+WRITE_BATCH_ROWS = 5_000
+
+# 同じ (farm, month) が既にあるときの扱い。
+# 画面から入れた行（crop = harvest_pipeline.UPLOAD_CROP）だけが対象で、
+# raw_csv から変換した作物ごとの行（build_harvest_monthly が書く）には触らない
+MERGE_POLICIES = {
+    "replace": "置き換え（画面から取り込んだ分をこのファイルの月合計で上書き）",
+    "add": "加算（画面から取り込んだ分にこのファイルの分を足す）",
+}
+
+UPSERT_SQL = {
+    "replace": """
+        INSERT INTO harvest_monthly (farm, crop, month, total_kg)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(farm, crop, month) DO UPDATE SET
+            total_kg = excluded.total_kg;
+    """,
+    "add": """
+        INSERT INTO harvest_monthly (farm, crop, month, total_kg)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(farm, crop, month) DO UPDATE SET
+            total_kg = total_kg + excluded.total_kg;
+    """,
+}
+
 with st.expander("CSVテンプレートを確認", expanded=False):
     st.dataframe(TEMPLATE, width="stretch", hide_index=True)
 
-st.caption("CSV列: farm, month, total_kg(UTF-8推奨)")
+st.caption("CSV列: 収穫日, 企業名, 収穫量（ｇ）（UTF-8 / CP932 / UTF-16）")
 file = st.file_uploader("CSVファイルを選択", type=["csv"])
 if not file:
     st.stop()
 
-# 読み込み(file)
-def read_csv_flexible(file):
-    for enc in ("utf-8-sig", "utf-8", "cp932"):
-        try:
-            file.seek(0) # 重要:毎回先頭に戻す
-            return pd.read_csv(file, encoding=enc)
-        except UnicodeDecodeError:
-            continue
-        except pd.errors.EmptyDataError:
-            continue
-    raise ValueError("CSVの文字コードを判別できません（UTF-8　/　CP932非対応 or 空ファイル）")
-    
-df = read_csv_flexible(file)    
-
-<<<<<<< HEAD
-st.write("読み込めた列名:", list(df.columns))
-st.dataframe(df.head(5), use_container_width=True)
-
-# 列名マッピング（実CSV　→　内部仕様）
-colmap = {
-    "企業名": "farm",
-    "収穫日": "date",
-    "収穫量（ｇ）": "total_g",
-}
+# 文字コード・区切り・列の位置は先頭だけで判定する（ファイル全体を何度も読まない）
+t0 = time.perf_counter()
+try:
+    file.seek(0)
+    layout = column_map.sniff_layout(file.name, prefix=file.read(column_map.PREFIX_BYTES))
+    read_kwargs, names = column_map.read_kwargs(layout, column_map.HARVEST_TOTAL_SPEC)
+except (column_map.ColumnMappingError, UnicodeDecodeError) as e:
+    st.error(f"CSVを読み込めません: {e}")
+    st.stop()
+sniff_ms = (time.perf_counter() - t0) * 1e3
 
-df = df.rename(columns=colmap)
+with st.expander("読み込み設定（自動判定）", expanded=False):
+    st.write("文字コード:", layout.encoding)
+    st.write("区切り:", repr(layout.sep))
+    st.write("列名:", list(layout.columns))
 
-required_src = {"farm", "month", "total_kg"}
-missing_src = required_src - set(df.columns)
-if missing:
-    st.error(f"CSVに必須列が不足: {sorted(missing_src)}")
-    st.stop()
 
-# 変換処理(日時→月次、g→kg)
-=======
-# 列名マッピング
-rename_map = {}
-for c in df.columns:
-    if "企業" in c:
-        rename_map[c] = "farm"
-    elif "収穫日" in c or "日付" in c:
-        rename_map[c] = "date"
-    elif "収穫量" in c:
-        rename_map[c] = "total_g"
-
-df = df.rename(columns=rename_map)
-
-# 元CSVに必要な列チェック
-required_src = {"farm", "date", "total_g"}
-missing_src = required_src - set(df.columns)
-if missing_src:
-    st.error(f"CSVに必要な列が不足しています: {sorted(missng_src)}")
-    st.stop()
+def iter_chunks(chunksize: int = CHUNK_ROWS, nrows=None):
+    """必要な列だけを date / company / amount_g の名前でチャンクごとに返す。"""
+    # pandas にバイト列と encoding を渡すと、読み終わりにアップロードのバッファごと閉じられる。
+    # 自分でテキストに包み、最後に detach して file を使い回せるようにする
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding=layout.encoding, newline="")
+    kwargs = {k: v for k, v in read_kwargs.items() if k != "encoding"}
+    try:
+        for chunk in pd.read_csv(text, chunksize=chunksize, nrows=nrows, **kwargs):
+            chunk.columns = names
+            yield chunk
+    finally:
+        text.detach()
+
+
+def convert(chunk: pd.DataFrame, date_format=None):
+    """
+    収穫記録 → (farm, month, total_kg)。日付が読めない・収穫量が数値でない行は除く。
+    戻り値: (変換後, 除外した行数, 日付の書式)
+    """
+    parsed = timestamps.parse(chunk["date"], fmt=date_format)
+    out = pd.DataFrame(
+        {
+            "farm": chunk["company"].astype("string").str.strip(),
+            "month": parsed.values.dt.strftime("%Y-%m"),
+            "total_kg": pd.to_numeric(chunk["amount_g"], errors="coerce") / 1000.0,
+        }
+    )
+    ok = out.notna().all(axis=1)
+    return out[ok], int((~ok).sum()), parsed.fmt
 
-# 変換処理
->>>>>>> 21b8d39 (finish)
-df["farm"] = df["farm"].astype(str).str.strip()
-df["month"] = pd.to_datetime(df["date"], errors="coerce").dt.to_period("M").astype(str)
-df["total_kg"] = pd.to_numeric(df["total_g"], errors="coerce") / 1000.0
 
-required = {"farm", "month", "total_kg"}
-missing = required - set(df.columns)
-if missing:
-    st.error(f"変換後に必須列が不足: {sorted(missing)}")
+# プレビューは先頭の数百行だけ変換して出す
+try:
+    preview_src = next(iter_chunks(chunksize=PREVIEW_ROWS, nrows=PREVIEW_ROWS), None)
+    if preview_src is None:
+        st.warning("データ行がありません。")
+        st.stop()
+    # 収穫日は先頭サンプルで書式を決め、以降のチャンクも同じ固定書式でパースする
+    preview, preview_failed, date_format = convert(preview_src)
+except timestamps.TimestampFormatError as e:
+    st.error(f"収穫日の書式を判別できません: {e}")
     st.stop()
 
 st.subheader("取り込みプレビュー")
-st.dataframe(df, width="stretch", hide_index=True)
+st.caption(f"先頭 {len(preview_src)} 行の変換結果（収穫日の書式 {date_format}）")
+if preview_failed:
+    st.warning(f"先頭 {len(preview_src)} 行のうち {preview_failed} 行は収穫日・収穫量を解釈できないため除外されます。")
+st.dataframe(preview, width="stretch", hide_index=True)
 
 # 取り込み
 # ここでは[harvest_monthly] [mv_harvest_monthly] をテーブルとして運用する想定
 # 無ければ作る
-def ensure_tables(c: sqlite3.Connection) -> None:
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS harvest_monthly (
-            farm TEXT NOT NULL,
-            month TEXT NOT NULL,
-            total_kg REAL NOT NULL,
-            PRIMARY KEY (farm, month)
-        );
-        """
-    )
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS mv_harvest_monthly (
-            month TEXT NOT NULL,
-            farm TEXT NOT NULL,
-            total_kg REAL NOT NULL,
-            PRIMARY KEY (farm, month)
-        );
-        """
-    )
+def ensure_tables(c) -> None:
+    # build_harvest_monthly と同じ形（(farm, crop, month) がキー）。キーの無い古い表はここで作り直される
+    harvest_pipeline.ensure_harvest_monthly(c)
+    c.exec_driver_sql(harvest_pipeline.MV_DDL)
+    # 今回の取り込みで触った (farm, month)。MV はこの分だけ集計し直す
+    c.exec_driver_sql("DROP TABLE IF EXISTS temp._upload_keys;")
+    c.exec_driver_sql("CREATE TEMP TABLE _upload_keys (farm TEXT, month TEXT, PRIMARY KEY (farm, month));")
+
+
+def aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """(farm, month) ごとの合計（行単位ではなくキー単位で書くため）。"""
+    return df.groupby(["farm", "month"], as_index=False, sort=False)["total_kg"].sum()
+
 
-def refresh_mv(c: sqlite3.Connection) -> None:
-    c.execute("DELETE FROM mv_harvest_monthly;")
-    c.execute(
-        """
-        INSERT INTO mv_harvest_monthly (month, farm, total_kg)
-        SELECT month, farm, SUM(total_kg)
-        FROM harvest_monthly
-        GROUP BY month, farm;
-        """
+def write_monthly(c, monthly: pd.DataFrame, policy: str) -> None:
+    # NumPy のレコードを経由せず、Python のタプルで渡す
+    crop = harvest_pipeline.UPLOAD_CROP
+    rows = [
+        (f, crop, m, kg)
+        for f, m, kg in zip(
+            monthly["farm"].tolist(), monthly["month"].tolist(), monthly["total_kg"].tolist()
+        )
+    ]
+    if not rows:
+        return
+    for i in range(0, len(rows), WRITE_BATCH_ROWS):
+        c.exec_driver_sql(UPSERT_SQL[policy], rows[i : i + WRITE_BATCH_ROWS])
+    c.exec_driver_sql(
+        "INSERT OR IGNORE INTO temp._upload_keys (farm, month) VALUES (?, ?);",
+        [(f, m) for f, _, m, _ in rows],
     )
 
+
+policy = st.radio(
+    "既存の月データとの重なり",
+    list(MERGE_POLICIES),
+    format_func=MERGE_POLICIES.get,
+    horizontal=True,
+)
+
 if st.button("取り込む(UPSERT)", type="primary"):
+    progress = st.progress(0.0, text="取り込み中…")
     try:
-        ensure_tables(conn)
-
-        rows = df.to_records(index=False)
-        conn.executemany(
-            """
-            INSERT INTO harvest_monthly (farm, month, total_kg)
-            VALUES (?, ?, ?)
-            ON CONFLICT(farm, month) DO UPDATE SET
-                total_kg = excluded.total_kg;
-            """,
-            rows,
-        )
+        with import_runs.track(
+            writer, source="upload", kind="harvest_monthly", path=file.name, nbytes=file.size
+        ) as run, writer.begin() as conn:
+            run.add_stage("sniff", sniff_ms)
+            ensure_tables(conn)
+            n_rows = 0
+            n_failed = 0
+
+            # チャンクごとに (farm, month) へ畳み、チャンクをまたぐキーは最後にもう一度まとめる
+            partials = []
+            chunks = iter_chunks()
+            while True:
+                with run.stage("parse"):
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    df, failed, date_format = convert(chunk, date_format)
+                    partials.append(aggregate(df))
+                n_rows += len(chunk)
+                n_failed += failed
+                # 読み込み位置で進捗を出す（pandas の先読みの分だけ先に進む）
+                done = min(file.tell() / max(file.size, 1), 1.0)
+                progress.progress(done, text=f"取り込み中… {n_rows:,} 行")
+            run.rows = n_rows
+            run.failed_rows = n_failed
 
-        refresh_mv(conn)
-        conn.commit()
-        st.success(f"取り込み完了: {len(df)}行")
+            with run.stage("aggregate"):
+                monthly = aggregate(pd.concat(partials, ignore_index=True))
+            with run.stage("load"):
+                write_monthly(conn, monthly, policy)
+
+            with run.stage("refresh_mv"):
+                harvest_pipeline.refresh_mv(conn, "temp._upload_keys")
+                # UPSERT は件数が足し算にならないので数え直す（harvest_monthly は小さい）
+                table_stats.refresh(conn, "harvest_monthly")
+            with run.stage("cube"):
+                # ブランド別のキューブも取り込んだ月の分だけ作り直す
+                brand_cube.refresh(conn, set(monthly["month"]))
+            with run.stage("zones"):
+                # 新しい farm のゾーン解決と、ベッド1mあたり収量（fact_yield_zone）
+                unmatched = zones.refresh(conn, set(monthly["month"]))
+        progress.progress(1.0, text="完了")
+        if n_failed:
+            st.warning(f"収穫日・収穫量を解釈できない {n_failed} 行を除外しました。")
+        if unmatched:
+            st.warning(f"ゾーン（zone_master.csv）を引けなかった farm: {', '.join(unmatched)}")
+        st.success(
+            f"取り込み完了: {n_rows - n_failed:,}行 → {len(monthly):,} 件の (farm, month) を"
+            f"{'置き換え' if policy == 'replace' else '加算'}（{run.duration_ms:,.0f} ms）"
+        )
     except Exception as e:
-        conn.rollback()
+        progress.empty()
         st.error(f"取り込み失敗: {e}")
         st.stop()
@@ -1,14 +1,15 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
-from db_config import get_engine
+from apps.common import db, frames
 
 st.set_page_config(page_title="収量サマリ", layout="wide")
 st.title("収量サマリ")
 
-engine = get_engine()
+engine = db.read_engine()
 
 @st.cache_data(ttl=60)
+@frames.compact_loader(dims=("farm",), months=("month",), measures=("total_kg",))
 def load_harvest():
     q = "select month, farm, total_kg from harvest_monthly order by month, farm"
     return pd.read_sql(q, engine)
@@ -1,14 +1,12 @@
 import streamlit as st
 import pandas as pd
-import statsmodels.api as sm
-import plotly.express as px
 
-from db_config import get_engine
+from apps.common import db, frames
 
 st.set_page_config(page_title="環境相関", layout="wide")
 st.title("環境データ × 収量")
 
-engine = get_engine()
+engine = db.read_engine()
 
 # =========================
 # ユーティリティ関数
@@ -28,6 +26,7 @@ def env_rows_in_month(month: str):
     return pd.read_sql(q, engine, params={"m": month})
 
 @st.cache_data(ttl=60)
+@frames.compact_loader(dims=("farm",), measures=("total_kg",))
 def harvest_in_month(month: str):
     q = """
         SELECT farm, total_kg
@@ -108,7 +107,13 @@ sel_farms = st.multiselect("ファームを選択", farms_all, default=farms_all
 
 filtered = df[df["month"].isin(sel_months) & df["farm"].isin(sel_farms)]
 
-if not filtered.empty:
+def render_correlation(filtered: pd.DataFrame) -> None:
+    """散布図と回帰の統計サマリ。"""
+    # plotly / statsmodels は読み込みに時間がかかるので、この節を描くときに初めて import する
+    # （散布図の trendline="ols" も statsmodels を使う）
+    import plotly.express as px
+    import statsmodels.api as sm
+
     # 散布図（温度）
     fig = px.scatter(
         filtered,
@@ -192,56 +197,9 @@ if not filtered.empty:
 
     st.subheader("対象データ")
     st.dataframe(filtered, use_container_width=True, hide_index=True)
-else:
-    st.info("該当データがありません。")
-import numpy as np
-import statsmodels.api as sm
-import plotly.express as px
-import streamlit as st
-import pandas as pd
-from db_config import get_engine
-
-st.set_page_config(page_title="環境相関", layout="wide")
-st.title("環境データ　×　収量")
-
-engine = get_engine()
-
-@st.cache_data(ttl=60)
-def months():
-    return pd.read_sql("select distinct month from harvest_monthly order by month", engine)["month"].tolist()
-
-@st.cache_data(ttl=60)
-def env_rows_in_month(month: str):
-    q = """
-    select * from env_rows
-    where substr(ts,1,7)=:m
-    """
-    return pd.read_sql(q, engine, params={"m": month})
-
-@st.cache_data(ttl=60)
-def harvest_in_month(month: str):
-    q = """
-    select farm, total_kg
-    from harvest_monthly
-    where month=:m
-    order by total_kg desc
-    """
-    return pd.read_sql(q, engine, params={"m": month})
-
-m = months()
-if not m:
-    st.info("harvest_monthly が空です。")
-    st.stop()
-
-sel_month = st.selectbox("月を選択(YYYY-MM)", m, index=len(m)-1)
-env = env_rows_in_month(sel_month)
-har = harvest_in_month(sel_month)
-
-left, right = st.columns(2)
-with left:
-    st.subheader(f"収量ランキング({sel_month})")
-    st.dataframe(har, use_container_width=True, hide_index=True)
 
-with right:
-    st.subheader(f"環境データ({sel_month})")
 
+if not filtered.empty:
+    render_correlation(filtered)
+else:
+    st.info("該当データがありません。")
@@ -3,23 +3,34 @@ import sys
 
 import streamlit as st
 import pandas as pd
-import statsmodels.api as sm
-import altair as alt
 
 # プロジェクトルート（heartful-analytics）を import パスに追加
 ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from db_config import get_engine
+from apps.common import db, frames, perf
 
 
 @st.cache_data
+@frames.compact_loader(
+    dims=("farm",),
+    months=("month",),
+    measures=(
+        "mean_temp",
+        "mean_humid",
+        "mean_vpd_kpa",
+        "mean_sand_temp",
+        "mean_water",
+        "mean_irradiance",
+        "mean_kg",
+    ),
+)
 def load_summary() -> pd.DataFrame:
     """
     v_harvest_env からダッシュボード用のサマリを取得する。
     """
-    engine = get_engine("real")
+    engine = db.read_engine()
     q = """
         SELECT
             farm,
@@ -44,12 +55,15 @@ def load_summary() -> pd.DataFrame:
 # ----------------- 画面レイアウト -----------------
 st.set_page_config(page_title="全期間　相関分析", layout="wide")
 st.title("環境データ × 収量（全期間サマリ）")
+perf.start_page("03_Raw_Inspector")
 
-df = load_summary()
-st.write("▼ df のカラム一覧（内部）", list(df.columns))
+with perf.timer("sql", "load_summary") as t:
+    df = load_summary()
+    t.rows = len(df)
 
 if df.empty:
     st.info("v_harvest_env に有効なデータがありません。")
+    perf.render_panel(debug={"columns": list(df.columns), "memory": df.attrs.get("memory")})
     st.stop()
 
 # 表示用だけ日本語化
@@ -71,163 +85,182 @@ st.subheader("平均値サマリ（農場 × 月）")
 st.dataframe(df_display, use_container_width=True, hide_index=True)
 
 # ----------------- 相関 -----------------
-corr_temp = df["mean_temp"].corr(df["mean_kg"])
-corr_humid = df["mean_humid"].corr(df["mean_kg"])
+with perf.timer("pandas", "corr", rows=len(df)):
+    corr_temp = df["mean_temp"].corr(df["mean_kg"])
+    corr_humid = df["mean_humid"].corr(df["mean_kg"])
 
 st.markdown("### 統計サマリ（相関）")
 st.markdown(f"- **温度×収量の相関係数 r** : `{corr_temp:.3f}`")
 st.markdown(f"- **湿度×収量の相関係数 r** : `{corr_humid:.3f}`")
 
 # ----------------- 単回帰・重回帰 -----------------
-cols1, cols2 = st.columns(2)
-
-# ---------- 左カラム：温度・VPD ----------
-with cols1:
-    # 温度 × 収量
-    st.markdown("### 温度と収量（単回帰）")
-
-    df_temp = df.dropna(subset=["mean_temp", "mean_kg"])
-    if len(df_temp) >= 3:
-        X_t = sm.add_constant(df_temp[["mean_temp"]])
-        y_t = df_temp["mean_kg"]
-
-        model_temp = sm.OLS(y_t, X_t).fit()
-        beta0 = float(model_temp.params.get("const", 0.0))
-        beta1 = float(model_temp.params["mean_temp"])
-
-        st.markdown(
-            f"- 回帰式: `収量 = {beta0:.1f} + {beta1:.2f} × 温度`"
-        )
-        st.markdown(f"- 決定係数 R² = `{model_temp.rsquared:.3f}`")
-
-        # 散布図＋回帰線（Altair）
-        chart_df = df_temp.copy()
-        scatter = (
-            alt.Chart(chart_df)
-            .mark_circle(size=80)
-            .encode(
-                x=alt.X("mean_temp:Q", title="平均温度[℃]"),
-                y=alt.Y("mean_kg:Q", title="平均収量[kg]"),
-                color=alt.Color("farm:N", title="農場"),
-                tooltip=["farm", "month", "mean_temp", "mean_humid", "mean_kg"],
+def render_regressions(df: pd.DataFrame) -> None:
+    """単回帰・重回帰の結果と散布図。"""
+    # statsmodels / altair は読み込みに時間がかかるので、この節を描くときに初めて import する
+    with perf.timer("import", "statsmodels, altair"):
+        import altair as alt
+        import statsmodels.api as sm
+
+    cols1, cols2 = st.columns(2)
+
+    # ---------- 左カラム：温度・VPD ----------
+    with cols1:
+        # 温度 × 収量
+        st.markdown("### 温度と収量（単回帰）")
+
+        df_temp = df.dropna(subset=["mean_temp", "mean_kg"])
+        if len(df_temp) >= 3:
+            X_t = sm.add_constant(df_temp[["mean_temp"]])
+            y_t = df_temp["mean_kg"]
+
+            with perf.timer("model", "OLS temp", rows=len(df_temp)):
+                model_temp = sm.OLS(y_t, X_t).fit()
+            beta0 = float(model_temp.params.get("const", 0.0))
+            beta1 = float(model_temp.params["mean_temp"])
+
+            st.markdown(
+                f"- 回帰式: `収量 = {beta0:.1f} + {beta1:.2f} × 温度`"
             )
-        )
-        line = (
-            alt.Chart(chart_df)
-            .transform_regression(
-                "mean_temp",
-                "mean_kg",
-                method="linear",
-                as_=["mean_temp", "pred_kg"],
+            st.markdown(f"- 決定係数 R² = `{model_temp.rsquared:.3f}`")
+
+            # 散布図＋回帰線（Altair）
+            chart_df = df_temp.copy()
+            scatter = (
+                alt.Chart(chart_df)
+                .mark_circle(size=80)
+                .encode(
+                    x=alt.X("mean_temp:Q", title="平均温度[℃]"),
+                    y=alt.Y("mean_kg:Q", title="平均収量[kg]"),
+                    color=alt.Color("farm:N", title="農場"),
+                    tooltip=["farm", "month", "mean_temp", "mean_humid", "mean_kg"],
+                )
             )
-            .mark_line()
-            .encode(x="mean_temp:Q", y="pred_kg:Q")
-        )
-        st.altair_chart(scatter + line, use_container_width=True)
-    else:
-        st.info("温度と収量の回帰を行うにはデータが足りません。")
-
-    # VPD × 収量
-    st.markdown("### VPD と収量（単回帰）")
-
-    df_vpd = df[["mean_vpd_kpa", "mean_kg"]].dropna()
-    if len(df_vpd) < 2:
-        st.info("VPD と収量の回帰を行うにはデータ点が足りません。")
-    else:
-        X_v = sm.add_constant(df_vpd[["mean_vpd_kpa"]])
-        y_v = df_vpd["mean_kg"]
-
-        model_vpd = sm.OLS(y_v, X_v).fit()
-        a = float(model_vpd.params.get("const", 0.0))
-        b = float(model_vpd.params["mean_vpd_kpa"])
-        r2_v = model_vpd.rsquared
-
-        st.markdown(
-            f"- 回帰式: `収量 = {a:.1f} + {b:.2f} × VPD(kPa)`"
-        )
-        st.markdown(f"- 決定係数 R² = `{r2_v:.3f}`")
-
-        df_line_v = pd.DataFrame(
-            {
-                "mean_vpd_kpa": df_vpd["mean_vpd_kpa"],
-                "pred": model_vpd.predict(X_v),
-            }
-        )
-
-        scatter_v = (
-            alt.Chart(df_vpd)
-            .mark_circle(size=60)
-            .encode(
-                x=alt.X("mean_vpd_kpa:Q", title="平均 VPD(kPa)"),
-                y=alt.Y("mean_kg:Q", title="平均収量[kg]"),
-                tooltip=["mean_vpd_kpa", "mean_kg"],
+            line = (
+                alt.Chart(chart_df)
+                .transform_regression(
+                    "mean_temp",
+                    "mean_kg",
+                    method="linear",
+                    as_=["mean_temp", "pred_kg"],
+                )
+                .mark_line()
+                .encode(x="mean_temp:Q", y="pred_kg:Q")
             )
-        )
-        line_v = (
-            alt.Chart(df_line_v)
-            .mark_line()
-            .encode(x="mean_vpd_kpa:Q", y="pred:Q")
-        )
-
-        st.altair_chart(scatter_v + line_v, use_container_width=True)
-
-# ---------- 右カラム：湿度 ＋ 重回帰 ----------
-with cols2:
-    # 湿度 × 収量
-    st.markdown("### 湿度と収量（単回帰）")
-
-    df_humid = df.dropna(subset=["mean_humid", "mean_kg"])
-    if len(df_humid) >= 3:
-        X_h = sm.add_constant(df_humid[["mean_humid"]])
-        y_h = df_humid["mean_kg"]
-
-        model_humid = sm.OLS(y_h, X_h).fit()
-        beta0_h = float(model_humid.params.get("const", 0.0))
-        beta1_h = float(model_humid.params["mean_humid"])
-
-        st.markdown(
-            f"- 回帰式: `収量 = {beta0_h:.1f} + {beta1_h:.2f} × 湿度`"
-        )
-        st.markdown(f"- 決定係数 R² = `{model_humid.rsquared:.3f}`")
-
-        st.line_chart(
-            df_humid.set_index("mean_humid")["mean_kg"]
-        )
-    else:
-        st.info("湿度と収量の回帰を行うにはデータが足りません。")
-
-    # 温度＋湿度 × 収量（重回帰）
-    st.markdown("### 温度＋湿度と収量（重回帰）")
-
-    required_cols = {"mean_temp", "mean_humid", "mean_kg"}
-    if required_cols.issubset(df.columns):
-        df_multi = df.dropna(subset=list(required_cols))
-        if len(df_multi) >= 3:
-            X_m = sm.add_constant(df_multi[["mean_temp", "mean_humid"]])
-            y_m = df_multi["mean_kg"]
-
-            model_multi = sm.OLS(y_m, X_m).fit()
-            params = model_multi.params
-            beta0_m = float(params.get("const", 0.0))
-            beta_temp = float(params.get("mean_temp", 0.0))
-            beta_humid_m = float(params.get("mean_humid", 0.0))
+            with perf.timer("chart", "temp scatter + regression", rows=len(chart_df)):
+                st.altair_chart(scatter + line, use_container_width=True)
+        else:
+            st.info("温度と収量の回帰を行うにはデータが足りません。")
+
+        # VPD × 収量
+        st.markdown("### VPD と収量（単回帰）")
+
+        df_vpd = df[["mean_vpd_kpa", "mean_kg"]].dropna()
+        if len(df_vpd) < 2:
+            st.info("VPD と収量の回帰を行うにはデータ点が足りません。")
+        else:
+            X_v = sm.add_constant(df_vpd[["mean_vpd_kpa"]])
+            y_v = df_vpd["mean_kg"]
+
+            with perf.timer("model", "OLS vpd", rows=len(df_vpd)):
+                model_vpd = sm.OLS(y_v, X_v).fit()
+            a = float(model_vpd.params.get("const", 0.0))
+            b = float(model_vpd.params["mean_vpd_kpa"])
+            r2_v = model_vpd.rsquared
 
             st.markdown(
-                f"- 回帰式: `収量 = {beta0_m:.1f} + "
-                f"{beta_temp:.2f} × 温度 + {beta_humid_m:.2f} × 湿度`"
+                f"- 回帰式: `収量 = {a:.1f} + {b:.2f} × VPD(kPa)`"
             )
+            st.markdown(f"- 決定係数 R² = `{r2_v:.3f}`")
+
+            df_line_v = pd.DataFrame(
+                {
+                    "mean_vpd_kpa": df_vpd["mean_vpd_kpa"],
+                    "pred": model_vpd.predict(X_v),
+                }
+            )
+
+            scatter_v = (
+                alt.Chart(df_vpd)
+                .mark_circle(size=60)
+                .encode(
+                    x=alt.X("mean_vpd_kpa:Q", title="平均 VPD(kPa)"),
+                    y=alt.Y("mean_kg:Q", title="平均収量[kg]"),
+                    tooltip=["mean_vpd_kpa", "mean_kg"],
+                )
+            )
+            line_v = (
+                alt.Chart(df_line_v)
+                .mark_line()
+                .encode(x="mean_vpd_kpa:Q", y="pred:Q")
+            )
+
+            with perf.timer("chart", "vpd scatter + fit", rows=len(df_vpd)):
+                st.altair_chart(scatter_v + line_v, use_container_width=True)
+
+    # ---------- 右カラム：湿度 ＋ 重回帰 ----------
+    with cols2:
+        # 湿度 × 収量
+        st.markdown("### 湿度と収量（単回帰）")
+
+        df_humid = df.dropna(subset=["mean_humid", "mean_kg"])
+        if len(df_humid) >= 3:
+            X_h = sm.add_constant(df_humid[["mean_humid"]])
+            y_h = df_humid["mean_kg"]
+
+            with perf.timer("model", "OLS humid", rows=len(df_humid)):
+                model_humid = sm.OLS(y_h, X_h).fit()
+            beta0_h = float(model_humid.params.get("const", 0.0))
+            beta1_h = float(model_humid.params["mean_humid"])
+
             st.markdown(
-                f"- 決定係数 R² = `{model_multi.rsquared:.3f}`"
+                f"- 回帰式: `収量 = {beta0_h:.1f} + {beta1_h:.2f} × 湿度`"
             )
+            st.markdown(f"- 決定係数 R² = `{model_humid.rsquared:.3f}`")
 
-            st.write("係数の一覧（切片・温度・湿度）")
-            st.dataframe(params.to_frame("coef"))
+            with perf.timer("chart", "humid line", rows=len(df_humid)):
+                st.line_chart(
+                    df_humid.set_index("mean_humid")["mean_kg"]
+                )
+        else:
+            st.info("湿度と収量の回帰を行うにはデータが足りません。")
+
+        # 温度＋湿度 × 収量（重回帰）
+        st.markdown("### 温度＋湿度と収量（重回帰）")
+
+        required_cols = {"mean_temp", "mean_humid", "mean_kg"}
+        if required_cols.issubset(df.columns):
+            df_multi = df.dropna(subset=list(required_cols))
+            if len(df_multi) >= 3:
+                X_m = sm.add_constant(df_multi[["mean_temp", "mean_humid"]])
+                y_m = df_multi["mean_kg"]
+
+                with perf.timer("model", "OLS temp+humid", rows=len(df_multi)):
+                    model_multi = sm.OLS(y_m, X_m).fit()
+                params = model_multi.params
+                beta0_m = float(params.get("const", 0.0))
+                beta_temp = float(params.get("mean_temp", 0.0))
+                beta_humid_m = float(params.get("mean_humid", 0.0))
+
+                st.markdown(
+                    f"- 回帰式: `収量 = {beta0_m:.1f} + "
+                    f"{beta_temp:.2f} × 温度 + {beta_humid_m:.2f} × 湿度`"
+                )
+                st.markdown(
+                    f"- 決定係数 R² = `{model_multi.rsquared:.3f}`"
+                )
+
+                st.write("係数の一覧（切片・温度・湿度）")
+                st.dataframe(params.to_frame("coef"))
+            else:
+                st.info(
+                    "有効なデータ（欠損除去後）が少なすぎて重回帰が計算できません。"
+                )
         else:
             st.info(
-                "有効なデータ（欠損除去後）が少なすぎて重回帰が計算できません。"
+                "重回帰には 'mean_temp', 'mean_humid', 'mean_kg' の3列が必要です。"
             )
-    else:
-        st.info(
-            "重回帰には 'mean_temp', 'mean_humid', 'mean_kg' の3列が必要です。"
-        )
 
+
+render_regressions(df)
+
+perf.render_panel(debug={"columns": list(df.columns), "memory": df.attrs.get("memory")})
@@ -1,24 +1,34 @@
+from datetime import date
 from pathlib import Path
 import sys
+from typing import TYPE_CHECKING
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import altair as alt
 
 # プロジェクトルート（heartful-analytics）を import パスに追加
 ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from db_config import get_engine
+from apps.common import db, frames, perf
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# VPD の目安帯（kPa）。この範囲の日が多いほど環境が安定している
+VPD_GOOD_RANGE = (0.6, 1.2)
+
 
 @st.cache_data
+@frames.compact_loader(dims=("farm",), measures=("vpd_kpa",))
 def load_env_daily() -> pd.DataFrame:
     """
     env_daily から VPD 日次データを取得する。
     前提： env_daily(farm, date, mean_temp, mean_humidity, vpd_kpa, ...)
     """
-    engine = get_engine("real")
+    engine = db.read_engine()
     q = """
         SELECT
             farm,
@@ -31,19 +41,139 @@ def load_env_daily() -> pd.DataFrame:
     # date を日付型にパース
     return pd.read_sql(q, engine, parse_dates=["date"])
 
+
+@st.cache_data
+def vpd_matrix(farms: tuple, start: date, end: date, freq: str) -> dict:
+    """
+    farm × 日付（freq="D"）/ farm × 月（freq="M"）の VPD 平均を密な行列にする。
+
+    行列はサーバー側で作り、ヒートマップには z / x / y をそのまま渡す
+    （縦持ちの行をブラウザで集計させない）。値の無いセルは NaN。
+    フィルタ（farms, start, end, freq）の組み合わせごとにキャッシュされる。
+
+    戻り値: {"z": ndarray(len(y), len(x)), "x": [ラベル], "y": [farm], "n": 元の行数}
+    """
+    df = load_env_daily()
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    df = df[
+        df["farm"].isin(farms) & (df["date"] >= start_ts) & (df["date"] <= end_ts)
+    ]
+
+    if freq == "M":
+        periods = pd.period_range(start_ts, end_ts, freq="M")
+        col = df["date"].dt.to_period("M").astype("int64").to_numpy() - periods[0].ordinal
+        x = periods.strftime("%Y-%m").tolist()
+    else:
+        days = pd.date_range(start_ts, end_ts, freq="D")
+        col = (df["date"] - start_ts).dt.days.to_numpy()
+        x = days.strftime("%Y-%m-%d").tolist()
+
+    y = list(farms)
+    row = pd.Categorical(df["farm"], categories=y).codes
+
+    # (row, col) を1次元の位置にして bincount で 合計・件数 を集計する
+    n_cells = len(y) * len(x)
+    flat = row.astype(np.int64) * len(x) + col
+    values = df["vpd_kpa"].to_numpy(dtype=float)
+    sums = np.bincount(flat, weights=values, minlength=n_cells)
+    counts = np.bincount(flat, minlength=n_cells)
+    z = np.divide(sums, counts, out=np.full(n_cells, np.nan), where=counts > 0)
+
+    return {"z": z.reshape(len(y), len(x)), "x": x, "y": y, "n": len(df)}
+
+
+def heatmap_figure(mat: dict, x_title: str, colorbar_title: str, x_label: str) -> "go.Figure":
+    # plotly は読み込みが重いので、ヒートマップを描くときに初めて import する
+    with perf.timer("import", "plotly"):
+        import plotly.graph_objects as go
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=mat["z"],
+            x=mat["x"],
+            y=mat["y"],
+            colorscale="YlOrRd",
+            colorbar={"title": colorbar_title},
+            hoverongaps=False,
+            hovertemplate=f"農場: %{{y}}<br>{x_label}: %{{x}}<br>VPD: %{{z:.2f}} kPa<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        xaxis={"title": x_title, "type": "category"},
+        yaxis={"title": "農場", "type": "category"},
+        height=max(300, 40 * len(mat["y"]) + 150),
+        margin={"l": 10, "r": 10, "t": 30, "b": 10},
+    )
+    return fig
+
+
+def render_daily(farms: tuple, start: date, end: date) -> None:
+    st.subheader("日別　VPD　ヒートマップ（farm x date)")
+
+    with perf.timer("pandas", "vpd_matrix D") as t:
+        mat = vpd_matrix(farms, start, end, "D")
+        t.rows = mat["n"]
+    if mat["n"] == 0:
+        st.info("選択した条件に一致するデータがありません。")
+        return
+    with perf.timer("chart", "heatmap D", rows=mat["z"].size):
+        st.plotly_chart(
+            heatmap_figure(mat, "日付", "VPD(kPa)", "日付"), use_container_width=True
+        )
+
+    lo, hi = VPD_GOOD_RANGE
+    st.markdown(
+        f"""
+        - 色が濃いところ　= VPD　が高く、蒸散ストレスが強い日
+        - VPD が **{lo}～{hi} kPa** の日が多いほど、環境としては安定していると考えられます。
+        """
+    )
+
+
+def render_monthly(farms: tuple, start: date, end: date) -> None:
+    st.subheader("月別　VPD　ヒートマップ（farm x month)")
+
+    with perf.timer("pandas", "vpd_matrix M") as t:
+        mat = vpd_matrix(farms, start, end, "M")
+        t.rows = mat["n"]
+    if mat["n"] == 0:
+        st.info("選択した条件に一致するデータがありません。")
+        return
+    with perf.timer("chart", "heatmap M", rows=mat["z"].size):
+        st.plotly_chart(
+            heatmap_figure(mat, "月（YYYY-MM）", "平均　VPD（kPa）", "月"),
+            use_container_width=True,
+        )
+
+    st.markdown(
+        """
+        - 各月ごとの **VPD の高さ/低さ** を農場別に比較できます。
+        - 収量の悪い月と、VPD が高い月が対応していないかを見ることで、
+        　**どの時期に環境対策を重点化すべきか** が見えてきます。
+        """
+    )
+
+
+VIEWS = {
+    "日別ヒートマップ": render_daily,
+    "月別ヒートマップ": render_monthly,
+}
+
+
 def main() -> None:
     st.set_page_config(page_title="VPDヒートマップ", layout="wide")
     st.title("VPD　ヒートマップ（環境　×　時間）")
+    perf.start_page("04_VPD_Heatmap")
 
-    df = load_env_daily()
+    with perf.timer("sql", "load_env_daily") as t:
+        df = load_env_daily()
+        t.rows = len(df)
 
     if df.empty:
         st.info("env_daily に VPD データがありません。")
+        perf.render_panel()
         st.stop()
 
-    # 月列を追加
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-
     # サイドバーでフィルタ
     st.sidebar.header("フィルタ")
 
@@ -52,107 +182,32 @@ def main() -> None:
 
     if not farm_sel:
         st.warning("少なくとも１つ農場を選択してください。")
+        perf.render_panel()
         st.stop()
 
-    df = df[df["farm"].isin(farm_sel)]
-
     # 日付範囲
     min_date = df["date"].min().date()
     max_date = df["date"].max().date()
-    start_date, end_date = st.sidebar.date_input(
+    picked = st.sidebar.date_input(
         "期間を選択",
         value=(min_date, max_date),
         min_value=min_date,
         max_value=max_date,
     )
-    # タプル　or　単体対応
-    if isinstance(start_date, tuple):
-        start_date, end_date = start_date
-
-    df = df[(df["date"] >= pd.to_datetime(start_date)) &
-            (df["date"] <= pd.to_datetime(end_date))]
-
-    if df.empty:
-        st.info("選択した条件に一致するデータがありません。")
-        st.stop()
-
-    st.write("データ概要", df.head())
-
-    tab_day, tab_month = st.tabs(["日別ヒートマップ", "月別ヒートマップ"])
-
-    # 日別　VPD　ヒートマップ
-    with tab_day:
-        st.subheader("日別　VPD　ヒートマップ（farm x date)")
-
-        # Altair 用に文字列列を追加
-        df_day = df.copy()
-        df_day["date_str"] = df_day["date"].dt.strftime("%Y-%m-%d")
-
-        # farm x date のヒートマップ
-        chart_day = (
-            alt.Chart(df_day)
-            .mark_rect()
-            .encode(
-                x=alt.X("date_str:N", title="日付", sort="x"),
-                y=alt.Y("farm:N", title="農場"),
-                color=alt.Color(
-                    "vpd_kpa:Q",
-                    title="VPD(kPa)",
-                    # スケールレンジはデフォルトに任せる（バージョン依存を避ける）
-                ),
-                tooltip=[
-                    alt.Tooltip("famr:N", title="農場"),
-                    alt.Tooltip("date_str:N", title="日付"),
-                    alt.Tooltip("vpd_kpa:Q", title="VPD(kPa)", format=".2f"),
-                ],
-            )
-        )
-
-        st.altair_chart(chart_day, use_container_width=True)
+    # 範囲の選択途中は日付が1つだけ返る
+    if isinstance(picked, (tuple, list)):
+        start_date, end_date = (picked[0], picked[-1]) if picked else (min_date, max_date)
+    else:
+        start_date = end_date = picked
 
-        st.markdown(
-            """
-            - 色が濃いところ　= VPD　が高く、蒸散ストレスが強い日
-            - VPD が **0.6～1.2 kPa** の日が多いほど、環境としては安定していると考えられます。")
-            """
-        )
-
-    # 月別　VPD　ヒートマップ
-    with tab_month:
-        st.subheader("月別　VPD　ヒートマップ（farm x month)")
-
-        df_month = (
-            df.groupby(["farm", "month"], as_index=False)
-            .agg(mean_vpd_kpa=("vpd_kpa", "mean"))
-        )
+    # キャッシュのキーにするので農場は並びをそろえたタプルにする
+    farm_key = tuple(sorted(farm_sel))
 
-        chart_month = (
-            alt.Chart(df_month)
-            .mark_rect()
-            .encode(
-                x=alt.X("month:N", title="月（YYYY-MM）", sort="x"),
-                y=alt.Y("farm:N", title="農場"),
-                color=alt.Color(
-                    "mean_vpd_kpa:Q",
-                    title="平均　VPD（kPa）",
-                ),
-                tooltip=[
-                    alt.Tooltip("farm:N", title="農場"),
-                    alt.Tooltip("month:N", title="月"),
-                    alt.Tooltip("mean_vpd_kpa:Q", title="平均VPD（kPa）", format=".2f"),
-                ],
-            )
-        )
+    view = st.radio("表示", list(VIEWS), horizontal=True, key="vpd_heatmap_view")
+    VIEWS[view](farm_key, start_date, end_date)
 
-        st.altair_chart(chart_month, use_container_width=True)
+    perf.render_panel(debug={"memory": df.attrs.get("memory")})
 
-        st.markdown(
-            """
-            - 各月ごとの **VPD の高さ/低さ** を農場別に比較できます。
-            - 収量の悪い月と、VPD が高い月が対応していないかを見ることで、
-            　**どの時期に環境対策を重点化すべきか** が見えてきます。
-            """
-        )
 
 if __name__ == "__main__":
     main()
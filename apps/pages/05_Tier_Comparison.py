@@ -1,69 +1,189 @@
 from pathlib import Path
 import sys
+from typing import TYPE_CHECKING
 
 import streamlit as st
 import pandas as pd
-import altair as alt
 
 # プロジェクトルートを import パスに追加
 ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from db_config import get_engine
+from apps.common import db, frames, perf, zones
+
+if TYPE_CHECKING:
+    import altair as alt
+
+
+def ensure_zones() -> None:
+    """dim_zone / fact_yield_zone がまだ無い DB では、初回だけ zone_master.csv から作る。"""
+    with db.read_engine().connect() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fact_yield_zone';"
+        ).fetchone()
+    if not exists:
+        with db.write_engine().begin() as conn:
+            zones.refresh(conn)
+
 
 @st.cache_data
-def load_tire_summary() -> pd.DataFrame:
+@frames.compact_loader(
+    dims=("farm", "base_farm", "tier"),
+    months=("month",),
+    measures=("mean_kg", "kg_per_bed_m", "mean_temp", "mean_humid", "mean_vpd_kpa"),
+)
+def load_tier_summary() -> pd.DataFrame:
     """
-    v_harvest_env から段さ比較用のサマリを取得する。
-    前提:
-      - farm に　「愛川C1_上段」「愛川C1_ベッド」「愛川C1_下段」のように
-      段情報を含めていること。
+    v_harvest_env から段差比較用のサマリを取得する。
+    base_farm（例: 愛川C1）と tier（上段/ベッド/下段）は、取り込み時に farm 名から分けて
+    farm_zone に入れたものを使う（ゾーンを引けた farm の段は dim_zone の表記）。
+    ベッド1mあたり収量（kg_per_bed_m）は fact_yield_zone から取り、ゾーンが無い farm は空になる。
     """
-    engine = get_engien("real")
+    ensure_zones()
+    engine = db.read_engine()
     q = """
         SELECT
-            farm,
-            month,
-            mena_kg,
-            mean_temp,
-            mean_humid,
-            mean_vpd_kpa
-        FROM v_harvest_env
-        WHERE mean_kg IS NOT NULL
-        ORDER BY farm, month;
+            e.farm,
+            e.month,
+            COALESCE(fz.base_farm, e.farm) AS base_farm,
+            COALESCE(z.tier_label, fz.tier_label, '未指定') AS tier,
+            e.mean_kg,
+            f.kg_per_bed_m,
+            e.mean_temp,
+            e.mean_humid,
+            e.mean_vpd_kpa
+        FROM v_harvest_env e
+        LEFT JOIN farm_zone fz ON fz.farm = e.farm
+        LEFT JOIN dim_zone z ON z.zone_code = fz.zone_code
+        LEFT JOIN fact_yield_zone f ON f.farm = e.farm AND f.month = e.month
+        WHERE e.mean_kg IS NOT NULL
+        ORDER BY e.farm, e.month;
     """
     df = pd.read_sql(q, engine)
 
-    # farm から base_farm（例：愛川C1）と tier（上段/ベッド/下段）を抽出する
-    def split_farm(name: str) -> tuple[str, str]:
-        # 例:　"愛川C1_上段"　→　（"愛川C1",　"上段"）
-        if "_" in name:
-            base, tier = name.split("_", 1)
-            return base, tier
-        # "_" がない場合はそのまま
-        return name, "未指定"
-
-    base_list = []
-    tier_list = []
-    for f in df["farm"]:
-        base, tier = split_farm(f)
-        base_list.append(base)
-        base_list.append(tier)
-
-    df["base_farm"] = base_list
-    df["tier"] = tier_list
+    # 月順を保証
+    df["month"] = df["month"].astype(str)
 
     return df
 
+
+@st.cache_data
+def select_base_farm(base_farm: str) -> pd.DataFrame:
+    """ベース農場ごとの行（選択を切り替えて戻ったときは再計算しない）。"""
+    df = load_tier_summary()
+    return df[df["base_farm"] == base_farm].reset_index(drop=True)
+
+
+def tier_chart(df: pd.DataFrame, y: str, y_title: str) -> "alt.Chart":
+    # altair は読み込みが重いので、グラフを作るときに初めて import する
+    with perf.timer("import", "altair"):
+        import altair as alt
+
+    return (
+        alt.Chart(df)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
+            y=alt.Y(f"{y}:Q", title=y_title),
+            color=alt.Color("tier:N", title="段"),
+            tooltip=["farm", "tier", "month", y],
+        )
+    )
+
+
+def render_yield(df_sel: pd.DataFrame) -> None:
+    st.markdown("### 段別の月別収量比較")
+
+    with perf.timer("chart", "yield lines", rows=len(df_sel)):
+        st.altair_chart(tier_chart(df_sel, "mean_kg", "平均収量(kg)"), use_container_width=True)
+
+    st.markdown(
+        """
+        - 段ごとの収量の差を、月ごとに比較できます。
+        - 特定の段（例: 上段）の収量が一貫して低い場合、
+        　環境ストレス（温度・VPD）の影響を疑う根拠になります。
+        """
+    )
+
+
+def render_yield_per_bed(df_sel: pd.DataFrame) -> None:
+    st.markdown("### 段別のベッド1mあたり収量比較")
+
+    with perf.timer("chart", "yield per bed lines", rows=len(df_sel)):
+        st.altair_chart(
+            tier_chart(df_sel, "kg_per_bed_m", "収量(kg/ベッドm)"), use_container_width=True
+        )
+
+    st.markdown(
+        """
+        - 段ごとにベッドの本数・長さが違うので、収量をベッドの総延長（zone_master.csv）で割って比べます。
+        - ゾーン（zone_master.csv）を引けなかった farm は、ベッドの長さが分からないので線が出ません。
+        """
+    )
+
+
+def render_vpd(df_sel: pd.DataFrame) -> None:
+    st.markdown("### 段別の　VPD　比較")
+
+    with perf.timer("chart", "vpd lines", rows=len(df_sel)):
+        st.altair_chart(
+            tier_chart(df_sel, "mean_vpd_kpa", "平均　VPD(kPa)"), use_container_width=True
+        )
+
+    st.markdown(
+        """
+        - 上段の VPD が一貫して高いかどうかを確認できます。
+        -　収量が低い段で VPD が高い場合、
+        　「VPD を下げることで収量改善が期待できる」論拠になります。
+        """
+    )
+
+
+def render_temp_humid(df_sel: pd.DataFrame) -> None:
+    st.markdown("### 段別の温度・湿度比較")
+
+    cols = st.columns(2)
+
+    with cols[0]:
+        st.markdown("#### 平均温度の比較")
+        with perf.timer("chart", "temp lines", rows=len(df_sel)):
+            st.altair_chart(tier_chart(df_sel, "mean_temp", "平均温度（℃）"), use_container_width=True)
+
+    with cols[1]:
+        st.markdown("#### 平均湿度の比較")
+        with perf.timer("chart", "humid lines", rows=len(df_sel)):
+            st.altair_chart(tier_chart(df_sel, "mean_humid", "平均湿度(%)"), use_container_width=True)
+
+    st.markdown(
+        """
+        - 温度・湿度のプロファイルの違いから、
+        　なぜ特定の段だけ VPD が高くなるのかを推測できます。
+        """
+    )
+
+
+# 表示の切り替え: 収量 / VPD / 温度・湿度
+VIEWS = {
+    "収量比較": render_yield,
+    "ベッド1mあたり収量": render_yield_per_bed,
+    "VPD比較": render_vpd,
+    "温度・湿度比較": render_temp_humid,
+}
+
+
 def main() -> None:
     st.set_page_config(page_title="段差比較（上段・ベッド・下段）", layout="wide")
     st.title("段差比較ダッシュボード（上段　×　ベッド　×　下段）")
+    perf.start_page("05_Tier_Comparison")
 
-    df = load_tire_summary()
+    with perf.timer("sql", "load_tier_summary") as t:
+        df = load_tier_summary()
+        t.rows = len(df)
 
     if df.empty:
         st.info("v_harvest_env にデータがありません。")
+        perf.render_panel()
         st.stop()
 
     # ベース農場の一覧（例: 愛川C1）
@@ -71,116 +191,30 @@ def main() -> None:
     st.sidebar.header("フィルタ")
     base_sel = st.sidebar.selectbox("農場（ベース）を選択", base_farms)
 
-    df_sel = df[df["base_farm"] == base_sel].copy()
+    with perf.timer("pandas", "select base_farm") as t:
+        df_sel = select_base_farm(base_sel)
+        t.rows = len(df_sel)
     if df_sel.empty:
         st.info("選択した農場にデータがありません。")
+        perf.render_panel()
         st.stop()
 
-    # 月順を保証
-    df_sel["month"] = df_sel["month"].astype(str)
-
     st.subheader(f"対象農場: {base_sel}")
 
     # 表形式で確認
     st.write("元データ（確認用）")
     st.dataframe(
-        df_sel[["farm", "tier", "month", "mean_kg", "mean_bpd_kpa", "mean_temp", "mean_humid"]],
+        df_sel[["farm", "tier", "month", "mean_kg", "kg_per_bed_m", "mean_vpd_kpa", "mean_temp", "mean_humid"]],
         hide_index=True,
         use_container_width=True,
     )
 
-    # タブ: 収量 / VPD / 温度・湿度
-    tab_yield, tab_bpd, tab_temp = st.tabs(["収量比較", "VPD比較", "温度・湿度比較"])
-    
-    # 収量
-    with tab_yield:
-        st.markdown("### 断別の月別収量比較")
-
-        chart_y = (
-            alt.Chart(df_sel)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                y=alt.Y("mean_kg:Q", title="平均収量(kg)"),
-                color=alt.Color("tier:N", title="段"),
-                tooltip=["farm", "tier", "month", "mean_kg"],
-            )
-        )
-
-        st.altair_chart(chart_y, use_container_width_True)
-
-        st.markdown(
-            """
-            - 段ごとの収量の差を、月ごとに比較できます。
-            - 特定の段（例: 上段）の収量が一貫して低い場合、
-            　環境ストレス（温度・VPD）の影響を疑う根拠になります。
-            """
-        )
-
-    # VPD
-    with tab_vpd:
-        st.markdown("### 段別の　VPD　比較")
-
-        chart_v = (
-            alt.Chart(df_sel)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                y=alt.Y("mean_vpd_kpa:Q", title="平均　VPD(kPa)"),
-                color=alt.Color["tier", "month", "mean_vpd_kpa"],
-            )
-        )
+    # st.tabs は全タブを毎回描くので、表示中のものだけ作るよう radio で切り替える
+    view = st.radio("グラフ", list(VIEWS), horizontal=True, key="tier_view")
+    VIEWS[view](df_sel)
 
-        st.altair_chart(chart_v, use_container_width=True)
+    perf.render_panel(debug={"memory": df.attrs.get("memory")})
 
-        st.markdown(
-            """
-            - 上段の VPD が一貫して高いかどうかを確認できます。
-            -　収量が低い段で VPD が高い場合、
-            　「VPD を下げることで収量改善が期待できる」論拠になります。
-            """
-        )
-
-    # 温度・湿度
-    with tab_temp:
-        st.markdown("### 段別の温度・湿度比較")
-
-        cols = st.columns(2)
-
-        with sold[0]:
-            st.markdown("#### 平均温度の比較")
-            chart_t = (
-                alt.Chart(df_sel)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                    y=alt.Y("mean_temp:Q", title="平均温度（℃）"),
-                    color=alt.Color("tier:N", title="段"),
-                    tooltip=["farm", "tier", "month", "mean_temp"],
-                )
-            )
-            st.altair_chart(chart_t, use_container_width=True)
-
-        with cols[1]:
-            st.markdown("#### 平均温度の比較")
-            chart_h = (
-                alt.Chart(df_sel)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                    y=alt.Y("mean_humid:Q", title="平均湿度(%)"),
-                    color=alt.Color("tier:N", title="段"),
-                    tooltip=["farm", "tier", "month", "mean_humid"],
-                )
-            )
-            st.altair_chart(chart_h, use_container_width=True)
-
-        st.markdown(
-            """
-            - 温度・湿度のプロファイルの違いから、
-            　なぜ特定の段だけ VPD が高くなるのかを推測できます。
-            """
-        )
 
 if __name__ == "__main__":
     main()
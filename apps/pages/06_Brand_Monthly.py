@@ -1,99 +1,125 @@
 from pathlib import Path
 import sys
+from typing import TYPE_CHECKING
 
 import streamlit as st
 import pandas as pd
-import altair as alt
 
 # プロジェクトルートを import パスに追加
 ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from db_config import get_engine
+from apps.common import brand_cube, db, perf
 
+if TYPE_CHECKING:
+    import altair as alt
 
-@st.cache_data
-def load_brand_monthly() -> pd.DataFrame:
-    """
-    v_brand_monthly から ブランド別の月次収量を取得する。
-    farm_group カラムが無い場合は仮に 'Unknown' を補う。
+
+# キューブの列名 → 画面で使う列名（v_brand_monthly の列名にそろえる）
+DISPLAY_COLUMNS = {"crop": "crop_name_ja", "brand": "brand_code", "brand_name": "brand_name_ja"}
+
+
+@st.cache_resource(ttl=60)
+def load_cube() -> brand_cube.BrandCube:
     """
-    engine = get_engine("real")
-    q = """
-        SELECT
-            brand_code,
-            farm_group,
-            category,
-            crop_code,
-            crop_name_ja,
-            brand_name_ja,
-            month,
-            total_kg
-        FROM v_brand_monthly
-        ORDER BY month;
+    取り込み時に作られる brand_cube を読み込む（v_brand_monthly の明細は読まない）。
+    まだ作られていない・空なら v_brand_monthly から作る（v_brand_monthly が後から足された DB でも
+    空のキューブのままにならないように）。
     """
-    df = pd.read_sql(q, engine)
+    with db.read_engine().connect() as conn:
+        if not brand_cube.is_empty(conn):
+            return brand_cube.load(conn)
+    with db.write_engine().begin() as conn:
+        brand_cube.refresh(conn)
+        return brand_cube.load(conn)
+
+
+def slice_cube(filters: dict, by: tuple) -> pd.DataFrame:
+    """フィルタ + group by をキューブから切り出す（月順に並べる）。"""
+    df = load_cube().slice(filters, by).rename(columns=DISPLAY_COLUMNS)
+    return df.sort_values("month", kind="stable").reset_index(drop=True)
+
+
+def line_chart(df: pd.DataFrame, color: str, color_title: str, tooltip: list) -> "alt.Chart":
+    # altair は読み込みが重いので、グラフを作るときに初めて import する
+    with perf.timer("import", "altair"):
+        import altair as alt
+
+    return (
+        alt.Chart(df)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
+            y=alt.Y("total_kg:Q", title="収量(kg)"),
+            color=alt.Color(f"{color}:N", title=color_title),
+            tooltip=tooltip,
+        )
+    )
 
-    # 安全弁：farm_group カラムが無い or 全部 NULL だった場合の保険
-    if "farm_group" not in df.columns:
-        df["farm_group"] = "Unknown"
-    else:
-        if df["farm_group"].isna().all():
-            df["farm_group"] = "Unknown"
 
-    return df
+# グラフの種類 → (見出し, 集計するキューブの次元, 凡例タイトル)。None は集計せず月次行をそのまま描く
+CHART_VIEWS = {
+    "ブランド別推移": ("ブランド別 月次収量推移（brand_code単位）", None, "ブランドコード"),
+    "カテゴリー別合計": ("カテゴリー別 月次収量合計（FRUIT / LEAF など）", "category", "カテゴリー"),
+    "作物別推移": ("作物別 月次収量推移", "crop", "作物名"),
+}
 
 
 def main() -> None:
     st.set_page_config(page_title="ブランド別月次収量", layout="wide")
     st.title("ブランド別 月次収量ダッシュボード")
+    perf.start_page("06_Brand_Monthly")
 
-    df = load_brand_monthly()
+    with perf.timer("sql", "load_cube") as t:
+        cube = load_cube()
+        t.rows = len(cube)
+    debug = {"cube_rows": len(cube)}
 
-    # デバッグ用
-    st.write("DEBUG columns:", list(df.columns))
-
-    if df.empty:
+    if not len(cube):
         st.info("v_brand_monthly にデータがありません。")
+        perf.render_panel(debug=debug)
         st.stop()
 
-    # 月は文字列にそろえる
-    df["month"] = df["month"].astype(str)
-
     # ===== サイドバーのフィルタ =====
     st.sidebar.header("フィルタ")
 
-    # ここは「farm_group」カラムから、Python 変数 farm_groups を作る
-    farm_groups = sorted(df["farm_group"].dropna().unique())
-    farm_group_sel = st.sidebar.multiselect(
-        "農園（farm_group）を選択",
-        farm_groups,
-        default=farm_groups or None,
+    # 選択肢は上位のフィルタで絞った範囲をキューブから取る
+    farm_groups = cube.options("farm_group")
+    farm_group_sel = tuple(
+        st.sidebar.multiselect(
+            "農園（farm_group）を選択",
+            farm_groups,
+            default=farm_groups or None,
+        )
     )
-    if farm_group_sel:
-        df = df[df["farm_group"].isin(farm_group_sel)]
-
-    categories = sorted(df["category"].dropna().unique())
-    category_sel = st.sidebar.multiselect(
-        "カテゴリーを選択（FRUIT / LEAF 等）",
-        categories,
-        default=categories or None,
+
+    categories = cube.options("category", {"farm_group": farm_group_sel})
+    category_sel = tuple(
+        st.sidebar.multiselect(
+            "カテゴリーを選択（FRUIT / LEAF 等）",
+            categories,
+            default=categories or None,
+        )
     )
-    if category_sel:
-        df = df[df["category"].isin(category_sel)]
-
-    crops = sorted(df["crop_name_ja"].dropna().unique())
-    crop_sel = st.sidebar.multiselect(
-        "作物名を選択（いちご・ミニトマトなど）",
-        crops,
-        default=crops or None,
+
+    crops = cube.options("crop", {"farm_group": farm_group_sel, "category": category_sel})
+    crop_sel = tuple(
+        st.sidebar.multiselect(
+            "作物名を選択（いちご・ミニトマトなど）",
+            crops,
+            default=crops or None,
+        )
     )
-    if crop_sel:
-        df = df[df["crop_name_ja"].isin(crop_sel)]
+    filters = {"farm_group": farm_group_sel, "category": category_sel, "crop": crop_sel}
+
+    with perf.timer("pandas", "cube slice brand") as t:
+        df = slice_cube(filters, brand_cube.DIMS)
+        t.rows = len(df)
 
     if df.empty:
         st.info("選択された条件に一致するデータがありません。")
+        perf.render_panel(debug=debug)
         st.stop()
 
     # ===== 一覧表示 =====
@@ -107,83 +133,49 @@ def main() -> None:
             "month",
             "total_kg",
         ]
-    ].copy()
+    ]
 
     st.subheader("月次収量一覧")
     st.dataframe(df_display, use_container_width=True, hide_index=True)
 
-    # ===== グラフタブ =====
-    tab_brand, tab_category, tab_crop = st.tabs(
-        ["ブランド別推移", "カテゴリー別合計", "作物別推移"]
-    )
-
-    # 1) ブランド別の月次推移
-    with tab_brand:
-        st.markdown("### ブランド別 月次収量推移（brand_code単位）")
-
-        chart_brand = (
-            alt.Chart(df)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                y=alt.Y("total_kg:Q", title="収量(kg)"),
-                color=alt.Color("brand_code:N", title="ブランドコード"),
-                tooltip=[
-                    "farm_group",
-                    "category",
-                    "crop_name_ja",
-                    "brand_name_ja",
-                    "brand_code",
-                    "month",
-                    "total_kg",
-                ],
-            )
-        )
-        st.altair_chart(chart_brand, use_container_width=True)
-
-    # 2) カテゴリー別（FRUIT / LEAF）の月次合計
-    with tab_category:
-        st.markdown("### カテゴリー別 月次収量合計（FRUIT / LEAF など）")
-
-        df_cat = (
-            df.groupby(["farm_group", "category", "month"], as_index=False)
-            .agg(total_kg=("total_kg", "sum"))
-        )
+    # ===== グラフ =====
+    # st.tabs は全タブの中身を毎回組み立てるので、表示中のグラフだけ作るよう radio で切り替える
+    view = st.radio("グラフ", list(CHART_VIEWS), horizontal=True, key="brand_monthly_view")
+    heading, dim, color_title = CHART_VIEWS[view]
+    st.markdown(f"### {heading}")
 
-        chart_cat = (
-            alt.Chart(df_cat)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                y=alt.Y("total_kg:Q", title="収量(kg)"),
-                color=alt.Color("category:N", title="カテゴリー"),
-                tooltip=["farm_group", "category", "month", "total_kg"],
-            )
+    if dim is None:
+        # 1) ブランド別の月次推移
+        chart = line_chart(
+            df,
+            "brand_code",
+            color_title,
+            [
+                "farm_group",
+                "category",
+                "crop_name_ja",
+                "brand_name_ja",
+                "brand_code",
+                "month",
+                "total_kg",
+            ],
         )
-        st.altair_chart(chart_cat, use_container_width=True)
+        n_rows = len(df)
+    else:
+        # 2) カテゴリー別 / 3) 作物別 の月次合計
+        # rollup 済みの行（brand を畳んだ段階）から切り出す
+        with perf.timer("pandas", f"cube slice {dim}") as t:
+            df_agg = slice_cube(filters, ("farm_group", dim, "month"))
+            t.rows = len(df_agg)
+        color = DISPLAY_COLUMNS.get(dim, dim)
+        chart = line_chart(df_agg, color, color_title, ["farm_group", color, "month", "total_kg"])
+        n_rows = len(df_agg)
 
-    # 3) 作物別（いちご・ミニトマトなど）の推移
-    with tab_crop:
-        st.markdown("### 作物別 月次収量推移")
+    with perf.timer("chart", f"{view} lines", rows=n_rows):
+        st.altair_chart(chart, use_container_width=True)
 
-        df_crop = (
-            df.groupby(["farm_group", "crop_name_ja", "month"], as_index=False)
-            .agg(total_kg=("total_kg", "sum"))
-        )
-
-        chart_crop = (
-            alt.Chart(df_crop)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("month:N", title="月(YYYY-MM)", sort="x"),
-                y=alt.Y("total_kg:Q", title="収量(kg)"),
-                color=alt.Color("crop_name_ja:N", title="作物名"),
-                tooltip=["farm_group", "crop_name_ja", "month", "total_kg"],
-            )
-        )
-        st.altair_chart(chart_crop, use_container_width=True)
+    perf.render_panel(debug=debug)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,169 @@
+from pathlib import Path
+import json
+import sys
+
+import streamlit as st
+import pandas as pd
+
+# プロジェクトルートを import パスに追加
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from apps.common import db, frames
+
+
+@st.cache_data(ttl=30)
+@frames.compact_loader(
+    dims=("source", "kind", "status", "date"),
+    measures=("duration_ms", "peak_mem_mb", "rows_per_sec", "mb_per_sec"),
+)
+def load_runs() -> pd.DataFrame:
+    """
+    import_runs（取り込み実行の記録）を取得する。
+    テーブルがまだ無い場合は空の DataFrame を返す。
+    """
+    engine = db.read_engine()
+    with engine.connect() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='import_runs';"
+        ).fetchone()
+        if not exists:
+            return pd.DataFrame()
+        df = pd.read_sql(
+            """
+            SELECT id, source, kind, file, bytes, rows, failed_rows, status, error,
+                   started_at, duration_ms, stages_json, peak_mem_mb
+            FROM import_runs
+            ORDER BY started_at;
+            """,
+            conn,
+            parse_dates=["started_at"],
+        )
+
+    df["rows_per_sec"] = df["rows"] / (df["duration_ms"] / 1000.0)
+    df["mb_per_sec"] = df["bytes"] / 2**20 / (df["duration_ms"] / 1000.0)
+    df["date"] = df["started_at"].dt.date.astype(str)
+    return df
+
+
+def stage_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """stages_json を (run, stage, ms) の縦持ちに展開する。"""
+    records = []
+    for run_id, started_at, kind, stages in zip(
+        df["id"], df["started_at"], df["kind"], df["stages_json"]
+    ):
+        for stage, ms in json.loads(stages or "{}").items():
+            records.append(
+                {"id": run_id, "started_at": started_at, "kind": kind, "stage": stage, "ms": ms}
+            )
+    return pd.DataFrame(records)
+
+
+def main() -> None:
+    st.set_page_config(page_title="取り込み履歴", layout="wide")
+    st.title("取り込み履歴（import_runs）")
+
+    df = load_runs()
+    if df.empty:
+        st.info("import_runs にまだ記録がありません。取り込みスクリプトかアップロード画面を実行してください。")
+        st.stop()
+
+    # ===== サイドバーのフィルタ =====
+    st.sidebar.header("フィルタ")
+    kinds = sorted(df["kind"].unique())
+    kind_sel = st.sidebar.multiselect("種類", kinds, default=kinds)
+    sources = sorted(df["source"].unique())
+    source_sel = st.sidebar.multiselect("実行元", sources, default=sources)
+    df = df[df["kind"].isin(kind_sel) & df["source"].isin(source_sel)]
+
+    if df.empty:
+        st.info("選択された条件に一致する記録がありません。")
+        st.stop()
+
+    done = df[df["status"] != "skipped"]
+    ok = done[done["status"] == "ok"]
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("実行回数", f"{len(done):,}")
+    c2.metric("失敗率", f"{(done['status'] == 'error').mean():.1%}" if len(done) else "-")
+    c3.metric("取り込み行数", f"{int(ok['rows'].fillna(0).sum()):,}")
+    c4.metric("rows/sec（中央値）", f"{ok['rows_per_sec'].median():,.0f}" if len(ok) else "-")
+
+    # altair は読み込みが重いので、グラフを描く段階で初めて import する
+    import altair as alt
+
+    # ===== スループット推移 =====
+    st.markdown("### スループット（rows/sec）")
+    chart_tp = (
+        alt.Chart(ok.dropna(subset=["rows_per_sec"]))
+        .mark_circle(size=60)
+        .encode(
+            x=alt.X("started_at:T", title="実行日時"),
+            y=alt.Y("rows_per_sec:Q", title="rows/sec"),
+            color=alt.Color("kind:N", title="種類"),
+            tooltip=["started_at", "kind", "file", "rows", "duration_ms", "rows_per_sec", "peak_mem_mb"],
+        )
+    )
+    st.altair_chart(chart_tp, use_container_width=True)
+
+    # ===== 失敗率（日別） =====
+    st.markdown("### 日別の実行数と失敗率")
+    daily = (
+        done.assign(failed=done["status"] == "error")
+        .groupby("date", as_index=False, observed=True)
+        .agg(runs=("id", "count"), failed=("failed", "sum"))
+    )
+    daily["failure_rate"] = daily["failed"] / daily["runs"]
+    bars = (
+        alt.Chart(daily)
+        .mark_bar(opacity=0.5)
+        .encode(
+            x=alt.X("date:N", title="日付"),
+            y=alt.Y("runs:Q", title="実行数"),
+        )
+    )
+    rate = (
+        alt.Chart(daily)
+        .mark_line(point=True, color="firebrick")
+        .encode(
+            x="date:N",
+            y=alt.Y("failure_rate:Q", title="失敗率", axis=alt.Axis(format="%")),
+            tooltip=["date", "runs", "failed", alt.Tooltip("failure_rate:Q", format=".1%")],
+        )
+    )
+    st.altair_chart(alt.layer(bars, rate).resolve_scale(y="independent"), use_container_width=True)
+
+    # ===== 段階ごとの所要時間 =====
+    st.markdown("### 段階ごとの所要時間（ms）")
+    stages = stage_frame(done)
+    if stages.empty:
+        st.info("段階ごとの記録がありません。")
+    else:
+        chart_stage = (
+            alt.Chart(stages)
+            .mark_bar()
+            .encode(
+                x=alt.X("started_at:T", title="実行日時"),
+                y=alt.Y("ms:Q", title="ms", stack=True),
+                color=alt.Color("stage:N", title="段階"),
+                tooltip=["id", "kind", "stage", "ms"],
+            )
+        )
+        st.altair_chart(chart_stage, use_container_width=True)
+
+    # ===== 直近の記録 =====
+    st.markdown("### 直近の実行")
+    st.dataframe(
+        df.sort_values("started_at", ascending=False)
+        .head(200)[
+            ["started_at", "source", "kind", "file", "status", "rows", "failed_rows", "bytes",
+             "duration_ms", "rows_per_sec", "peak_mem_mb", "stages_json", "error"]
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
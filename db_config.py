@@ -1,13 +1,26 @@
+import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 
 # プロジェクトのルートディレクトリ
 BASE_DIR = Path(__file__).resolve().parent
 
+# 環境変数で DB ファイルを差し替える（config/app.yaml の env_variables と同じ名前）
+DB_PATH_ENV_VARS = {
+    "real": "DB_PATH_PROD",
+    "stage": "DB_PATH_STAGE",
+    "dev": "DB_PATH_DEV",
+}
+
+# 書き込み中でもダッシュボードの読み取りを止めないため WAL で開く。
+# ロック待ちはエラーにせず、この時間までは待つ。
+SQLITE_BUSY_TIMEOUT_MS = 10_000
+
 def resolve_db_path(env: str = "real") -> Path:
     """
     利用するDBファイルの絶対パスを返す。
     env: "real" | "stage" | "dev"
+    DB_PATH_PROD / DB_PATH_STAGE / DB_PATH_DEV が設定されていればそちらを使う。
     """
     db_map = {
         "real": BASE_DIR / "data" / "db" / "harvests_real.db",
@@ -17,6 +30,10 @@ def resolve_db_path(env: str = "real") -> Path:
 
     path = db_map.get(env, db_map["real"])
 
+    override = os.getenv(DB_PATH_ENV_VARS.get(env, "DB_PATH_PROD"))
+    if override:
+        path = Path(override)
+
     if not path.exists():
         raise FileNotFoundError(f"DBファイルが見つかりません: {path}")
 
@@ -27,4 +44,27 @@ def get_engine(env: str = "real"):
     SQLAlchemy の Engine を返す。
     """
     db_path = resolve_db_path(env)
-    return create_engine(f"sqlite:///{db_path}", future=True)
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+    _configure_sqlite(engine)
+    return engine
+
+def _configure_sqlite(engine) -> None:
+    """
+    接続ごとに WAL と busy_timeout を設定し、トランザクションを明示的に BEGIN する。
+
+    sqlite3 モジュールは DDL（DROP / CREATE / ALTER）の前に BEGIN を出さないため、
+    engine.begin() の中でも DDL が1文ずつ確定してしまう。BEGIN を自分で出して
+    テーブルの差し替えなどを1トランザクションにまとめられるようにする
+    （SQLAlchemy の pysqlite のドキュメントにある方法）。
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS};")
+        cur.execute("PRAGMA journal_mode = WAL;")
+        cur.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
@@ -0,0 +1,232 @@
+"""
+ダッシュボードのページごとの import 時間（コールドスタート）を測る。
+
+Streamlit はページを開くたびにスクリプトを実行するので、ページ先頭の import が重いと
+デプロイ直後の最初の表示が遅くなる。ページの先頭で import しているモジュールだけを
+新しいプロセスで `python -X importtime` し、ページごとの時間を出す。
+
+    python scripts/bench_imports.py                 # 表を出す
+    python scripts/bench_imports.py --check         # 予算を超えたら終了コード 1
+    python scripts/bench_imports.py --static --check  # 重いライブラリの先頭 import だけ見る（計測しない）
+
+チェックは2つ:
+
+- static : statsmodels / plotly / altair / scipy をページの先頭（関数の外）で import していないか。
+           ソースを読むだけなので、ライブラリが入っていない環境でも動く
+- budget : ページの import 時間から基準（streamlit + pandas。どのページも必ず読むもの）を
+           引いた分が --budget-ms 以下か。ページ本体で import が重くなっていないかを見る
+
+--out を付けると結果を JSON Lines で追記する（bench_ingest.py と同じ形）。
+"""
+import argparse
+import ast
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# 計測するページ（ROOT_DIR からの glob）
+PAGE_GLOBS = [
+    "apps/Home.py",
+    "apps/pages/*.py",
+    "apps/farm_dashboard/app.py",
+    "apps/farm_dashboard/pages/*.py",
+]
+
+# ページの先頭で import してはいけない（使う関数の中で import する）ライブラリ
+HEAVY_MODULES = ("statsmodels", "plotly", "altair", "scipy")
+
+# どのページも読む分。ページの時間からこれを引いたものを予算と比べる
+BASELINE_IMPORTS = "import streamlit\nimport pandas\n"
+
+# 基準を除いた、ページ1つあたりの import 時間の上限（ms）
+BUDGET_MS = 300.0
+
+
+def iter_pages() -> list[Path]:
+    pages = []
+    for pattern in PAGE_GLOBS:
+        pages += sorted(ROOT_DIR.glob(pattern))
+    return pages
+
+
+def top_level_imports(tree: ast.Module) -> list[ast.stmt]:
+    """
+    ページを開いたときに必ず実行される import 文（関数・クラスの中は除く）。
+    if / try / with の中もモジュールの先頭扱いにする。
+    """
+    found = []
+
+    def walk(body: list[ast.stmt]) -> None:
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                found.append(node)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            elif isinstance(node, ast.If) and _is_type_checking(node.test):
+                # 型注釈のためだけの import は実行されない
+                walk(node.orelse)
+            else:
+                for attr in ("body", "orelse", "finalbody", "handlers"):
+                    walk(getattr(node, attr, []) or [])
+
+    walk(tree.body)
+    return found
+
+
+def _is_type_checking(test: ast.expr) -> bool:
+    return (isinstance(test, ast.Name) and test.id == "TYPE_CHECKING") or (
+        isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"
+    )
+
+
+def _root_module(node: ast.stmt) -> list[str]:
+    if isinstance(node, ast.Import):
+        return [alias.name.split(".")[0] for alias in node.names]
+    if node.level:  # 相対 import
+        return []
+    return [(node.module or "").split(".")[0]]
+
+
+def heavy_imports(tree: ast.Module) -> list[str]:
+    """先頭で import している重いライブラリ（'行番号: 文' の形）。"""
+    return [
+        f"{node.lineno}: {ast.unparse(node)}"
+        for node in top_level_imports(tree)
+        if any(m in HEAVY_MODULES for m in _root_module(node))
+    ]
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """
+    -X importtime の出力から、いちばん外側で読み込まれたモジュール → 累積時間（μs）。
+    入れ子のモジュールは名前の前に空白が付くので除く。
+    """
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("  "):
+            continue
+        result[name.strip()] = result.get(name.strip(), 0) + int(cumulative)
+    return result
+
+
+def measure(code: str, repeat: int) -> dict:
+    """
+    code を新しいプロセスで repeat 回実行し、合計がいちばん小さい回の結果を返す。
+    import に失敗した場合は error に最後の行を入れる。
+    """
+    prelude = f"import sys\nsys.path.insert(0, {str(ROOT_DIR)!r})\n"
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", prelude + code],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            lines = [l for l in proc.stderr.splitlines() if not l.startswith("import time:")]
+            return {"ms": None, "modules": {}, "error": lines[-1] if lines else "failed"}
+        modules = parse_importtime(proc.stderr)
+        total_ms = sum(modules.values()) / 1000.0
+        if best is None or total_ms < best["ms"]:
+            best = {"ms": total_ms, "modules": modules, "error": None}
+    return best
+
+
+def bench_page(path: Path, repeat: int, static_only: bool) -> dict:
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    result = {
+        "page": path.relative_to(ROOT_DIR).as_posix(),
+        "heavy": heavy_imports(tree),
+    }
+    if not static_only:
+        code = "\n".join(ast.unparse(node) for node in top_level_imports(tree)) + "\n"
+        result.update(measure(code, repeat))
+    return result
+
+
+def top_modules(modules: dict[str, int], n: int = 3) -> str:
+    ranked = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return ", ".join(f"{name} {us / 1000:.0f}" for name, us in ranked)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="import-time benchmark for dashboard pages")
+    parser.add_argument("--repeat", type=int, default=3, help="ページごとの計測回数（最小値を使う）")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="基準を除いた import 時間の上限")
+    parser.add_argument("--static", action="store_true", help="import 時間は測らず、先頭 import だけ調べる")
+    parser.add_argument("--check", action="store_true", help="予算を超えたページがあれば終了コード 1")
+    parser.add_argument("--out", help="結果を JSON Lines で追記するファイル")
+    args = parser.parse_args()
+
+    baseline = None if args.static else measure(BASELINE_IMPORTS, args.repeat)
+    if baseline and baseline["error"]:
+        print(f"[ERROR] 基準の import に失敗しました: {baseline['error']}")
+        sys.exit(1)
+
+    pages = [bench_page(p, args.repeat, args.static) for p in iter_pages()]
+    problems = []
+    for r in pages:
+        problems += [f"{r['page']}:{line} （関数の中で import する）" for line in r["heavy"]]
+        if args.static:
+            continue
+        if r["error"]:
+            problems.append(f"{r['page']}: import に失敗しました（{r['error']}）")
+            continue
+        r["extra_ms"] = r["ms"] - baseline["ms"]
+        if r["extra_ms"] > args.budget_ms:
+            problems.append(
+                f"{r['page']}: 基準 + {r['extra_ms']:.0f} ms（予算 {args.budget_ms:.0f} ms）"
+            )
+
+    if args.static:
+        for r in pages:
+            print(f"{r['page']:<45} {'NG' if r['heavy'] else 'ok'}")
+    else:
+        print(f"baseline (streamlit + pandas): {baseline['ms']:.0f} ms")
+        print(f"{'page':<45}{'ms':>8}{'+base':>8}  top (ms)")
+        for r in pages:
+            if r["error"]:
+                print(f"{r['page']:<45}{'-':>8}{'-':>8}  {r['error']}")
+                continue
+            print(
+                f"{r['page']:<45}{r['ms']:>8.0f}{r['extra_ms']:>8.0f}  {top_modules(r['modules'])}"
+            )
+
+    if args.out:
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "baseline_ms": baseline and round(baseline["ms"], 1),
+            "budget_ms": args.budget_ms,
+            "pages": {
+                r["page"]: {
+                    "ms": r.get("ms") and round(r["ms"], 1),
+                    "extra_ms": r.get("extra_ms") and round(r["extra_ms"], 1),
+                    "heavy": r["heavy"],
+                    "error": r.get("error"),
+                }
+                for r in pages
+            },
+        }
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+    if problems:
+        print()
+        for p in problems:
+            print(f"[NG] {p}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+取り込みパイプラインのベンチマーク。
+
+合成 CSV（scripts/synth_csv.py）を一時 DB に取り込み、段階ごとに時間を測る。
+
+- parse     : read_gl240_csv / read_harvest_csv（CSV → DataFrame）
+- load      : env_raw / raw_csv への INSERT
+- aggregate : rebuild_env_daily_and_views（env_raw → env_daily + VIEW）
+
+段階ごとに 秒・rows/sec・RSS を出し、--out に JSON Lines で追記する。
+段階の rss_mb はその段階の間に別スレッドで測った RSS の最大値（import_runs.RssSampler。
+前の段階のピークは含まない）、peak_rss_mb はプロセス全体の最大 RSS。
+本番 DB には触らない（DB_PATH_PROD を一時ファイルに向けてから import する）。
+
+    python scripts/bench_ingest.py --days 90 --files 4 --encoding utf-16le --delimiter tab
+    python scripts/bench_ingest.py --harvest-rows 200000 --out bench_ingest.jsonl
+
+--trace-alloc を付けると tracemalloc で段階ごとの Python ヒープのピークも取る
+（計測自体が遅くなるので時間の比較には使わないこと）。
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ROOT_DIR = SCRIPTS_DIR.parent
+for p in (SCRIPTS_DIR, ROOT_DIR):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+from synth_csv import CH_STYLES, DELIMITERS, write_gl240_csv, write_harvest_csv  # noqa: E402
+from apps.common.import_runs import RssSampler  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # プロセス全体の最大 RSS（段階ごとの値には使わない）。Linux は KiB、macOS は byte で返る
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Stages:
+    """段階ごとの経過時間・行数・メモリを溜める。"""
+
+    def __init__(self, trace_alloc: bool) -> None:
+        self.trace_alloc = trace_alloc
+        self.results: dict[str, dict] = {}
+
+    @contextmanager
+    def measure(self, name: str, rows: int = 0):
+        if self.trace_alloc:
+            tracemalloc.start()
+        stat = {"rows": rows}
+        mem = RssSampler()
+        t0 = time.perf_counter()
+        try:
+            with mem:
+                yield stat
+        finally:
+            elapsed = time.perf_counter() - t0
+            cur = self.results.setdefault(name, {"seconds": 0.0, "rows": 0})
+            cur["seconds"] += elapsed
+            cur["rows"] += stat["rows"]
+            cur["rss_mb"] = max(cur.get("rss_mb", 0.0), round(mem.peak_mb, 1))
+            if self.trace_alloc:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                cur["peak_alloc_mb"] = max(cur.get("peak_alloc_mb", 0.0), round(peak / 2**20, 1))
+
+    def finish(self) -> dict:
+        for r in self.results.values():
+            r["seconds"] = round(r["seconds"], 4)
+            r["rows_per_sec"] = round(r["rows"] / r["seconds"], 1) if r["seconds"] else None
+        return self.results
+
+
+def prepare_db(db_path: Path) -> None:
+    """空の一時 DB を作る。v_harvest_env が参照する harvest_monthly だけ先に用意する。"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS harvest_monthly (
+              farm TEXT, crop TEXT, manager TEXT, month TEXT, total_kg REAL
+            );
+            """
+        )
+
+
+def bench_env(args, workdir: Path, stages: Stages) -> None:
+    import import_env_csv as env
+
+    env.ensure_env_raw_table()
+    start = datetime.fromisoformat(args.start)
+    for i in range(args.files):
+        path = workdir / f"gl240_{i:03d}.csv"
+        write_gl240_csv(
+            path,
+            start=start + timedelta(days=args.days * i),
+            days=args.days,
+            interval_min=args.interval_min,
+            encoding=args.encoding,
+            delimiter=args.delimiter,
+            ch_style=args.ch_style,
+            seed=args.seed + i,
+        )
+        farm = f"bench-{i % args.farms}"
+
+        with stages.measure("env.parse") as s:
+            df = env.read_gl240_csv(str(path), farm)
+            s["rows"] = len(df)
+        with stages.measure("env.load", rows=len(df)):
+            with env.engine.begin() as conn:
+                df.to_sql("env_raw", conn, if_exists="append", index=False)
+        del df
+
+    with env.engine.connect() as conn:
+        n_raw = conn.exec_driver_sql("SELECT COUNT(*) FROM env_raw").scalar_one()
+    with stages.measure("env.aggregate", rows=n_raw):
+        env.rebuild_env_daily_and_views()
+
+
+def bench_harvest(args, workdir: Path, stages: Stages) -> None:
+    import import_harvest_csv as harvest
+
+    harvest.ensure_raw_csv_table()
+    path = workdir / "harvest.csv"
+    write_harvest_csv(path, rows=args.harvest_rows, encoding=args.harvest_encoding, seed=args.seed)
+
+    with stages.measure("harvest.parse") as s:
+        df = harvest.read_harvest_csv(str(path))
+        s["rows"] = len(df)
+    with stages.measure("harvest.load", rows=len(df)):
+        with harvest.engine.begin() as conn:
+            df.to_sql("raw_csv", conn, if_exists="append", index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ingestion benchmark (parse / load / aggregate)")
+    parser.add_argument("--files", type=int, default=2, help="GL240 ファイル数")
+    parser.add_argument("--farms", type=int, default=2, help="ファイルを割り振る圃場数")
+    parser.add_argument("--start", default="2025-01-01T00:00")
+    parser.add_argument("--days", type=float, default=30, help="1ファイルあたりの日数")
+    parser.add_argument("--interval-min", type=int, default=10)
+    parser.add_argument("--encoding", choices=["cp932", "utf-16le", "utf-8-sig"], default="cp932")
+    parser.add_argument("--delimiter", choices=sorted(DELIMITERS), default="comma")
+    parser.add_argument("--ch-style", choices=sorted(CH_STYLES), default="plain")
+    parser.add_argument("--harvest-rows", type=int, default=50_000, help="0 で収穫 CSV を省略")
+    parser.add_argument("--harvest-encoding", choices=["cp932", "utf-8-sig", "utf-8"], default="cp932")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-alloc", action="store_true", help="tracemalloc でヒープのピークも取る")
+    parser.add_argument("--keep", action="store_true", help="一時ディレクトリを残す")
+    parser.add_argument("--out", help="結果を JSON Lines で追記するファイル")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    db_path = workdir / "bench.db"
+    prepare_db(db_path)
+    # import_* は import 時に get_engine("real") するので、その前に差し替える
+    os.environ["DB_PATH_PROD"] = str(db_path)
+
+    stages = Stages(args.trace_alloc)
+    t0 = time.perf_counter()
+    if args.files:
+        bench_env(args, workdir, stages)
+    if args.harvest_rows:
+        bench_harvest(args, workdir, stages)
+    total = time.perf_counter() - t0
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": {
+            k: getattr(args, k)
+            for k in (
+                "files", "farms", "days", "interval_min", "encoding", "delimiter",
+                "ch_style", "harvest_rows", "harvest_encoding", "seed", "trace_alloc",
+            )
+        },
+        "stages": stages.finish(),
+        "total_seconds": round(total, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "db_bytes": db_path.stat().st_size,
+    }
+
+    print(f"{'stage':<16}{'rows':>10}{'sec':>10}{'rows/s':>12}{'rss MB':>9}")
+    for name, r in report["stages"].items():
+        print(
+            f"{name:<16}{r['rows']:>10}{r['seconds']:>10.3f}"
+            f"{r['rows_per_sec'] or 0:>12.0f}{r['rss_mb']:>9.1f}"
+        )
+    print(f"total {report['total_seconds']:.2f}s, process peak RSS {report['peak_rss_mb']:.1f} MB")
+
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+    if args.keep:
+        print(f"[INFO] 一時ディレクトリを残しました: {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 from pathlib import Path
 import sys
-import re
 
 import pandas as pd
 import numpy as np
@@ -12,9 +11,19 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from db_config import get_engine  # db_config から get_engine を import
+from apps.common import column_map, import_runs, table_stats, timestamps
 
 engine = get_engine("real")       # ここで engine を作る
 
+# GL240 の CH → env_raw の列
+GL240_CHANNEL_COLUMNS = {
+    "ch1": "air_temp_c",      # 気温
+    "ch2": "rh_percent",      # 相対湿度(%)
+    "ch3": "sand_temp_c",     # 砂温
+    "ch4": "water_content",   # 含水率
+    "ch5": "irradiance_wm2",  # 日射量(W/m2)
+}
+
 
 # ========= テーブル保証系 =========
 def ensure_env_raw_table() -> None:
@@ -33,6 +42,10 @@ def ensure_env_raw_table() -> None:
     """
     with engine.begin() as conn:
         conn.exec_driver_sql(ddl)
+        # 日次集計は (farm, ts) 順に流し読みするので、その順の索引を張る
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_env_raw_farm_ts ON env_raw(farm, ts);"
+        )
 
 
 def ensure_env_import_log_table() -> None:
@@ -72,132 +85,39 @@ def read_gl240_csv(path: str, farm: str) -> pd.DataFrame:
     """
     GL240 の CSV を読み込み、env_raw 形式の DataFrame を返す。
 
-    - 文字コードを自動判別（utf-8-sig → utf-8 → utf-16le → cp932)
-    - 「CH1, CH2, …」を含む行をヘッダー行として採用
-    - 次行の No./単位行は読み込まれても後段で除去
+    - 文字コード・区切り・ヘッダー行（CH1, CH2 を含む行）は先頭 64KB だけで判定
+      （同じ圃場の2ファイル目以降は前回の判定をヘッダー一致の確認だけで使い回す）
+    - 列の対応付けは apps.common.column_map.GL240_SPEC（ヘッダーごとにキャッシュ）
+    - 時刻列と CH1~CH5 だけを C エンジンで読む。単位行は読み飛ばす
+    - 時刻は apps.common.timestamps で書式を一度だけ判定して固定書式でパースする。
+      解釈できなかった行数は df.attrs["ts_failed"] に入る
     """
     p = Path(path)
 
-    # 1) エンコーディングとヘッダー行（CH行）を検出
-    enc_candidates = ["utf-8-sig", "utf-8", "utf-16le", "cp932"]
-    chosen_enc = None
-    ch_header_row = None
-
-    for enc in enc_candidates:
-        try:
-            with p.open(encoding=enc, errors="strict") as f:
-                for i, line in enumerate(f):
-                    # タブ・カンマをすべてカンマに正規化
-                    s = re.sub(r"[\t,]+", ",", line.strip(), flags=re.ASCII)
-                    if (
-                        re.search(r"\bCH\s*0*1\b", s, flags=re.IGNORECASE)
-                        and re.search(r"\bCH\s*0*2\b", s, flags=re.IGNORECASE)
-                    ):
-                        chosen_enc = enc
-                        ch_header_row = i
-                        break
-            if chosen_enc is not None:
-                break
-        except UnicodeDecodeError:
-            continue
-
-    if chosen_enc is None or ch_header_row is None:
-        raise ValueError(
-            "ヘッダー行（CH1, CH2 を含む行）が見つからないか、文字コード判定に失敗しました。"
-        )
-
-    # 2) 読み込み（カンマ/タブ両対応）
-    df = pd.read_csv(
-        p,
-        encoding=chosen_enc,
-        header=ch_header_row,
-        engine="python",
-        sep=r"[,\t]+",
-    )
+    # 1) レイアウト判定 → 必要列の位置
+    layout = column_map.sniff_gl240(p, source=("gl240", farm))
+    kwargs, names = column_map.read_kwargs(layout, column_map.GL240_SPEC)
 
-    # 3) 列名を正規化（空白・全角空白除去、 "CH 1"→"CH1")
-    df.columns = (
-        df.columns.astype(str)
-        .str.replace(r"\s+", "", regex=True)
-        .str.replace("　", "")   # 全角スペースも一応消しておく
-    )
+    # 2) 必要列だけ読み込み
+    df = pd.read_csv(p, **kwargs)
+    df.columns = names
 
-    # 4) 時刻列の特定
-    col_time = None
+    # 3) 時刻は先頭サンプルで書式を決めて固定書式でパース（圃場の地域時刻として扱う）
+    parsed = timestamps.parse(df["ts"], tz=timestamps.farm_timezone(farm))
+    df["ts"] = timestamps.to_local_naive(parsed.values)
+    for n in range(1, 6):
+        df[f"ch{n}"] = pd.to_numeric(df[f"ch{n}"], errors="coerce")
 
-    # 4-1) よくある英語・日本語パターンで探す
-    for c in df.columns:
-        lc = c.lower()
-        if lc in ("time", "時刻", "datetime", "日付時刻"):
-            col_time = c
-            break
+    # 4) 時刻が読めない行を除去（黙って捨てず、件数を出して attrs にも残す）
+    if parsed.failed:
+        print(f"[WARN] 時刻を解釈できない行を {parsed.failed} 行除外しました（書式 {parsed.fmt}）: {p.name}")
+    df = df.dropna(subset=["ts"])
 
-    # 4-2) "time" を含む列名を探す (Time, LogTime など)
-    if col_time is None:
-        for c in df.columns:
-            if "time" in c.lower():
-                col_time = c
-                break
-
-    # 4-3) 日本語パターン："日付" または "日時" または "時間" を含むもの
-    if col_time is None:
-        for c in df.columns:
-            if ("日付" in c) or ("日時" in c) or ("時間" in c):
-                col_time = c
-                break
-
-    # 4-4) それでも見つからない場合は「2列目を時刻扱い」にフォールバック
-    if col_time is None and len(df.columns) >= 2:
-        col_time = df.columns[1]
-
-    if col_time is None:
-        raise ValueError(f"時刻列が特定できません。列名:{list(df.columns)}")
-
-    # 5) CH1 ~ CH5 の列名を柔軟に特定
-    def find_ch(colnames, n: int):
-        pat1 = re.compile(rf"^ch[_\-]*0*{n}$", re.IGNORECASE)
-        pat2 = re.compile(rf"^ch[_\-]*0*{n}\b", re.IGNORECASE)
-        for name in colnames:
-            if pat1.match(name):
-                return name
-        for name in colnames:
-            if pat2.match(name):
-                return name
-        return None
-
-    ch1 = find_ch(df.columns, 1)
-    ch2 = find_ch(df.columns, 2)
-    ch3 = find_ch(df.columns, 3)
-    ch4 = find_ch(df.columns, 4)
-    ch5 = find_ch(df.columns, 5)
-
-    required = {"CH1": ch1, "CH2": ch2, "CH3": ch3, "CH4": ch4, "CH5": ch5}
-    if any(v is None for v in required.values()):
-        raise ValueError(f"CH1~CH5 の列が特定できません: {required}")
-
-    # 6) 必要列のみ抽出し、型を整える（単位行は NaT/NaN になり後で除去）
-    df = df[[col_time, ch1, ch2, ch3, ch4, ch5]].copy()
-    df[col_time] = pd.to_datetime(df[col_time], errors="coerce")
-    for c in [ch1, ch2, ch3, ch4, ch5]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    # 7) 単位行などを除去
-    df = df.dropna(subset=[col_time])
-
-    # 8) 列名を標準化し、farm を付与
-    df = df.rename(
-        columns={
-            col_time: "ts",
-            ch1: "air_temp_c",
-            ch2: "rh_percent",
-            ch3: "sand_temp_c",
-            ch4: "water_content",
-            ch5: "irradiance_wm2",
-        }
-    )
+    # 5) 列名を標準化し、farm を付与
+    df = df.rename(columns=GL240_CHANNEL_COLUMNS)
     df["farm"] = farm
 
-    # 9) 列順を整える
+    # 6) 列順を整える
     df = df[
         [
             "farm",
@@ -209,6 +129,8 @@ def read_gl240_csv(path: str, farm: str) -> pd.DataFrame:
             "irradiance_wm2",
         ]
     ]
+    df.attrs["ts_format"] = parsed.fmt
+    df.attrs["ts_failed"] = parsed.failed
     return df
 
 
@@ -220,17 +142,24 @@ def import_env_csv(path: str, farm: str) -> None:
 
     p = Path(path)
 
-    if has_been_imported(p):
-        print(f"[SKIP] すでに取り込み済み: {p}")
-        return
+    with import_runs.track(engine, source="script", kind="env", path=p) as run:
+        if has_been_imported(p):
+            run.skip()
+            print(f"[SKIP] すでに取り込み済み: {p}")
+            return
 
-    df = read_gl240_csv(str(p), farm)
+        with run.stage("parse"):
+            df = read_gl240_csv(str(p), farm)
+        run.rows = len(df)
+        run.failed_rows = df.attrs.get("ts_failed", 0)
 
-    with engine.begin() as conn:
-        df.to_sql("env_raw", conn, if_exists="append", index=False)
+        with run.stage("load"):
+            with engine.begin() as conn:
+                df.to_sql("env_raw", conn, if_exists="append", index=False)
+                table_stats.record_append(conn, "env_raw", df)
 
-    mark_imported(p)
-    print(f"[OK] {len(df)} 行を env_raw に追加しました: {p.name}")
+        mark_imported(p)
+    print(f"[OK] {len(df)} 行を env_raw に追加しました: {p.name} ({run.duration_ms:.0f} ms)")
 
 
 # ========= VPD + 集計 / VIEW 再構築 =========
@@ -255,110 +184,281 @@ def add_vpd_column(
     return df
 
 
-def rebuild_env_daily_and_views() -> None:
+# 日次集計の対象列（env_raw の列 → env_daily の列）
+DAILY_MEAN_COLUMNS = {
+    "air_temp_c": "mean_temp",
+    "rh_percent": "mean_humidity",
+    "sand_temp_c": "mean_sand_temp",
+    "water_content": "mean_water_content",
+    "irradiance_wm2": "mean_irradiance",
+}
+
+# 流し読みの既定値。メモリ上限から1チャンクの行数を決める
+DEFAULT_MAX_MEMORY_MB = 256
+MIN_CHUNK_ROWS = 5_000
+FIRST_CHUNK_ROWS = 50_000
+# 1行あたりのメモリ見積りに掛ける係数（groupby の作業領域・書き込み待ちの分）
+WORKING_SET_FACTOR = 4
+WRITE_BATCH_ROWS = 5_000
+
+# 再構築中はこの名前で作り、完成してから env_daily と差し替える
+ENV_DAILY_SHADOW = "env_daily_new"
+
+ENV_DAILY_DDL = """
+CREATE TABLE {table} (
+  farm               TEXT NOT NULL,
+  date               TEXT NOT NULL,     -- 'YYYY-MM-DD'（env_raw.ts の先頭10文字）
+  mean_temp          REAL,
+  mean_humidity      REAL,
+  mean_sand_temp     REAL,
+  mean_water_content REAL,
+  mean_irradiance    REAL,
+  vpd_kpa            REAL,
+  PRIMARY KEY (farm, date)
+);
+"""
+
+
+class DailyAccumulator:
     """
-    env_raw から env_daily を再作成し、
-    env_monthly / v_harvest_env の VIEW を張り直す。
-    """
-    print("[INFO] env_daily / env_monthly / v_harvest_env を再構築する。")
+    (farm, date) 順に並んだチャンクから日次平均を組み立てる。
 
-    with engine.begin() as conn:
-        # env_raw -> pandas
-        df_raw = pd.read_sql(
-            """
-            SELECT farm, ts, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2
-            FROM env_raw;
-            """,
-            conn,
-            parse_dates=["ts"],
-        )
-
-    if df_raw.empty:
-        print("[WARN] env_raw にデータがありません。集計をスキップします。")
-        return
+    各チャンクを (farm, date) ごとの 合計・件数 に畳み、最後のグループだけは
+    次のチャンクに続く可能性があるので持ち越す。メモリに載るのは
+    1チャンク + 持ち越し1グループ + 書き込み待ちの日次行 だけ。
+    """
 
-    # 日付列を作成
-    df_raw["date"] = df_raw["ts"].dt.date
-
-    # 日単位集計
-    df_daily = (
-        df_raw.groupby(["farm", "date"], as_index=False)
-        .agg(
-            mean_temp=("air_temp_c", "mean"),
-            mean_humidity=("rh_percent", "mean"),
-            mean_sand_temp=("sand_temp_c", "mean"),
-            mean_water_content=("water_content", "mean"),
-            mean_irradiance=("irradiance_wm2", "mean"),
-        )
+    def __init__(self) -> None:
+        self.carry: pd.DataFrame | None = None
+
+    @staticmethod
+    def _partial(chunk: pd.DataFrame) -> pd.DataFrame:
+        values = chunk[list(DAILY_MEAN_COLUMNS)]
+        keys = [chunk["farm"], chunk["date"]]
+        sums = values.groupby(keys, sort=False).sum(min_count=1)
+        counts = values.notna().groupby(keys, sort=False).sum()
+        return sums.join(counts, rsuffix="__n")
+
+    def add(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """チャンクを足し、確定した日次行（平均済み）を返す。"""
+        part = self._partial(chunk)
+        if self.carry is not None:
+            part = pd.concat([self.carry, part])
+            # 持ち越しと先頭グループが同じキーなら合算する
+            part = part.groupby(level=[0, 1], sort=False).sum(min_count=1)
+        self.carry = part.iloc[-1:]
+        return self._finalize(part.iloc[:-1])
+
+    def flush(self) -> pd.DataFrame:
+        done = self._finalize(self.carry)
+        self.carry = None
+        return done
+
+    @staticmethod
+    def _finalize(part: pd.DataFrame | None) -> pd.DataFrame:
+        columns = ["farm", "date", *DAILY_MEAN_COLUMNS.values()]
+        if part is None or part.empty:
+            return pd.DataFrame(columns=columns)
+        out = pd.DataFrame(index=part.index)
+        for src, dst in DAILY_MEAN_COLUMNS.items():
+            n = part[f"{src}__n"]
+            out[dst] = part[src] / n.where(n > 0)
+        out.index.names = ["farm", "date"]
+        return out.reset_index()[columns]
+
+
+def iter_env_raw_chunks(conn, max_memory_mb: float):
+    """
+    env_raw を (farm, ts) 順に流し読みする。1チャンクの行数は最初のチャンクの
+    実メモリから、上限 max_memory_mb に収まるように決め直す。
+    """
+    result = conn.execution_options(stream_results=True).exec_driver_sql(
+        """
+        SELECT farm, substr(ts, 1, 10) AS date,
+               air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2
+        FROM env_raw
+        ORDER BY farm, ts;
+        """
     )
+    columns = list(result.keys())
+    n = FIRST_CHUNK_ROWS
+    budget = max_memory_mb * 2**20
+    while True:
+        rows = result.fetchmany(n)
+        if not rows:
+            break
+        chunk = pd.DataFrame.from_records(rows, columns=columns)
+        del rows
+        row_bytes = chunk.memory_usage(deep=True).sum() / len(chunk)
+        n = max(MIN_CHUNK_ROWS, int(budget / (row_bytes * WORKING_SET_FACTOR)))
+        yield chunk
 
-    # VPD 列を追加
+
+def write_env_daily_batch(conn, df_daily: pd.DataFrame, table: str = "env_daily") -> int:
+    if df_daily.empty:
+        return 0
     df_daily = add_vpd_column(
         df_daily,
         temp_col="mean_temp",
         rh_col="mean_humidity",
         vpd_col="vpd_kpa",
     )
+    cols = ["farm", "date", *DAILY_MEAN_COLUMNS.values(), "vpd_kpa"]
+    # NaN は NULL として入れる
+    rows = df_daily[cols].astype(object).where(df_daily[cols].notna(), None)
+    conn.exec_driver_sql(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))});",
+        list(rows.itertuples(index=False, name=None)),
+    )
+    return len(df_daily)
+
+
+def rebuild_env_daily_and_views(max_memory_mb: float = DEFAULT_MAX_MEMORY_MB) -> None:
+    """
+    env_raw から env_daily を再作成し、
+    env_monthly / v_harvest_env の VIEW を張り直す。
+
+    env_raw 全体をメモリに載せず、(farm, ts) 順にチャンクで流し読みして
+    日ごとの合計・件数を積み上げ、確定した日から env_daily に書く。
+    max_memory_mb は読み込みチャンクと作業領域の目安の上限。
+
+    集計結果はバッチごとに短いトランザクションで env_daily_new に書いてコミットし、
+    完成してから1つの短いトランザクションで env_daily と差し替える（swap_env_daily）。再構築中も読み手はブロックされず、
+    テーブルや VIEW が消えている瞬間も見えない。
+    """
+    print("[INFO] env_daily / env_monthly / v_harvest_env を再構築する。")
+
+    with import_runs.track(engine, source="script", kind="env_daily") as run:
+        _rebuild_env_daily_and_views(run, max_memory_mb)
+
 
-    # env_daily テーブルとして保存（毎回作り直し）
+def _rebuild_env_daily_and_views(run: import_runs.ImportRun, max_memory_mb: float) -> None:
+    ensure_env_raw_table()
+
+    with engine.connect() as conn:
+        has_rows = conn.exec_driver_sql("SELECT EXISTS (SELECT 1 FROM env_raw);").scalar()
+    if not has_rows:
+        run.skip()
+        print("[WARN] env_raw にデータがありません。集計をスキップします。")
+        return
+
+    # 1) 影のテーブル env_daily_new を作る。WAL なのでこの間もダッシュボードは
+    #    古い env_daily / VIEW をそのまま読める
     with engine.begin() as conn:
-        # まず env_daily が view か table かを確認してから drop
-        row = conn.exec_driver_sql(
-            "SELECT type FROM sqlite_master WHERE name='env_daily';"
-        ).fetchone()
-
-        if row:
-            obj_type = row[0]
-            if obj_type == "view":
-                conn.exec_driver_sql("DROP VIEW env_daily;")
-            elif obj_type == "table":
-                conn.exec_driver_sql("DROP TABLE env_daily;")
-
-        # 改めて「テーブル」として作成
-        df_daily.to_sql("env_daily", conn, if_exists="replace", index=False)
-
-        # env_monthly VIEW を再作成
-        conn.exec_driver_sql("DROP VIEW IF EXISTS env_monthly;")
-        conn.exec_driver_sql(
-            """
-            CREATE VIEW env_monthly AS
-            SELECT
-                farm,
-                strftime('%Y-%m', date) AS month,
-                AVG(mean_temp)          AS mean_temp,
-                AVG(mean_humidity)      AS mean_humidity,
-                AVG(vpd_kpa)            AS mean_vpd_kpa,
-                AVG(mean_sand_temp)     AS mean_sand_temp,
-                AVG(mean_water_content) AS mean_water_content,
-                AVG(mean_irradiance)    AS mean_irradiance
-            FROM env_daily
-            GROUP BY farm, month;
-            """
-        )
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {ENV_DAILY_SHADOW};")
+        conn.exec_driver_sql(ENV_DAILY_DDL.format(table=ENV_DAILY_SHADOW))
+
+    def write(frames: list[pd.DataFrame]) -> int:
+        # バッチごとに短いトランザクションでコミットする（書き込みロックを持ち続けない。
+        # 途中で落ちても env_daily_new が中途半端に残るだけで、次の再構築で作り直される）
+        with run.stage("write"), engine.begin() as conn:
+            return write_env_daily_batch(
+                conn, pd.concat(frames, ignore_index=True), table=ENV_DAILY_SHADOW
+            )
+
+    # env_raw の流し読みは読み取り専用の別接続で行う（WAL のスナップショット読みで、書き込みはブロックしない）
+    acc = DailyAccumulator()
+    pending: list[pd.DataFrame] = []
+    pending_rows = 0
+    n_raw = 0
+    n_daily = 0
+    with engine.connect() as read_conn:
+        for chunk in iter_env_raw_chunks(read_conn, max_memory_mb):
+            n_raw += len(chunk)
+            with run.stage("aggregate"):
+                done = acc.add(chunk)
+            del chunk
+            if not done.empty:
+                pending.append(done)
+                pending_rows += len(done)
+            if pending_rows >= WRITE_BATCH_ROWS:
+                n_daily += write(pending)
+                pending, pending_rows = [], 0
+    pending.append(acc.flush())
+    n_daily += write(pending)
+    run.rows = n_raw
+
+    # 2) 名前の差し替えと VIEW の張り直しだけを短いトランザクションで行う
+    with run.stage("swap"):
+        with engine.begin() as conn:
+            swap_env_daily(conn)
+
+    print(f"[OK] env_daily {n_daily} 行（env_raw {n_raw} 行から）/ env_monthly / v_harvest_env の再構築が完了しました。")
+
+
+def swap_env_daily(conn) -> None:
+    """
+    env_daily_new を env_daily に差し替え、VIEW を張り直す（1トランザクション内で呼ぶ）。
 
-        # v_harvest_env VIEW
-        conn.exec_driver_sql("DROP VIEW IF EXISTS v_harvest_env;")
-        conn.exec_driver_sql(
-            """
-            CREATE VIEW v_harvest_env AS
-            SELECT
-                h.farm,
-                h.month,
-                h.total_kg AS mean_kg,
-                e.mean_temp,
-                e.mean_humidity AS mean_humid,
-                e.mean_vpd_kpa,
-                e.mean_sand_temp,
-                e.mean_water_content,
-                e.mean_irradiance
-            FROM harvest_monthly h
-            LEFT JOIN env_monthly e
-              ON h.farm  = e.farm
-             AND h.month = e.month;
-            """
-        )
+    env_daily を先に別名へ RENAME すると、参照している VIEW の定義まで書き換わるので、
+    VIEW を消す → env_daily を消す → env_daily_new を RENAME → VIEW を作り直す の順にする。
+    読み手からはコミットの前後どちらかの状態しか見えない。
+    """
+    conn.exec_driver_sql("DROP VIEW IF EXISTS v_harvest_env;")
+    conn.exec_driver_sql("DROP VIEW IF EXISTS env_monthly;")
+
+    # env_daily が view か table かを確認してから drop
+    row = conn.exec_driver_sql(
+        "SELECT type FROM sqlite_master WHERE name='env_daily';"
+    ).fetchone()
+    if row:
+        obj_type = row[0]
+        if obj_type == "view":
+            conn.exec_driver_sql("DROP VIEW env_daily;")
+        elif obj_type == "table":
+            conn.exec_driver_sql("DROP TABLE env_daily;")
+
+    conn.exec_driver_sql(f"ALTER TABLE {ENV_DAILY_SHADOW} RENAME TO env_daily;")
+    _create_env_views(conn)
+    table_stats.refresh(conn, "env_daily")
+
+
+def _create_env_views(conn) -> None:
+    # env_monthly VIEW を再作成
+    conn.exec_driver_sql("DROP VIEW IF EXISTS env_monthly;")
+    conn.exec_driver_sql(
+        """
+        CREATE VIEW env_monthly AS
+        SELECT
+            farm,
+            strftime('%Y-%m', date) AS month,
+            AVG(mean_temp)          AS mean_temp,
+            AVG(mean_humidity)      AS mean_humidity,
+            AVG(vpd_kpa)            AS mean_vpd_kpa,
+            AVG(mean_sand_temp)     AS mean_sand_temp,
+            AVG(mean_water_content) AS mean_water_content,
+            AVG(mean_irradiance)    AS mean_irradiance
+        FROM env_daily
+        GROUP BY farm, month;
+        """
+    )
 
-    print("[OK] env_daily / env_monthly / v_harvest_env の再構築が完了しました。")
+    # v_harvest_env VIEW
+    # harvest_monthly は (farm, crop, month) ごとの行なので、(farm, month) に合計してから結合する
+    conn.exec_driver_sql("DROP VIEW IF EXISTS v_harvest_env;")
+    conn.exec_driver_sql(
+        """
+        CREATE VIEW v_harvest_env AS
+        SELECT
+            h.farm,
+            h.month,
+            h.total_kg AS mean_kg,
+            e.mean_temp,
+            e.mean_humidity AS mean_humid,
+            e.mean_vpd_kpa,
+            e.mean_sand_temp,
+            e.mean_water_content,
+            e.mean_irradiance
+        FROM (
+            SELECT farm, month, SUM(total_kg) AS total_kg
+            FROM harvest_monthly
+            GROUP BY farm, month
+        ) h
+        LEFT JOIN env_monthly e
+          ON h.farm  = e.farm
+         AND h.month = e.month;
+        """
+    )
 
 
 # ========= メイン処理 =========
@@ -1,10 +1,19 @@
 from pathlib import Path
+import sys
+
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+
+# プロジェクトルートを import パスに追加
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from db_config import get_engine
+from apps.common import brand_cube, column_map, harvest_pipeline, import_runs, table_stats, zones
 
 # === DB 接続設定(env_raw と同じ DB を想定) ===
-DB_PATH = Path(__file__).resolve().parents[1] / "data" / "db" / "harvests_real.db"
-engine = create_engine(f"sqlite:///{DB_PATH}", future=True)
+engine = get_engine("real")
 
 # テーブル作成
 def ensure_raw_csv_table() -> None:
@@ -32,11 +41,20 @@ def ensure_harvest_import_log_table() -> None:
     CREATE TABLE IF NOT EXISTS harvest_import_log (
       id             INTEGER PRIMARY KEY,
       path           TEXT NOT NULL UNIQUE, -- ファイルの絶対パス
-      imported_at    TEXT NOT NULL         -- 取り込み日時（SQLite　の　datetime('now'))
+      imported_at    TEXT NOT NULL,        -- 取り込み日時（SQLite　の　datetime('now'))
+      first_rowid    INTEGER,              -- このファイルの行の raw_csv.rowid の範囲
+      last_rowid     INTEGER
     );
     """
     with engine.begin() as conn:
         conn.exec_driver_sql(ddl)
+        # 古いログテーブルには rowid の範囲の列を足す
+        existing = {
+            row[1] for row in conn.exec_driver_sql("PRAGMA table_info(harvest_import_log);")
+        }
+        for name in ("first_rowid", "last_rowid"):
+            if name not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE harvest_import_log ADD COLUMN {name} INTEGER;")
 
 # インポート済み判定　＆　ログ記録
 def has_been_imported(path: Path) -> bool:
@@ -45,13 +63,16 @@ def has_been_imported(path: Path) -> bool:
         row = conn.execute(text(sql), {"path": str(path)}).fetchone()
     return row is not None
 
-def mark_imported(path: Path) -> None:
+def mark_imported(path: Path, first_rowid: int | None = None, last_rowid: int | None = None) -> None:
     sql = """
-    INSERT OR IGNORE INTO harvest_import_log(path, imported_at)
-    VALUES(:path, datetime('now'));
+    INSERT OR IGNORE INTO harvest_import_log(path, imported_at, first_rowid, last_rowid)
+    VALUES(:path, datetime('now'), :first_rowid, :last_rowid);
     """
     with engine.begin() as conn:
-        conn.execute(text(sql), {"path": str(path)})
+        conn.execute(
+            text(sql),
+            {"path": str(path), "first_rowid": first_rowid, "last_rowid": last_rowid},
+        )
 
 # 収穫CSVの読み取り
 def read_harvest_csv(path: str) -> pd.DataFrame:
@@ -61,67 +82,26 @@ def read_harvest_csv(path: str) -> pd.DataFrame:
 
     想定ヘッダー:
     　収穫日,企業名,収穫野菜名,収穫量（ｇ）
+
+    文字コードは先頭バイトで判定し、列の対応付けは
+    apps.common.column_map.HARVEST_SPEC（ヘッダーごとにキャッシュ）で決める。
     """
     p = Path(path)
 
-    # エンコーディング候補（環境に応じて cp932 / utf-8-sig / utf-8 を試す）
-    enc_candidates = ["cp932", "utf-8-sig", "utf-8"]
-    last_err = None
-    df =None
+    layout = column_map.sniff_harvest(p, source=("harvest", p.parent))
+    kwargs, names = column_map.read_kwargs(layout, column_map.HARVEST_SPEC)
 
-    for enc in enc_candidates:
-        try:
-            df = pd.read_csv(p, encoding=enc)
-            break
-        except UnicodeError as e:
-            last_err = e
-    if df is None:
-        raise UnicodeDecodeError(
-                f"収穫CSVの読み込みに失敗しました（文字コード不明）:{p}"
-            ) from last_err
-
-    # 日本語ヘッダー　→　標準列名へのマッピング
-    # 列名は多少ぶれても良いように "含む文字" で拾う
-    cols = {c: str(c) for c in df.columns}
-
-    col_date = None
-    col_company = None
-    col_crop = None
-    col_amount = None
-
-    for c in df.columns:
-        name = cols[c]
-        if ("収穫日" in name) or ("日付" in name):
-            col_date = c
-        if ("企業名" in name) or ("会社名" in name):
-            col_company = c
-        if ("収穫野菜名" in name) or ("品目" in name) or ("作物" in name):
-            col_crop = c
-        if ("収穫量" in name) or ("量" in name) or ("ｇ" in name) or ("g" in name):
-            col_amount = c
-
-    missing = {
-            "収穫日": col_date,
-            "企業名": col_company,
-            "収穫野菜名": col_crop,
-            "収穫量": col_amount,
-    }
-    if any(v is None for v in missing.values()):
-        raise ValueError(f"必要な列が見つかりません: {missing} / 実際の例: {list(df.columns)}")
-
-    # 必要列だけ抽出・標準化
-    out = df[[col_date, col_company, col_crop, col_amount]].copy()
+    df = pd.read_csv(p, **kwargs)
+    df.columns = names
 
     # 型を整える（c1=文字列の日付、c4=数値）
-    out[col_amount] = pd.to_numeric(out[col_amount], errors="coerce")
-
-    out = out.rename(
-            columns={
-                col_date: "c1",
-                col_company: "c2",
-                col_crop: "c3",
-                col_amount: "c4",
-            }
+    out = pd.DataFrame(
+        {
+            "c1": df["date"],
+            "c2": df["company"],
+            "c3": df["crop"],
+            "c4": pd.to_numeric(df["amount_g"], errors="coerce"),
+        }
     )
 
     # すべて NaN の行などを落とす（安全のため）
@@ -140,17 +120,58 @@ def import_harvest_csv(path: set) -> None:
 
     p = Path(path)
 
-    if has_been_imported(p):
-        print(f"[SKIP] すでに取り込み済み: {p}")
-        return
-    
-    df = read_harvest_csv(str(p))
+    with import_runs.track(engine, source="script", kind="harvest", path=p) as run:
+        if has_been_imported(p):
+            run.skip()
+            print(f"[SKIP] すでに取り込み済み: {p}")
+            return
 
-    with engine.begin() as conn:
-        df.to_sql("raw_csv", conn, if_exists="append", index=False)
+        with run.stage("parse"):
+            df = read_harvest_csv(str(p))
+        run.rows = len(df)
 
-    mark_imported(p)
-    print(f"[OK] {len(df)} 行を raw_csv に追加しました: {p.name}")
+        with run.stage("load"):
+            with engine.begin() as conn:
+                before = conn.exec_driver_sql("SELECT COALESCE(MAX(rowid), 0) FROM raw_csv;").scalar()
+                df.to_sql("raw_csv", conn, if_exists="append", index=False)
+                after = conn.exec_driver_sql("SELECT COALESCE(MAX(rowid), 0) FROM raw_csv;").scalar()
+                table_stats.record_append(conn, "raw_csv", df)
+
+        mark_imported(p, before + 1, after)
+    print(f"[OK] {len(df)} 行を raw_csv に追加しました: {p.name} ({run.duration_ms:.0f} ms)")
+
+# raw_csv → staging_monthly → harvest_monthly → mv_harvest_monthly
+def build_harvest_monthly(full: bool = False) -> None:
+    """
+    まだ変換していない raw_csv の行だけを月次に変換して harvest_monthly に反映する。
+    full=True なら staging_monthly を空にして raw_csv 全体から作り直す。
+    続けて、更新した月の分だけブランド別のキューブ（brand_cube）と
+    ベッド1mあたり収量（zones.fact_yield_zone）を作り直す。
+    """
+    with import_runs.track(engine, source="script", kind="harvest_monthly") as run:
+        with engine.begin() as conn:
+            with run.stage("transform"):
+                if full:
+                    harvest_pipeline.reset(conn)
+                result = harvest_pipeline.run(conn)
+            if result.raw_rows:
+                with run.stage("cube"):
+                    brand_cube.refresh(conn, None if full else result.months)
+                with run.stage("zones"):
+                    unmatched = zones.refresh(conn, None if full else result.months)
+        run.rows = result.raw_rows
+        run.failed_rows = result.failed_rows
+        if result.raw_rows == 0:
+            run.skip()
+            print("[SKIP] 新しい raw_csv の行はありません。")
+            return
+
+    print(
+        f"[OK] raw_csv {result.raw_rows} 行 → harvest_monthly {result.keys} 件を更新しました"
+        f"（raw_csv_rejects に退避 {result.failed_rows} 行, 月: {', '.join(sorted(result.months))}）"
+    )
+    if unmatched:
+        print(f"[WARN] ゾーンを引けなかった farm（ベッド1mあたり収量から外れます）: {', '.join(unmatched)}")
 
 # メイン処理: inbox/harvest 配下の *.csv を一括取り込み
 if __name__ == "__main__":
@@ -172,3 +193,6 @@ if __name__ == "__main__":
             import_harvest_csv(str(path))
         except Exception as e:
             print(f"[ERROR] {path.name}: {e}")
+
+    # 取り込んだ分だけ月次集計に反映
+    build_harvest_monthly()
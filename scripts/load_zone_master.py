@@ -0,0 +1,42 @@
+"""
+data/db/zone_master.csv を dim_zone に読み込み、farm → ゾーンの解決と
+ベッド1mあたり収量（fact_yield_zone）を全体で作り直す。
+
+マスタ（ベッド数・長さ・段）を書き換えたときに実行する。
+月次の取り込み（import_harvest_csv.py / アップロード画面）では、取り込んだ月の分だけ自動で作り直される。
+
+    python scripts/load_zone_master.py
+    python scripts/load_zone_master.py --path /path/to/zone_master.csv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from db_config import get_engine
+from apps.common import import_runs, zones
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="load zone_master.csv and rebuild fact_yield_zone")
+    parser.add_argument("--path", type=Path, default=zones.ZONE_MASTER_PATH)
+    args = parser.parse_args()
+
+    engine = get_engine("real")
+    with import_runs.track(engine, source="script", kind="zone_master", path=args.path) as run:
+        with engine.begin() as conn:
+            with run.stage("load"):
+                n_zones, unmatched = zones.rebuild(conn, args.path)
+            n_fact = conn.exec_driver_sql("SELECT COUNT(*) FROM fact_yield_zone;").scalar_one()
+        run.rows = n_zones
+
+    print(f"[OK] dim_zone {n_zones} ゾーン / fact_yield_zone {n_fact} 行")
+    if unmatched:
+        print(f"[WARN] ゾーンを引けなかった farm（farm_zone に manual で登録してください）: {', '.join(unmatched)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+ベンチマーク・動作確認用の合成 CSV を作る。
+
+- GL240（GRAPHTEC）のエクスポート形式: 機器情報行 → アンプ設定（CH 定義）→
+  「番号,日付 時間,ms,CH1..」ヘッダー → 単位行 → 測定値
+- 収穫 CSV: 収穫日,企業名,収穫野菜名,収穫量（ｇ）
+
+使い方:
+    python scripts/synth_csv.py gl240 out.csv --days 30 --interval-min 10 --encoding utf-16le --delimiter tab
+    python scripts/synth_csv.py harvest out.csv --rows 50000 --encoding cp932
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# CH1~CH5 は env_raw の列に対応する（気温・湿度・砂温・含水率・日射）
+GL240_CHANNELS = [
+    # (単位, アンプ設定のレンジ, 値の生成関数)
+    ("゜C", "1-5V", lambda t, r: 25 + 8 * math.sin(t) + r.gauss(0, 0.5)),
+    ("%", "1-5V", lambda t, r: 65 - 15 * math.sin(t) + r.gauss(0, 2)),
+    ("゜C", "2V", lambda t, r: 27 + 6 * math.sin(t - 0.5) + r.gauss(0, 0.3)),
+    ("%", "2V", lambda t, r: 28 + r.gauss(0, 1.5)),
+    ("W/m2", "100mV", lambda t, r: max(0.0, 600 * math.sin(t)) + r.gauss(0, 5)),
+]
+
+# ヘッダーの CH 表記ゆれ（実機・変換ソフトのバージョンで変わる）
+CH_STYLES = {
+    "plain": lambda n: f"CH{n}",
+    "space": lambda n: f"CH {n}",
+    "zero": lambda n: f"CH{n:02d}",
+}
+
+DELIMITERS = {"comma": ",", "tab": "\t"}
+
+HARVEST_COMPANIES = ["牧野フライス", "愛川C1", "愛川C2", "実験棟", "ハートフル"]
+HARVEST_CROPS = ["BLレッドオーク", "加工BL", "いちご", "ミニトマト", "ケール", "島とうがらし"]
+
+
+def gl240_lines(
+    start: datetime,
+    days: float,
+    interval_min: int,
+    n_channels: int = 10,
+    ch_style: str = "plain",
+    seed: int = 0,
+):
+    """GL240 エクスポートの各行（フィールドのリスト）を順に返す。"""
+    rng = random.Random(seed)
+    n_points = int(days * 24 * 60 / interval_min)
+    width = n_channels + 5
+    end = start + timedelta(minutes=interval_min * max(0, n_points - 1))
+    ch = CH_STYLES[ch_style]
+
+    def pad(*fields):
+        return list(fields) + [""] * (width - len(fields))
+
+    yield pad("ベンダ", "GRAPHTEC Corporation")
+    yield pad("モデル", "GL240")
+    yield pad("ファームウェア", "Ver1.54")
+    yield pad("最大CH数", f"{n_channels}CH")
+    yield pad("測定間隔", f"{interval_min}min")
+    yield pad("測定点数", str(n_points))
+    yield pad("開始時刻", f"{start:%Y/%-m/%-d}", f"{start:%H:%M:%S}")
+    yield pad("終了時刻", f"{end:%Y/%-m/%-d}", f"{end:%H:%M:%S}")
+    yield pad("アンプ設定")
+    yield pad("CH", "信号名", "アンプ", "入力", "レンジ", "温度レンジ", "フィルタ", "スパン", "", "単位")
+    for n in range(1, n_channels + 1):
+        unit, rng_label, _ = GL240_CHANNELS[n - 1] if n <= len(GL240_CHANNELS) else ("V", "100V", None)
+        # CH 定義行は "CH1,CH 1" の形（ヘッダー検出で誤爆しやすい行）
+        yield pad(f"CH{n}", f"CH{n:>2}", "M", "DC", rng_label, "", "20", "50", "-50", unit)
+    yield pad("測定値")
+
+    yield ["番号", "日付 時間", "ms"] + [ch(n) for n in range(1, n_channels + 1)] + ["Alarm1", "AlarmOut"]
+    units = [GL240_CHANNELS[n - 1][0] if n <= len(GL240_CHANNELS) else "V" for n in range(1, n_channels + 1)]
+    yield ["NO.", "Time", "ms"] + units + ["A1234567890", "A123456789"]
+
+    for i in range(n_points):
+        ts = start + timedelta(minutes=interval_min * i)
+        # 1日周期の正弦波 + ノイズ
+        phase = (ts.hour * 60 + ts.minute) / 1440 * 2 * math.pi - math.pi / 2
+        values = []
+        for n in range(1, n_channels + 1):
+            if n <= len(GL240_CHANNELS):
+                values.append(f"{GL240_CHANNELS[n - 1][2](phase, rng):.3f}")
+            else:
+                values.append(f"{rng.choice([-0.01, 0, 0.01])}")
+        yield [str(i + 1), f"{ts:%Y/%-m/%-d %H:%M}", "0"] + values + ["LLLLLLLLLL", "LLLLL"]
+
+
+def write_gl240_csv(
+    path: Path,
+    start: datetime = datetime(2025, 8, 1, 0, 0),
+    days: float = 7,
+    interval_min: int = 10,
+    encoding: str = "cp932",
+    delimiter: str = "comma",
+    ch_style: str = "plain",
+    seed: int = 0,
+) -> int:
+    """合成 GL240 CSV を書き、測定値の行数を返す。"""
+    sep = DELIMITERS[delimiter]
+    with Path(path).open("w", encoding=encoding, newline="") as f:
+        for fields in gl240_lines(start, days, interval_min, ch_style=ch_style, seed=seed):
+            f.write(sep.join(fields) + "\r\n")
+    return int(days * 24 * 60 / interval_min)
+
+
+def write_harvest_csv(
+    path: Path,
+    rows: int = 10_000,
+    start: datetime = datetime(2025, 8, 1),
+    days: int = 90,
+    encoding: str = "cp932",
+    seed: int = 0,
+) -> int:
+    """合成収穫 CSV を書き、データ行数を返す。"""
+    rng = random.Random(seed)
+    with Path(path).open("w", encoding=encoding, newline="") as f:
+        f.write("収穫日,企業名,収穫野菜名,収穫量（ｇ）\r\n")
+        for i in range(rows):
+            d = start + timedelta(days=days * i // max(rows, 1))
+            f.write(
+                f"{d:%Y/%-m/%-d},{rng.choice(HARVEST_COMPANIES)},"
+                f"{rng.choice(HARVEST_CROPS)},{rng.randrange(50, 2000, 50)}\r\n"
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成 GL240 / 収穫 CSV の生成")
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    p_gl = sub.add_parser("gl240")
+    p_gl.add_argument("out", type=Path)
+    p_gl.add_argument("--start", default="2025-08-01T00:00")
+    p_gl.add_argument("--days", type=float, default=7)
+    p_gl.add_argument("--interval-min", type=int, default=10)
+    p_gl.add_argument("--encoding", choices=["cp932", "utf-16le", "utf-8-sig"], default="cp932")
+    p_gl.add_argument("--delimiter", choices=sorted(DELIMITERS), default="comma")
+    p_gl.add_argument("--ch-style", choices=sorted(CH_STYLES), default="plain")
+    p_gl.add_argument("--seed", type=int, default=0)
+
+    p_hv = sub.add_parser("harvest")
+    p_hv.add_argument("out", type=Path)
+    p_hv.add_argument("--rows", type=int, default=10_000)
+    p_hv.add_argument("--days", type=int, default=90)
+    p_hv.add_argument("--encoding", choices=["cp932", "utf-8-sig", "utf-8"], default="cp932")
+    p_hv.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.kind == "gl240":
+        n = write_gl240_csv(
+            args.out,
+            start=datetime.fromisoformat(args.start),
+            days=args.days,
+            interval_min=args.interval_min,
+            encoding=args.encoding,
+            delimiter=args.delimiter,
+            ch_style=args.ch_style,
+            seed=args.seed,
+        )
+    else:
+        n = write_harvest_csv(args.out, rows=args.rows, days=args.days, encoding=args.encoding, seed=args.seed)
+    print(f"[OK] {n} 行を書き出しました: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
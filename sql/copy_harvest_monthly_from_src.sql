@@ -3,17 +3,30 @@
 
 ATTACH DATABASE '/home/matsuoka/work-automation/heartful-analytics/data/db/harvests.db' AS src;
 
--- 受け皿を作り直し（列は src に合わせる）
+-- 受け皿を作り直し（apps/common/harvest_pipeline.py の HARVEST_MONTHLY_DDL と同じ形）
+-- crop が NULL の行は '(作物指定なし)'（harvest_pipeline.UPLOAD_CROP）にし、同じキーの重複行は合計する
 DROP TABLE IF EXISTS harvest_monthly;
 
-CREATE TABLE harvest_monthly AS
+CREATE TABLE harvest_monthly (
+  farm      TEXT NOT NULL,
+  crop      TEXT NOT NULL DEFAULT '(作物指定なし)',
+  manager   TEXT,
+  month     TEXT NOT NULL,
+  total_kg  REAL NOT NULL,
+  PRIMARY KEY (farm, crop, month)
+);
+
+INSERT INTO harvest_monthly (farm, crop, manager, month, total_kg)
 SELECT
   farm,
-  crop,
-  manager,
+  COALESCE(crop, '(作物指定なし)'),
+  MAX(manager),
   month,
-  total_kg
-FROM src.harvest_monthly;
+  SUM(total_kg)
+FROM src.harvest_monthly
+WHERE farm IS NOT NULL AND month IS NOT NULL
+GROUP BY farm, COALESCE(crop, '(作物指定なし)'), month
+HAVING SUM(total_kg) IS NOT NULL;
 
 DETACH DATABASE src;
 